@@ -0,0 +1,328 @@
+# app/catalog_index.py
+# -*- coding: utf-8 -*-
+"""
+Indice en memoria del catalogo de productos (v6.8.0).
+
+Evita un round-trip a SQLite por cada escaneo en Ventas y por cada consulta
+rapida (popup de precio, editar por codigo, etc.). Mantiene:
+  - un hash map codigo_barra -> CatalogEntry
+  - un indice invertido de tokens (nombre + categoria) -> ids
+
+Se mantiene actualizado solo: escucha los eventos de Session de SQLAlchemy
+(after_flush / after_commit / rollbacks), asi que cualquier alta, edicion
+o baja hecha via ORM (ABM de productos, importacion Excel, sync Firebase en el
+hilo de background, etc.) se refleja al confirmarse la transaccion. Los
+borrados masivos via `delete(Producto)` no disparan eventos de mapper, por eso
+`prod_repo.eliminar_ids` llama a `descartar_ids()` explicitamente.
+
+Uso tipico:
+    from app.catalog_index import ProductCatalogIndex
+    idx = ProductCatalogIndex.get_instance()
+    idx.cargar(prod_repo(session))          # una vez al arrancar
+    entry = idx.por_codigo("7790001234567") # sin tocar la BD
+"""
+import bisect
+import logging
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Producto
+
+logger = logging.getLogger(__name__)
+
+# Singleton
+_instance = None
+_instance_lock = threading.Lock()
+
+_TOKEN_RE = re.compile(r"[^\w]+", re.UNICODE)
+_PENDING_KEY = "_catalog_pending"
+_SAVEPOINTS_KEY = "_catalog_savepoints"   # pila [(id(transaccion), deshacer)]
+_ULTIMO_SP_KEY = "_catalog_ultimo_sp"
+_AUSENTE = object()
+
+
+def _tokens(*textos) -> Set[str]:
+    out = set()
+    for t in textos:
+        if not t:
+            continue
+        for tok in _TOKEN_RE.split(str(t).lower()):
+            if tok:
+                out.add(tok)
+    return out
+
+
+class CatalogEntry:
+    """Snapshot inmutable de un producto (no es un objeto ORM: sirve en cualquier hilo)."""
+
+    __slots__ = ("id", "codigo_barra", "nombre", "precio", "categoria")
+
+    def __init__(self, id, codigo_barra, nombre, precio, categoria):
+        self.id = id
+        self.codigo_barra = codigo_barra
+        self.nombre = nombre
+        self.precio = float(precio or 0.0)
+        self.categoria = categoria
+
+    @classmethod
+    def from_producto(cls, p) -> "CatalogEntry":
+        return cls(p.id, p.codigo_barra, p.nombre, p.precio, p.categoria)
+
+    def __repr__(self):
+        return f"CatalogEntry(id={self.id}, codigo={self.codigo_barra!r}, nombre={self.nombre!r})"
+
+
+class ProductCatalogIndex:
+    """Indice de productos por codigo de barras y por tokens de nombre/categoria."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_id: Dict[int, CatalogEntry] = {}
+        self._by_codigo: Dict[str, CatalogEntry] = {}
+        self._tokens: Dict[str, Set[int]] = {}
+        self._tokens_ordenados: Optional[List[str]] = None   # para prefijos; None = rearmar
+        self._loaded = False
+
+    @classmethod
+    def get_instance(cls) -> "ProductCatalogIndex":
+        """Retorna la instancia singleton."""
+        global _instance
+        with _instance_lock:
+            if _instance is None:
+                _instance = cls()
+            return _instance
+
+    # ─── Carga ────────────────────────────────────────────────────────
+
+    @property
+    def cargado(self) -> bool:
+        return self._loaded
+
+    def cargar(self, repo) -> int:
+        """(Re)construye el indice completo desde `prod_repo`. Retorna cantidad de productos."""
+        rows = repo.listar_para_indice()
+        with self._lock:
+            self._by_id.clear()
+            self._by_codigo.clear()
+            self._tokens.clear()
+            self._tokens_ordenados = None
+            for row in rows:
+                self._upsert(CatalogEntry(*row))
+            self._loaded = True
+            n = len(self._by_id)
+        logger.info("[CATALOGO] indice cargado: %d productos", n)
+        return n
+
+    def invalidar(self) -> None:
+        """Marca el indice como no cargado (p.ej. tras reemplazar la BD)."""
+        with self._lock:
+            self._by_id.clear()
+            self._by_codigo.clear()
+            self._tokens.clear()
+            self._tokens_ordenados = None
+            self._loaded = False
+
+    # ─── Consultas ────────────────────────────────────────────────────
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def por_codigo(self, codigo) -> Optional[CatalogEntry]:
+        if not codigo:
+            return None
+        return self._by_codigo.get(str(codigo).strip())
+
+    def por_id(self, prod_id) -> Optional[CatalogEntry]:
+        return self._by_id.get(prod_id)
+
+    def contiene_codigo(self, codigo) -> bool:
+        return self.por_codigo(codigo) is not None
+
+    def buscar(self, texto: str, limit: int = 500) -> List[CatalogEntry]:
+        """Busqueda por terminos (AND), como `prod_repo.buscar`: cada termino debe
+        ser prefijo de una palabra del nombre o la categoria, o (si tiene digitos)
+        aparecer en el codigo o el precio.
+
+        Los terminos de texto se resuelven con el indice invertido (busqueda
+        binaria de prefijos). Solo los que tienen digitos recorren productos, y
+        despues del primer termino solo los candidatos que quedan.
+        """
+        terminos = [t.strip().lower() for t in re.split(r'[,\s]+', texto or '') if t.strip()]
+        if not terminos:
+            return []
+        # Primero los de texto: achican los candidatos antes de los recorridos
+        terminos.sort(key=lambda t: any(c.isdigit() for c in t))
+        with self._lock:
+            candidatos: Optional[Set[int]] = None
+            for t in terminos:
+                ids = self._por_prefijos(_tokens(t))
+                if any(c.isdigit() for c in t):
+                    universo = (self._by_id.values() if candidatos is None
+                                else [self._by_id[i] for i in candidatos])
+                    for e in universo:
+                        if t in (e.codigo_barra or "").lower() or t in repr(e.precio):
+                            ids.add(e.id)
+                candidatos = ids if candidatos is None else (candidatos & ids)
+                if not candidatos:
+                    return []
+            out = [self._by_id[i] for i in candidatos]
+        out.sort(key=lambda e: (e.nombre or "").lower())
+        return out[:limit]
+
+    def _por_prefijos(self, partes: Set[str]) -> Set[int]:
+        """Ids con una palabra que empiece por cada una de `partes` (AND)."""
+        if self._tokens_ordenados is None:
+            self._tokens_ordenados = sorted(self._tokens)
+        orden = self._tokens_ordenados
+        ids: Optional[Set[int]] = None
+        for parte in partes:
+            encontrados = set()
+            i = bisect.bisect_left(orden, parte)
+            while i < len(orden) and orden[i].startswith(parte):
+                encontrados |= self._tokens[orden[i]]
+                i += 1
+            ids = encontrados if ids is None else (ids & encontrados)
+            if not ids:
+                break
+        return ids or set()
+
+    def pares_codigo_nombre(self) -> List[tuple]:
+        """Equivalente en memoria de `prod_repo.listar_codigos_nombres()`."""
+        with self._lock:
+            return [(e.codigo_barra, e.nombre) for e in self._by_id.values()]
+
+    # ─── Mantenimiento incremental ────────────────────────────────────
+
+    def _upsert(self, entry: CatalogEntry) -> None:
+        prev = self._by_id.get(entry.id)
+        if prev is not None:
+            self._remove(prev)
+        self._by_id[entry.id] = entry
+        if entry.codigo_barra:
+            self._by_codigo[entry.codigo_barra] = entry
+        for tok in _tokens(entry.nombre, entry.categoria):
+            posting = self._tokens.get(tok)
+            if posting is None:
+                posting = self._tokens[tok] = set()
+                self._tokens_ordenados = None
+            posting.add(entry.id)
+
+    def _remove(self, entry: CatalogEntry) -> None:
+        self._by_id.pop(entry.id, None)
+        if self._by_codigo.get(entry.codigo_barra) is entry:
+            self._by_codigo.pop(entry.codigo_barra, None)
+        for tok in _tokens(entry.nombre, entry.categoria):
+            posting = self._tokens.get(tok)
+            if posting is not None:
+                posting.discard(entry.id)
+                if not posting:
+                    self._tokens.pop(tok, None)
+                    self._tokens_ordenados = None
+
+    def aplicar(self, upserts: Iterable[CatalogEntry] = (), borrados: Iterable[int] = ()) -> None:
+        """Aplica un lote de cambios ya confirmados en la BD."""
+        if not self._loaded:
+            return
+        with self._lock:
+            for prod_id in borrados:
+                prev = self._by_id.get(prod_id)
+                if prev is not None:
+                    self._remove(prev)
+            for entry in upserts:
+                self._upsert(entry)
+
+    def descartar_ids(self, ids: Iterable[int]) -> None:
+        """Quita ids del indice (para borrados masivos que no pasan por el ORM)."""
+        self.aplicar(borrados=list(ids or []))
+
+
+# ─── Hooks de Session: mantener el indice al confirmar transacciones ──
+
+def _marcar(session, prod_id, entry) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    pila = session.info.get(_SAVEPOINTS_KEY)
+    if pila:
+        # Dentro de un SAVEPOINT: recordar el valor previo para poder deshacerlo
+        pila[-1][1].append((prod_id, pending.get(prod_id, _AUSENTE)))
+    pending[prod_id] = entry
+
+
+@event.listens_for(Session, "after_flush")
+def _catalog_after_flush(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, Producto):
+            _marcar(session, obj.id, CatalogEntry.from_producto(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Producto) and obj.id is not None:
+            _marcar(session, obj.id, CatalogEntry.from_producto(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Producto) and obj.id is not None:
+            _marcar(session, obj.id, None)
+
+
+@event.listens_for(Session, "after_commit")
+def _catalog_after_commit(session):
+    if session.in_nested_transaction():
+        # SQLAlchemy tambien dispara after_commit al liberar un SAVEPOINT
+        # (begin_nested().commit()): lo marcado se publica recien con el commit
+        # de la transaccion externa, que todavia puede deshacerse
+        return
+    session.info.pop(_SAVEPOINTS_KEY, None)
+    session.info.pop(_ULTIMO_SP_KEY, None)
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        ProductCatalogIndex.get_instance().aplicar(
+            upserts=[e for e in pending.values() if e is not None],
+            borrados=[pid for pid, e in pending.items() if e is None],
+        )
+    except Exception as e:
+        logger.warning("[CATALOGO] no se pudo actualizar el indice: %s", e)
+
+
+# v6.8.0: SAVEPOINTs (session.begin_nested, usado por el pull de Firebase por
+# pagina). Un rollback al savepoint solo descarta lo marcado desde que se abrio;
+# lo de la transaccion externa se sigue aplicando en el commit.
+
+@event.listens_for(Session, "after_transaction_create")
+def _catalog_after_transaction_create(session, transaction):
+    if transaction.nested:
+        session.info.setdefault(_SAVEPOINTS_KEY, []).append((id(transaction), []))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _catalog_after_transaction_end(session, transaction):
+    if not transaction.nested:
+        return
+    pila = session.info.get(_SAVEPOINTS_KEY)
+    if not pila or pila[-1][0] != id(transaction):
+        return
+    tid, deshacer = pila.pop()
+    if pila:
+        # Si despues se deshace el savepoint padre, tambien hay que deshacer esto
+        pila[-1][1].extend(deshacer)
+    # after_soft_rollback llega despues de este evento
+    session.info[_ULTIMO_SP_KEY] = (tid, deshacer)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _catalog_after_soft_rollback(session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+        session.info.pop(_SAVEPOINTS_KEY, None)
+        session.info.pop(_ULTIMO_SP_KEY, None)
+        return
+    ultimo = session.info.pop(_ULTIMO_SP_KEY, None)
+    pending = session.info.get(_PENDING_KEY)
+    if not ultimo or ultimo[0] != id(previous_transaction) or pending is None:
+        return
+    for prod_id, previo in reversed(ultimo[1]):
+        if previo is _AUSENTE:
+            pending.pop(prod_id, None)
+        else:
+            pending[prod_id] = previo
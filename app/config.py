@@ -380,6 +380,13 @@ Interés: {{totales.interes}}
         "text_ratio": 0.25          # 25% para texto (nombre + código)
     },
 
+    # v6.8.0: archivo historico de ventas por año (ventas_YYYY.db junto a la BD).
+    # Al arrancar mueve las ventas anteriores a `meses` meses; ver app/sales_archive.py
+    "archivo_ventas": {
+        "enabled": False,
+        "meses": 12
+    },
+
     # BACKUP
     "backup": {
         "enabled": True,
@@ -510,7 +517,7 @@ Interés: {{totales.interes}}
 
     "sync": {
         "enabled": False,
-        "mode": "interval",
+        "mode": "interval",   # "interval" | "manual" | "stream" (v6.8.0, ver firebase_stream.py)
         "interval_minutes": 2,
         "firebase": {
             "database_url": "",
@@ -519,16 +526,23 @@ Interés: {{totales.interes}}
         "sync_productos": True,
         "sync_proveedores": True,
         "last_sync": None,
-        "last_processed_keys": {
-            "ventas": None,
-            "productos": None,
-            "proveedores": None
-        },
+        # v6.8.0: los cursores de pull (antes "last_processed_keys") viven en sync_state.db
         # v6.6.0: auto-cleanup de cambios procesados en Firebase para no llenar la cuota
         # v6.6.3: default subido de 7 a 30 dias para que el dashboard mantenga histórico
         "cleanup": {
             "enabled": True,
-            "safe_window_days": 30  # min antes de borrar (margen para sucursales offline + dashboard)
+            "safe_window_days": 30,  # min antes de borrar (margen para sucursales offline + dashboard)
+            "diferido": True  # v6.8.0: borrar en lotes PATCH en segundo plano tras el pull
+        },
+        # v6.8.0: snapshots/{tipo} compactados para que una sucursal nueva no replique todo el log
+        "snapshots": {
+            "enabled": True,
+            "intervalo_horas": 24
+        },
+        # v6.8.0: resumenes/{dia}/{sucursal} (totales, medios de pago, top productos) para el dashboard web
+        "resumenes": {
+            "enabled": True,
+            "dias": 40
         }
     },
 
@@ -628,9 +642,25 @@ def save(cfg: Dict[str, Any]) -> bool:
 
         with open(CONFIG_PATH, "w", encoding="utf-8") as f:
             json.dump(cfg, f, ensure_ascii=False, indent=2)
-        return True
     except Exception:
         return False
+    for fn in list(_save_listeners):
+        try:
+            fn()
+        except Exception:
+            pass
+    return True
+
+
+# v6.8.0: callbacks sin argumentos que se llaman despues de cada save() exitoso
+# (p.ej. FirebaseTransport invalida su copia cacheada de la seccion `sync`).
+_save_listeners = []
+
+
+def add_save_listener(fn) -> None:
+    """Registra `fn()` para que se ejecute tras cada save() exitoso."""
+    if fn not in _save_listeners:
+        _save_listeners.append(fn)
 
 
 # -------------------- RUTAS PUBLICAS --------------------
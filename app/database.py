@@ -4,7 +4,7 @@ import os, sys
 from pathlib import Path
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
+from app.models import Base, VENTAS_INDICES_UNICOS
 
 logger = logging.getLogger(__name__)
 
@@ -88,196 +88,458 @@ def _set_pragmas(dbapi_connection, connection_record):
     finally:
         cur.close()
 
+# ─── Busqueda full-text de productos (v6.8.0) ─────────────────────────
+# Tabla virtual FTS5 con tokenizer trigram (permite substring, como LIKE '%t%')
+# espejada sobre `productos` via external content + triggers.
+PRODUCTOS_FTS_TABLE = "productos_fts"
+
+_PRODUCTOS_FTS_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCTOS_FTS_TABLE} USING fts5(
+        nombre, codigo_barra, categoria,
+        content='productos', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO {PRODUCTOS_FTS_TABLE}(rowid, nombre, codigo_barra, categoria)
+        VALUES (new.id, new.nombre, new.codigo_barra, new.categoria);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        INSERT INTO {PRODUCTOS_FTS_TABLE}({PRODUCTOS_FTS_TABLE}, rowid, nombre, codigo_barra, categoria)
+        VALUES ('delete', old.id, old.nombre, old.codigo_barra, old.categoria);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF nombre, codigo_barra, categoria ON productos BEGIN
+        INSERT INTO {PRODUCTOS_FTS_TABLE}({PRODUCTOS_FTS_TABLE}, rowid, nombre, codigo_barra, categoria)
+        VALUES ('delete', old.id, old.nombre, old.codigo_barra, old.categoria);
+        INSERT INTO {PRODUCTOS_FTS_TABLE}(rowid, nombre, codigo_barra, categoria)
+        VALUES (new.id, new.nombre, new.codigo_barra, new.categoria);
+    END""",
+)
+
+
+def _ensure_productos_fts(conn) -> bool:
+    """Crea (si falta) la tabla FTS5 de productos y sus triggers, y la puebla.
+
+    Retorna False si el SQLite embebido no tiene FTS5/trigram (SQLite < 3.34);
+    en ese caso prod_repo.buscar sigue usando el camino LIKE.
+    """
+    from sqlalchemy import text
+    existed = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"
+    ), {"n": PRODUCTOS_FTS_TABLE}).first() is not None
+    try:
+        for ddl in _PRODUCTOS_FTS_DDL:
+            conn.execute(text(ddl))
+    except Exception as e:
+        logger.warning("[MIGRATION] FTS5 no disponible, busqueda de productos usa LIKE: %s", e)
+        return False
+    if not existed:
+        conn.execute(text(f"INSERT INTO {PRODUCTOS_FTS_TABLE}({PRODUCTOS_FTS_TABLE}) VALUES ('rebuild')"))
+        logger.info("[MIGRATION] Tabla %s creada e indexada", PRODUCTOS_FTS_TABLE)
+    return True
+
+
+# ─── Resumen diario de ventas (v6.8.0) ───────────────────────────────
+# `ventas_diarias` acumula cantidad/total/interes por (sucursal, dia, modo_pago,
+# con_cae). Se mantiene con triggers sobre `ventas`, asi que cubre cualquier
+# camino de escritura: finalizar venta, modificar items, borrar, sync Firebase,
+# borrados masivos (eliminar_anteriores_a) o SQL directo.
+VENTAS_DIARIAS_TABLE = "ventas_diarias"
+
+_VD_CAE = "(CASE WHEN COALESCE({r}.afip_cae, '') <> '' THEN 1 ELSE 0 END)"
+
+_VD_SUMAR = """INSERT INTO ventas_diarias (sucursal, fecha, modo_pago, con_cae, cantidad, total, interes)
+        VALUES (new.sucursal, date(new.fecha), new.modo_pago, {cae}, 1,
+                COALESCE(new.total, 0), COALESCE(new.interes_monto, 0))
+        ON CONFLICT (sucursal, fecha, modo_pago, con_cae) DO UPDATE SET
+            cantidad = cantidad + 1,
+            total = total + excluded.total,
+            interes = interes + excluded.interes;""".format(cae=_VD_CAE.format(r="new"))
+
+_VD_RESTAR = """UPDATE ventas_diarias SET
+            cantidad = cantidad - 1,
+            total = total - COALESCE(old.total, 0),
+            interes = interes - COALESCE(old.interes_monto, 0)
+        WHERE sucursal = old.sucursal AND fecha = date(old.fecha)
+          AND modo_pago = old.modo_pago AND con_cae = {cae};
+        DELETE FROM ventas_diarias
+        WHERE sucursal = old.sucursal AND fecha = date(old.fecha)
+          AND modo_pago = old.modo_pago AND con_cae = {cae} AND cantidad <= 0;""".format(cae=_VD_CAE.format(r="old"))
+
+_VENTAS_DIARIAS_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS ventas_diarias_ai AFTER INSERT ON ventas BEGIN {_VD_SUMAR} END",
+    f"CREATE TRIGGER IF NOT EXISTS ventas_diarias_ad AFTER DELETE ON ventas BEGIN {_VD_RESTAR} END",
+    f"""CREATE TRIGGER IF NOT EXISTS ventas_diarias_au
+        AFTER UPDATE OF sucursal, fecha, modo_pago, total, interes_monto, afip_cae ON ventas
+        BEGIN {_VD_RESTAR} {_VD_SUMAR} END""",
+)
+
+
+def reconstruir_ventas_diarias(conn) -> None:
+    """Recalcula `ventas_diarias` completa desde `ventas` (backfill / reparacion)."""
+    from sqlalchemy import text
+    conn.execute(text(f"DELETE FROM {VENTAS_DIARIAS_TABLE}"))
+    conn.execute(text(
+        f"INSERT INTO {VENTAS_DIARIAS_TABLE} "
+        "(sucursal, fecha, modo_pago, con_cae, cantidad, total, interes) "
+        f"SELECT sucursal, date(fecha), modo_pago, {_VD_CAE.format(r='ventas')}, "
+        "COUNT(*), COALESCE(SUM(total), 0), COALESCE(SUM(interes_monto), 0) "
+        "FROM ventas GROUP BY 1, 2, 3, 4"
+    ))
+
+
+def _ensure_ventas_diarias(conn) -> bool:
+    """Crea los triggers del resumen diario y hace el backfill la primera vez.
+
+    La tabla la crea `create_all` (modelo VentaDiaria). Si los triggers no
+    existian (BD nueva para esta version, o tabla ventas recreada por una
+    migracion) se reconstruye el resumen completo. Retorna False si el SQLite
+    embebido no soporta UPSERT (< 3.24); en ese caso las estadisticas agregan
+    directo sobre `ventas`.
+    """
+    from sqlalchemy import text
+    existed = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='ventas_diarias_ai'"
+    )).first() is not None
+    if existed:
+        return True
+    try:
+        for ddl in _VENTAS_DIARIAS_TRIGGERS:
+            conn.execute(text(ddl))
+    except Exception as e:
+        logger.warning("[MIGRATION] No se pudieron crear triggers de %s: %s", VENTAS_DIARIAS_TABLE, e)
+        for name in ("ventas_diarias_ai", "ventas_diarias_ad", "ventas_diarias_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        return False
+    reconstruir_ventas_diarias(conn)
+    logger.info("[MIGRATION] Resumen %s creado y poblado", VENTAS_DIARIAS_TABLE)
+    return True
+
+
+# ─── Secuencias de tickets (v6.8.0) ──────────────────────────────────
+# `ticket_sequences` guarda el ultimo numero por (sucursal, kind) para que
+# siguiente_ticket() sea un UPDATE ... RETURNING en vez de MAX() sobre el
+# historial. Los triggers solo empujan el contador hacia arriba cuando entra
+# un numero mayor por otro camino (sync Firebase, importaciones).
+TICKET_SEQUENCES_TABLE = "ticket_sequences"
+TICKET_KIND = "ticket"   # ventas sin CAE + pagos a proveedores
+TICKET_KIND_CAE = "cae"  # ventas con CAE
+
+# Maximo existente por sucursal (backfill, una vez por sucursal/kind)
+TICKET_SEQ_MAX_SQL = {
+    TICKET_KIND: (
+        "SELECT MAX(n) FROM ("
+        " SELECT numero_ticket AS n FROM ventas"
+        "  WHERE sucursal = :s AND numero_ticket > 0 AND afip_cae IS NULL"
+        " UNION ALL"
+        " SELECT numero_ticket FROM pagos_proveedores"
+        "  WHERE sucursal = :s AND numero_ticket IS NOT NULL)"
+    ),
+    TICKET_KIND_CAE: (
+        "SELECT MAX(numero_ticket_cae) FROM ventas"
+        " WHERE sucursal = :s AND numero_ticket_cae IS NOT NULL"
+    ),
+}
+
+_TS_VENTAS_BODY = f"""
+        UPDATE {TICKET_SEQUENCES_TABLE} SET ultimo = new.numero_ticket
+        WHERE sucursal = new.sucursal AND kind = '{TICKET_KIND}'
+          AND new.numero_ticket > 0 AND new.afip_cae IS NULL AND ultimo < new.numero_ticket;
+        UPDATE {TICKET_SEQUENCES_TABLE} SET ultimo = new.numero_ticket_cae
+        WHERE sucursal = new.sucursal AND kind = '{TICKET_KIND_CAE}'
+          AND new.numero_ticket_cae IS NOT NULL AND ultimo < new.numero_ticket_cae;"""
+
+_TICKET_SEQ_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS ticket_seq_ventas_ai AFTER INSERT ON ventas BEGIN {_TS_VENTAS_BODY} END",
+    f"""CREATE TRIGGER IF NOT EXISTS ticket_seq_ventas_au
+        AFTER UPDATE OF numero_ticket, numero_ticket_cae, afip_cae ON ventas
+        BEGIN {_TS_VENTAS_BODY} END""",
+    f"""CREATE TRIGGER IF NOT EXISTS ticket_seq_pagos_ai AFTER INSERT ON pagos_proveedores BEGIN
+        UPDATE {TICKET_SEQUENCES_TABLE} SET ultimo = new.numero_ticket
+        WHERE sucursal = new.sucursal AND kind = '{TICKET_KIND}'
+          AND new.numero_ticket IS NOT NULL AND ultimo < new.numero_ticket;
+    END""",
+)
+
+
+def backfill_ticket_sequence(conn, sucursal: str, kind: str) -> None:
+    """Inicializa (o corrige hacia arriba) el contador de una sucursal desde los datos existentes."""
+    from sqlalchemy import text
+    ultimo = conn.execute(text(TICKET_SEQ_MAX_SQL[kind]), {"s": sucursal}).scalar() or 0
+    conn.execute(text(
+        f"INSERT INTO {TICKET_SEQUENCES_TABLE} (sucursal, kind, ultimo) VALUES (:s, :k, :u) "
+        "ON CONFLICT (sucursal, kind) DO UPDATE SET ultimo = MAX(ultimo, excluded.ultimo)"
+    ), {"s": sucursal, "k": kind, "u": int(ultimo)})
+
+
+def _ensure_ticket_sequences(conn) -> None:
+    """Crea los triggers de secuencias y hace el backfill la primera vez."""
+    from sqlalchemy import text
+    existed = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='ticket_seq_ventas_ai'"
+    )).first() is not None
+    if existed:
+        return
+    for ddl in _TICKET_SEQ_TRIGGERS:
+        conn.execute(text(ddl))
+    sucursales = [r[0] for r in conn.execute(text(
+        "SELECT DISTINCT sucursal FROM ventas UNION SELECT DISTINCT sucursal FROM pagos_proveedores"
+    )).fetchall() if r[0]]
+    for suc in sucursales:
+        backfill_ticket_sequence(conn, suc, TICKET_KIND)
+        backfill_ticket_sequence(conn, suc, TICKET_KIND_CAE)
+    logger.info("[MIGRATION] %s inicializada para %d sucursal(es)", TICKET_SEQUENCES_TABLE, len(sucursales))
+
+
+# ─── Migraciones versionadas (v6.8.0) ────────────────────────────────
+# Registro ordenado de pasos (numero, descripcion, fn(conn)). `PRAGMA
+# user_version` guarda el ultimo paso aplicado, asi que un arranque con el
+# esquema al dia no inspecciona nada. Los pasos pendientes corren juntos en
+# una sola transaccion (BEGIN IMMEDIATE): si uno falla no queda nada a medias.
+# Una BD previa a v6.8.0 arranca en user_version=0 y recorre todos los pasos,
+# por eso deben ser idempotentes. Para cambiar el esquema: agregar un paso al
+# final de MIGRACIONES; nunca renumerar ni editar uno ya publicado.
+
+def _columnas(conn, tabla: str) -> set:
+    """Columnas actuales de `tabla` (PRAGMA directo, sin cache del inspector)."""
+    from sqlalchemy import text
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({tabla})")).fetchall()}
+
+
+def _agregar_columnas(conn, tabla: str, columnas) -> list:
+    """ALTER TABLE ADD COLUMN por cada (nombre, tipo) que falte. Retorna las agregadas."""
+    from sqlalchemy import text
+    existentes = _columnas(conn, tabla)
+    agregadas = []
+    for nombre, tipo in columnas:
+        if nombre not in existentes:
+            conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}"))
+            agregadas.append(nombre)
+    if agregadas:
+        logger.info("[MIGRATION] %s: columnas agregadas %s", tabla, ", ".join(agregadas))
+    return agregadas
+
+
+# v6.8.0: mismo formato que guarda el ORM para DateTime ("YYYY-MM-DD HH:MM:SS.ffffff"),
+# asi las marcas del push incremental comparan bien contra los backfills
+_SQL_AHORA_LOCAL = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime') || '000'"
+_SQL_AHORA_UTC = "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+
+
+def _m001_columnas_legado(conn) -> None:
+    """Columnas agregadas hasta v6.7 (incluye los campos AFIP de migrate_afip_fields.py)."""
+    from sqlalchemy import text
+    # last_modified (sync Firebase) y version (optimistic locking v3.4.0)
+    if "last_modified" in _agregar_columnas(conn, "productos", [
+            ("last_modified", "DATETIME"),
+            ("version", "INTEGER DEFAULT 1 NOT NULL")]):
+        conn.execute(text(f"UPDATE productos SET last_modified = {_SQL_AHORA_UTC}"))
+    if _agregar_columnas(conn, "proveedores", [("last_modified", "DATETIME")]):
+        conn.execute(text(f"UPDATE proveedores SET last_modified = {_SQL_AHORA_UTC}"))
+
+    # AFIP, datos del comprador, notas de credito, vendedor
+    if "numero_ticket_cae" in _agregar_columnas(conn, "ventas", [
+            ("afip_cae", "VARCHAR"),
+            ("afip_cae_vencimiento", "VARCHAR"),
+            ("afip_numero_comprobante", "INTEGER"),
+            ("afip_error", "VARCHAR"),
+            ("tipo_comprobante", "VARCHAR"),
+            ("cuit_cliente", "VARCHAR"),
+            ("nombre_cliente", "VARCHAR"),
+            ("domicilio_cliente", "VARCHAR"),
+            ("localidad_cliente", "VARCHAR"),
+            ("nota_credito_cae", "VARCHAR"),
+            ("nota_credito_numero", "INTEGER"),
+            ("numero_ticket_cae", "INTEGER"),
+            ("vendedor", "VARCHAR"),
+            ("codigo_postal_cliente", "VARCHAR"),
+            ("condicion_cliente", "VARCHAR")]):
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket_cae ON ventas (numero_ticket_cae)"))
+
+    # v6.5.0: incluye_iva en pagos a proveedores
+    _agregar_columnas(conn, "pagos_proveedores", [("incluye_iva", "BOOLEAN DEFAULT 0 NOT NULL")])
+
+    # Tabla sync_log reemplazada por Firebase
+    conn.execute(text("DROP TABLE IF EXISTS sync_log"))
+
+
+_VENTAS_COLS_V5 = [
+    ("id", "INTEGER NOT NULL PRIMARY KEY"),
+    ("sucursal", "VARCHAR NOT NULL"),
+    ("fecha", "DATETIME NOT NULL"),
+    ("modo_pago", "VARCHAR NOT NULL"),
+    ("cuotas", "INTEGER"),
+    ("total", "FLOAT NOT NULL"),
+    ("subtotal_base", "FLOAT NOT NULL DEFAULT 0.0"),
+    ("interes_pct", "FLOAT NOT NULL DEFAULT 0.0"),
+    ("interes_monto", "FLOAT NOT NULL DEFAULT 0.0"),
+    ("descuento_pct", "FLOAT NOT NULL DEFAULT 0.0"),
+    ("descuento_monto", "FLOAT NOT NULL DEFAULT 0.0"),
+    ("pagado", "FLOAT"),
+    ("vuelto", "FLOAT"),
+    ("numero_ticket", "INTEGER NOT NULL"),
+    ("numero_ticket_cae", "INTEGER"),
+    ("afip_cae", "VARCHAR"),
+    ("afip_cae_vencimiento", "VARCHAR"),
+    ("afip_numero_comprobante", "INTEGER"),
+    ("afip_error", "VARCHAR"),
+    ("tipo_comprobante", "VARCHAR"),
+    ("cuit_cliente", "VARCHAR"),
+    ("nombre_cliente", "VARCHAR"),
+    ("domicilio_cliente", "VARCHAR"),
+    ("localidad_cliente", "VARCHAR"),
+    ("codigo_postal_cliente", "VARCHAR"),
+    ("condicion_cliente", "VARCHAR"),
+    ("vendedor", "VARCHAR"),
+    ("nota_credito_cae", "VARCHAR"),
+    ("nota_credito_numero", "INTEGER"),
+]
+
+
+def _m002_ventas_numero_ticket_no_unique(conn) -> None:
+    """Quita UNIQUE de ventas.numero_ticket (v5.1.0): cada sucursal tiene su secuencia.
+
+    SQLite no permite ALTER TABLE DROP CONSTRAINT, hay que recrear la tabla.
+    Se crea la nueva, se copia, se borra la vieja y se renombra la nueva (el
+    orden documentado por SQLite, asi las FK de venta_items siguen apuntando a
+    `ventas`).
+    """
+    from sqlalchemy import text
+    table_sql = conn.execute(text(
+        "SELECT sql FROM sqlite_master WHERE tbl_name='ventas' AND type='table'"
+    )).scalar() or ""
+
+    # Buscar "numero_ticket ... UNIQUE" en la definicion de columna
+    needs_rebuild = any(
+        "NUMERO_TICKET" in line.upper() and "UNIQUE" in line.upper()
+        for line in table_sql.split(",")
+    )
+
+    if not needs_rebuild:
+        # Indices UNIQUE explicitos sobre numero_ticket
+        idx_rows = conn.execute(text(
+            "SELECT name, sql FROM sqlite_master "
+            "WHERE tbl_name='ventas' AND type='index' AND sql IS NOT NULL"
+        )).fetchall()
+        for row in idx_rows:
+            idx_sql = (row[1] or "").upper()
+            if "UNIQUE" in idx_sql and "NUMERO_TICKET" in idx_sql:
+                conn.execute(text(f'DROP INDEX IF EXISTS "{row[0]}"'))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket ON ventas (numero_ticket)"))
+        return
+
+    logger.info("[MIGRATION] Recreando tabla ventas para quitar UNIQUE de numero_ticket...")
+    old_cols = _columnas(conn, "ventas")
+    ddl = ",\n    ".join(f"{c} {t}" for c, t in _VENTAS_COLS_V5)
+    conn.execute(text(f"CREATE TABLE _ventas_new (\n    {ddl}\n)"))
+
+    common = ", ".join(c for c, _ in _VENTAS_COLS_V5 if c in old_cols)
+    conn.execute(text(f"INSERT INTO _ventas_new ({common}) SELECT {common} FROM ventas"))
+    conn.execute(text("DROP TABLE ventas"))
+    conn.execute(text("ALTER TABLE _ventas_new RENAME TO ventas"))
+
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket ON ventas (numero_ticket)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket_cae ON ventas (numero_ticket_cae)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_sucursal_fecha ON ventas (sucursal, fecha)"))
+    logger.info("[MIGRATION] Tabla ventas recreada exitosamente sin UNIQUE en numero_ticket")
+
+
+def _m003_ix_ventas_fecha(conn) -> None:
+    """Indice por fecha para el listado paginado de todas las sucursales."""
+    from sqlalchemy import text
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_fecha ON ventas (fecha)"))
+
+
+def _m007_ventas_claves_naturales(conn) -> None:
+    """Indices unicos parciales (sucursal + ticket / ticket CAE) e indice del Nº AFIP.
+
+    Si la BD ya tiene claves repetidas no se puede crear el UNIQUE: se crea
+    el mismo indice sin UNIQUE y la sync sigue deduplicando con consultas.
+    """
+    from sqlalchemy import text
+    for nombre, (col, where) in VENTAS_INDICES_UNICOS.items():
+        repetidas = conn.execute(text(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM ventas WHERE {where}"
+            f" GROUP BY sucursal, {col} HAVING COUNT(*) > 1)"
+        )).scalar() or 0
+        if repetidas:
+            logger.warning("[MIGRATION] ventas: %d claves (sucursal, %s) repetidas, %s se crea sin UNIQUE",
+                           repetidas, col, nombre)
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{nombre[3:]} ON ventas (sucursal, {col}) WHERE {where}"))
+        else:
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {nombre} ON ventas (sucursal, {col}) WHERE {where}"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_ventas_sucursal_afip ON ventas (sucursal, afip_numero_comprobante)"
+        " WHERE afip_numero_comprobante IS NOT NULL"))
+
+
+def _m008_compradores_last_modified(conn) -> None:
+    """compradores.last_modified para el push incremental (v6.8.0)."""
+    from sqlalchemy import text
+    if _agregar_columnas(conn, "compradores", [("last_modified", "DATETIME")]):
+        conn.execute(text(f"UPDATE compradores SET last_modified = {_SQL_AHORA_LOCAL}"))
+
+
+MIGRACIONES = (
+    (1, "columnas hasta v6.7 (AFIP, clientes, last_modified, version)", _m001_columnas_legado),
+    (2, "ventas.numero_ticket sin UNIQUE", _m002_ventas_numero_ticket_no_unique),
+    (3, "indice ix_ventas_fecha", _m003_ix_ventas_fecha),
+    (4, "busqueda FTS5 de productos", _ensure_productos_fts),
+    (5, "resumen diario ventas_diarias", _ensure_ventas_diarias),
+    (6, "secuencias de tickets", _ensure_ticket_sequences),
+    (7, "claves naturales de ventas por sucursal", _m007_ventas_claves_naturales),
+    (8, "compradores.last_modified", _m008_compradores_last_modified),
+)
+SCHEMA_VERSION = MIGRACIONES[-1][0]
+
+
 def _run_migrations():
-    """Migraciones incrementales para actualizar esquema existente."""
-    from sqlalchemy import inspect, text
-    inspector = inspect(engine)
+    """Aplica los pasos de MIGRACIONES posteriores a `PRAGMA user_version`.
+
+    Con el esquema al dia solo lee user_version. Si hay pasos pendientes,
+    `create_all` (tablas nuevas) y los pasos corren en una unica transaccion
+    y se loguea el tiempo de cada uno.
+    """
+    import time
+    from sqlalchemy import text
+    t_inicio = time.perf_counter()
 
     with engine.connect() as conn:
-        # Agregar last_modified a productos si no existe
-        if "productos" in inspector.get_table_names():
-            cols = [c["name"] for c in inspector.get_columns("productos")]
-            if "last_modified" not in cols:
-                conn.execute(text("ALTER TABLE productos ADD COLUMN last_modified DATETIME"))
-                conn.execute(text("UPDATE productos SET last_modified = datetime('now')"))
-
-        # Agregar last_modified a proveedores si no existe
-        if "proveedores" in inspector.get_table_names():
-            cols = [c["name"] for c in inspector.get_columns("proveedores")]
-            if "last_modified" not in cols:
-                conn.execute(text("ALTER TABLE proveedores ADD COLUMN last_modified DATETIME"))
-                conn.execute(text("UPDATE proveedores SET last_modified = datetime('now')"))
-
-        # Agregar afip_error a ventas si no existe
-        if "ventas" in inspector.get_table_names():
-            cols = [c["name"] for c in inspector.get_columns("ventas")]
-            if "afip_error" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN afip_error VARCHAR"))
-
-        # Agregar version a productos si no existe (optimistic locking v3.4.0)
-        if "productos" in inspector.get_table_names():
-            cols = [c["name"] for c in inspector.get_columns("productos")]
-            if "version" not in cols:
-                conn.execute(text("ALTER TABLE productos ADD COLUMN version INTEGER DEFAULT 1 NOT NULL"))
-
-        # Eliminar tabla sync_log si existe (reemplazada por Firebase)
-        if "sync_log" in inspector.get_table_names():
-            conn.execute(text("DROP TABLE sync_log"))
-
-        # Crear tabla pagos_proveedores si no existe (v3.7.0)
-        if "pagos_proveedores" not in inspector.get_table_names():
-            from app.models import PagoProveedor
-            PagoProveedor.__table__.create(bind=engine)
-        else:
-            # Migración v6.5.0: agregar incluye_iva
-            _pp_cols = conn.execute(text("PRAGMA table_info(pagos_proveedores)")).fetchall()
-            _pp_names = [row[1] for row in _pp_cols]
-            if "incluye_iva" not in _pp_names:
-                conn.execute(text("ALTER TABLE pagos_proveedores ADD COLUMN incluye_iva BOOLEAN DEFAULT 0 NOT NULL"))
-
-        # Crear tabla compradores si no existe (v5.5.0)
-        if "compradores" not in inspector.get_table_names():
-            from app.models import Comprador
-            Comprador.__table__.create(bind=engine)
-
-        # Agregar tipo_comprobante y campos nota de crédito a ventas
-        if "ventas" in inspector.get_table_names():
-            # Usar PRAGMA directa para evitar caché del inspector
-            _pragma_cols = conn.execute(text("PRAGMA table_info(ventas)")).fetchall()
-            cols = [row[1] for row in _pragma_cols]
-            if "tipo_comprobante" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN tipo_comprobante VARCHAR"))
-            if "cuit_cliente" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN cuit_cliente VARCHAR"))
-            if "nombre_cliente" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN nombre_cliente VARCHAR"))
-            if "domicilio_cliente" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN domicilio_cliente VARCHAR"))
-            if "localidad_cliente" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN localidad_cliente VARCHAR"))
-            if "nota_credito_cae" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN nota_credito_cae VARCHAR"))
-            if "nota_credito_numero" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN nota_credito_numero INTEGER"))
-            if "numero_ticket_cae" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN numero_ticket_cae INTEGER"))
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket_cae ON ventas (numero_ticket_cae)"))
-            if "vendedor" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN vendedor VARCHAR"))
-            if "codigo_postal_cliente" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN codigo_postal_cliente VARCHAR"))
-            if "condicion_cliente" not in cols:
-                conn.execute(text("ALTER TABLE ventas ADD COLUMN condicion_cliente VARCHAR"))
-
-        # Quitar UNIQUE constraint de numero_ticket en ventas (v5.1.0)
-        # Cada sucursal tiene su propia secuencia de tickets.
-        # SQLite no permite ALTER TABLE DROP CONSTRAINT, hay que recrear la tabla.
-        if "ventas" in inspector.get_table_names():
-            # Detectar si numero_ticket tiene UNIQUE en la definición de la tabla
-            table_sql = conn.execute(text(
-                "SELECT sql FROM sqlite_master WHERE tbl_name='ventas' AND type='table'"
-            )).scalar() or ""
-            _ts_upper = table_sql.upper()
-
-            # Buscar "numero_ticket ... UNIQUE" en la definición de columna
-            needs_rebuild = False
-            if "NUMERO_TICKET" in _ts_upper:
-                # Extraer la línea de numero_ticket del CREATE TABLE
-                for line in table_sql.split(","):
-                    _lu = line.upper().strip()
-                    if "NUMERO_TICKET" in _lu and "UNIQUE" in _lu:
-                        needs_rebuild = True
-                        break
-
-            if not needs_rebuild:
-                # Verificar también índices explícitos UNIQUE
-                idx_rows = conn.execute(text(
-                    "SELECT name, sql FROM sqlite_master "
-                    "WHERE tbl_name='ventas' AND type='index' AND sql IS NOT NULL"
-                )).fetchall()
-                for row in idx_rows:
-                    idx_sql = (row[1] or "").upper()
-                    if "UNIQUE" in idx_sql and "NUMERO_TICKET" in idx_sql:
-                        # Drop the explicit index
-                        try:
-                            conn.execute(text(f'DROP INDEX IF EXISTS "{row[0]}"'))
-                        except Exception:
-                            pass
-
-            if needs_rebuild:
-                logger.info("[MIGRATION] Recreando tabla ventas para quitar UNIQUE de numero_ticket...")
-                conn.execute(text("PRAGMA foreign_keys = OFF"))
-
-                # 1) Obtener columnas actuales de la tabla vieja
-                old_cols = [c["name"] for c in inspector.get_columns("ventas")]
-
-                # 2) Renombrar tabla original
-                conn.execute(text("ALTER TABLE ventas RENAME TO _ventas_old"))
-
-                # 3) Crear nueva tabla SIN UNIQUE en numero_ticket (SQL puro)
-                conn.execute(text("""
-                    CREATE TABLE ventas (
-                        id INTEGER NOT NULL PRIMARY KEY,
-                        sucursal VARCHAR NOT NULL,
-                        fecha DATETIME NOT NULL,
-                        modo_pago VARCHAR NOT NULL,
-                        cuotas INTEGER,
-                        total FLOAT NOT NULL,
-                        subtotal_base FLOAT NOT NULL DEFAULT 0.0,
-                        interes_pct FLOAT NOT NULL DEFAULT 0.0,
-                        interes_monto FLOAT NOT NULL DEFAULT 0.0,
-                        descuento_pct FLOAT NOT NULL DEFAULT 0.0,
-                        descuento_monto FLOAT NOT NULL DEFAULT 0.0,
-                        pagado FLOAT,
-                        vuelto FLOAT,
-                        numero_ticket INTEGER NOT NULL,
-                        afip_cae VARCHAR,
-                        afip_cae_vencimiento VARCHAR,
-                        afip_numero_comprobante INTEGER,
-                        afip_error VARCHAR,
-                        tipo_comprobante VARCHAR,
-                        cuit_cliente VARCHAR,
-                        nombre_cliente VARCHAR,
-                        domicilio_cliente VARCHAR,
-                        localidad_cliente VARCHAR,
-                        nota_credito_cae VARCHAR,
-                        nota_credito_numero INTEGER
-                    )
-                """))
-
-                # 4) Copiar datos (solo columnas que existen en la nueva tabla)
-                new_cols = ["id", "sucursal", "fecha", "modo_pago", "cuotas", "total",
-                            "subtotal_base", "interes_pct", "interes_monto",
-                            "descuento_pct", "descuento_monto", "pagado", "vuelto",
-                            "numero_ticket", "afip_cae", "afip_cae_vencimiento",
-                            "afip_numero_comprobante", "afip_error", "tipo_comprobante",
-                            "cuit_cliente", "nombre_cliente", "domicilio_cliente",
-                            "localidad_cliente", "nota_credito_cae", "nota_credito_numero"]
-                common = [c for c in new_cols if c in old_cols]
-                cols_csv = ", ".join(common)
-                conn.execute(text(f"INSERT INTO ventas ({cols_csv}) SELECT {cols_csv} FROM _ventas_old"))
-
-                # 5) Eliminar tabla vieja
-                conn.execute(text("DROP TABLE _ventas_old"))
-
-                # 6) Recrear índices
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket ON ventas (numero_ticket)"))
-                conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_sucursal_fecha ON ventas (sucursal, fecha)"))
-
-                conn.execute(text("PRAGMA foreign_keys = ON"))
-                logger.info("[MIGRATION] Tabla ventas recreada exitosamente sin UNIQUE en numero_ticket")
-            else:
-                # Solo asegurar que existe el índice no-unique
-                try:
-                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ventas_numero_ticket ON ventas (numero_ticket)"))
-                except Exception:
-                    pass
-
-        conn.commit()
+        actual = conn.execute(text("PRAGMA user_version")).scalar() or 0
+        if actual >= SCHEMA_VERSION:
+            if actual > SCHEMA_VERSION:
+                logger.warning("[MIGRATION] BD con user_version=%d mayor que la de esta version (%d)",
+                               actual, SCHEMA_VERSION)
+            logger.info("[MIGRATION] Esquema al dia (user_version=%d) en %.1f ms",
+                        actual, (time.perf_counter() - t_inicio) * 1000.0)
+            return
+
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            t = time.perf_counter()
+            Base.metadata.create_all(bind=conn)
+            logger.info("[MIGRATION] create_all: %.1f ms", (time.perf_counter() - t) * 1000.0)
+
+            for numero, descripcion, paso in MIGRACIONES:
+                if numero <= actual:
+                    continue
+                t = time.perf_counter()
+                paso(conn)
+                conn.exec_driver_sql(f"PRAGMA user_version = {int(numero)}")
+                logger.info("[MIGRATION] #%d %s: %.1f ms",
+                            numero, descripcion, (time.perf_counter() - t) * 1000.0)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.exception("[MIGRATION] Fallo la migracion, BD sigue en user_version=%d", actual)
+            raise
+
+    logger.info("[MIGRATION] user_version %d -> %d en %.1f ms",
+                actual, SCHEMA_VERSION, (time.perf_counter() - t_inicio) * 1000.0)
 
 
 def init_db():
-    # Si la BD no existe, se crea con las tablas al vuelo
+    # Si la BD no existe, se crea con las tablas al vuelo (create_all corre
+    # dentro de _run_migrations solo cuando hay pasos pendientes)
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    Base.metadata.create_all(bind=engine)
     _run_migrations()
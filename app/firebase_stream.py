@@ -0,0 +1,213 @@
+# app/firebase_stream.py
+"""
+Escucha de cambios en tiempo real para el modo "stream" de la sync (v6.8.0).
+
+En modo "interval" cada tick del QTimer hace una sync completa (flush + pull
+paginado de los 5 tipos) aunque no haya nada nuevo, y las ventas de otra
+sucursal tardan hasta un intervalo en llegar. En modo "stream":
+
+  - CambiosListener abre un stream de la REST API de Firebase (GET con
+    Accept: text/event-stream) por cada tipo de cambios/, con
+    orderBy="$key"&limitToLast=1 para que el `put` inicial traiga un solo
+    cambio y no todo el log;
+  - cuando llega un cambio de otra sucursal avisa con los tipos afectados
+    (on_cambios) y la ventana principal hace un pull por cursor solo de esos
+    tipos. Los cambios propios y los borrados del cleanup (data null) se
+    ignoran; varios eventos seguidos se juntan en un aviso (STREAM_DEBOUNCE);
+  - al (re)conectar cada tipo se avisa una vez, para ponerse al dia con lo que
+    pudo llegar mientras no habia stream;
+  - si un stream se corta se reconecta con backoff exponencial con jitter.
+    Con STREAM_FALLOS_POLLING fallos seguidos el estado pasa a "polling" y la
+    ventana vuelve al timer de intervalo hasta que todos reconecten.
+
+Los callbacks se llaman desde los hilos del listener.
+"""
+import logging
+import random
+import threading
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from app.firebase_transport import FirebaseTransport, eventos_sse
+
+logger = logging.getLogger(__name__)
+
+TIPOS = ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores")
+STREAM_DEBOUNCE = 2.0        # segundos para juntar eventos en un solo aviso
+STREAM_BACKOFF_MIN = 1.0     # segundos antes del primer reintento
+STREAM_BACKOFF_MAX = 60.0    # tope del backoff
+STREAM_FALLOS_POLLING = 3    # fallos seguidos de un tipo para volver al polling
+STREAM_RESPALDO_MINUTOS = 30  # sync completa de respaldo mientras el stream funciona
+
+ESTADO_CONECTANDO = "conectando"
+ESTADO_CONECTADO = "conectado"
+ESTADO_POLLING = "polling"
+
+
+class ErrorStream(Exception):
+    """El stream se corto o Firebase lo rechazo (se reintenta con backoff)."""
+
+
+class CambiosListener:
+    """Un hilo por tipo escuchando cambios/{tipo}; avisa que tipos hay que bajar."""
+
+    def __init__(self, sucursal_local: str, on_cambios: Callable[[Set[str]], None],
+                 on_estado: Optional[Callable[[str], None]] = None,
+                 tipos: Iterable[str] = TIPOS, debounce: float = STREAM_DEBOUNCE):
+        self.sucursal_local = sucursal_local
+        self.tipos = tuple(tipos)
+        self.estado = ESTADO_CONECTANDO
+        self._on_cambios = on_cambios
+        self._on_estado = on_estado
+        self._debounce = debounce
+        self._transport = FirebaseTransport.get_instance()
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._respuestas: Dict[str, object] = {}
+        self._fallos: Dict[str, int] = {t: 0 for t in self.tipos}
+        self._conectados: Set[str] = set()
+        self._pendientes: Set[str] = set()
+        self._timer: Optional[threading.Timer] = None
+        self._hilos = []
+
+    def iniciar(self) -> "CambiosListener":
+        for tipo in self.tipos:
+            hilo = threading.Thread(target=self._escuchar, args=(tipo,),
+                                    name=f"SyncStream-{tipo}", daemon=True)
+            self._hilos.append(hilo)
+            hilo.start()
+        return self
+
+    def detener(self, esperar: float = 0.0):
+        """Corta los streams (cierra las conexiones abiertas) y cancela el aviso pendiente."""
+        self._parar.set()
+        with self._lock:
+            respuestas = list(self._respuestas.values())
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for resp in respuestas:
+            try:
+                resp.close()
+            except Exception:
+                pass
+        if esperar:
+            for hilo in self._hilos:
+                hilo.join(esperar)
+
+    # ─── Hilos ───────────────────────────────────────────────────────
+
+    def _escuchar(self, tipo: str):
+        params = {"orderBy": '"$key"', "limitToLast": 1}
+        while not self._parar.is_set():
+            resp = None
+            try:
+                resp = self._transport.abrir_stream(f"cambios/{tipo}", params)
+                with self._lock:
+                    self._respuestas[tipo] = resp
+                if resp.status_code != 200:
+                    raise ErrorStream(f"HTTP {resp.status_code}")
+                primero = True
+                for evento, data in eventos_sse(resp):
+                    if self._parar.is_set():
+                        break
+                    if evento in ("put", "patch"):
+                        self._marcar_conectado(tipo)
+                        if primero or self._hay_ajenos(data):
+                            self._avisar(tipo)
+                        primero = False
+                    elif evento == "keep-alive":
+                        self._marcar_conectado(tipo)
+                    elif evento == "cancel":
+                        raise ErrorStream("cancel (sin permiso de lectura)")
+                    elif evento == "auth_revoked":
+                        raise ErrorStream("auth_revoked (token vencido)")
+                if not self._parar.is_set():
+                    raise ErrorStream("el servidor cerro el stream")
+            except Exception as e:
+                if self._parar.is_set():
+                    break
+                espera = self._marcar_fallo(tipo, e)
+                self._parar.wait(espera)
+            finally:
+                with self._lock:
+                    if self._respuestas.get(tipo) is resp:
+                        self._respuestas.pop(tipo, None)
+                if resp is not None:
+                    resp.close()
+
+    def _hay_ajenos(self, data) -> bool:
+        """True si el evento trae algun cambio que no es de esta sucursal."""
+        if not isinstance(data, dict) or data.get("data") is None:
+            return False   # borrado (cleanup) o evento sin datos
+        partes = [p for p in str(data.get("path") or "/").split("/") if p]
+        valor = data["data"]
+        if len(partes) == 1:
+            valor = {partes[0]: valor}
+        elif partes:
+            return True    # edicion dentro de un cambio: no se sabe de quien es
+        if not isinstance(valor, dict):
+            return True
+        return any(not isinstance(c, dict) or c.get("sucursal_origen") != self.sucursal_local
+                   for c in valor.values() if c is not None)
+
+    # ─── Estado y avisos ─────────────────────────────────────────────
+
+    def _marcar_conectado(self, tipo: str):
+        with self._lock:
+            if tipo in self._conectados:
+                return
+            self._conectados.add(tipo)
+            self._fallos[tipo] = 0
+        logger.info("[SYNC STREAM] %s conectado", tipo)
+        self._actualizar_estado()
+
+    def _marcar_fallo(self, tipo: str, error: Exception) -> float:
+        """Registra el fallo y retorna cuantos segundos esperar antes de reconectar."""
+        with self._lock:
+            self._conectados.discard(tipo)
+            self._fallos[tipo] += 1
+            fallos = self._fallos[tipo]
+        espera = min(STREAM_BACKOFF_MAX, STREAM_BACKOFF_MIN * 2 ** (fallos - 1))
+        espera *= random.uniform(0.5, 1.0)   # jitter: que las sucursales no reconecten juntas
+        logger.warning("[SYNC STREAM] %s: %s (fallo %d, reintento en %.1fs)", tipo, error, fallos, espera)
+        self._actualizar_estado()
+        return espera
+
+    def _actualizar_estado(self):
+        with self._lock:
+            if len(self._conectados) == len(self.tipos):
+                estado = ESTADO_CONECTADO
+            elif max(self._fallos.values(), default=0) >= STREAM_FALLOS_POLLING:
+                estado = ESTADO_POLLING
+            elif self.estado == ESTADO_POLLING:
+                estado = ESTADO_POLLING   # sigue en polling hasta que reconecten todos
+            else:
+                estado = ESTADO_CONECTANDO
+            cambio = estado != self.estado
+            self.estado = estado
+        if cambio:
+            logger.info("[SYNC STREAM] estado: %s", estado)
+            if self._on_estado:
+                try:
+                    self._on_estado(estado)
+                except Exception as e:
+                    logger.warning("[SYNC STREAM] on_estado fallo: %s", e)
+
+    def _avisar(self, tipo: str):
+        with self._lock:
+            self._pendientes.add(tipo)
+            if self._timer is None and not self._parar.is_set():
+                self._timer = threading.Timer(self._debounce, self._disparar)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _disparar(self):
+        with self._lock:
+            tipos, self._pendientes = self._pendientes, set()
+            self._timer = None
+        if not tipos or self._parar.is_set():
+            return
+        try:
+            self._on_cambios(tipos)
+        except Exception as e:
+            logger.warning("[SYNC STREAM] on_cambios fallo: %s", e)
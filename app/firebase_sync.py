@@ -12,31 +12,51 @@ Arquitectura:
 - Cola offline: cambios se guardan localmente si no hay internet
 """
 
+import hashlib
 import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import random
 import string
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from urllib.parse import quote
 from typing import Dict, List, Optional, Tuple
 
 import requests
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import String, and_, case, func, or_, text, type_coerce
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.exc import IntegrityError, OperationalError
 
-from app.models import Venta, VentaItem, Producto, Proveedor, VentaLog, PagoProveedor, Comprador
+from app.models import (Venta, VentaItem, Producto, Proveedor, VentaLog, PagoProveedor, Comprador,
+                        VENTAS_INDICES_UNICOS)
 from app.config import load as load_config, save as save_config, _get_app_data_dir
+from app.firebase_transport import FirebaseTransport, LoteJSON
+from app.sync_state import SyncState
 
 logger = logging.getLogger("firebase_sync")
 
-QUEUE_FILENAME = "sync_queue.json"
-PENDING_DELETES_FILENAME = "sync_pending_deletes.json"  # v6.7.1
-MAX_QUEUE_SIZE = 10000
 REQUEST_TIMEOUT = 30   # segundos (para requests normales)
 BATCH_TIMEOUT = 120    # segundos (para batch PATCH con muchos datos)
 BATCH_SIZE = 500       # productos por batch en sync inicial
 PAGE_SIZE = 500  # entradas por pagina en pull (Firebase REST paginacion)
+PULL_WORKERS = 3       # v6.8.0: GETs de pull en paralelo (los apply siguen en un solo hilo)
+CLEANUP_CHUNK = 500    # v6.8.0: keys borrados por PATCH en el cleanup
+CLEANUP_PAUSA = 0.5    # v6.8.0: segundos entre PATCH del cleanup en segundo plano
+# v6.8.0: snapshots/{tipo} = ultimo cambio por entidad (tipo -> campo que la identifica)
+SNAPSHOT_TIPOS = {"productos": "codigo_barra", "proveedores": "nombre", "compradores": "cuit"}
+SNAPSHOT_INTERVALO_HORAS = 24      # cada cuanto se regenera un snapshot
+SNAPSHOT_MARGEN_MS = 3600 * 1000   # los cambios de la ultima hora quedan afuera (llegadas tardias)
+# v6.8.0: resumenes/{dia}/{sucursal} para el dashboard web
+RESUMENES_DIAS = 40    # dias hacia atras que se recalculan en cada sync (cubre el IVA del mes)
+RESUMENES_TOP = 10     # productos mas vendidos por dia
+
+# v6.8.0: un solo cleanup en segundo plano a la vez (los siguientes esperan)
+_limpieza_lock = threading.Lock()
 
 
 class FirebaseSyncManager:
@@ -48,9 +68,19 @@ class FirebaseSyncManager:
     def __init__(self, session: Session, sucursal_local: str):
         self.session = session
         self.sucursal_local = sucursal_local
-        self._queue_path = os.path.join(_get_app_data_dir(), QUEUE_FILENAME)
         self._log_path = os.path.join(_get_app_data_dir(), "logs", "sync.log")
         self._price_mismatches = []
+        # v6.8.0: estado de la pagina en curso del pull (ver _abrir_pagina)
+        self._savepoint = None
+        self._cache_pagina = None
+        # v6.8.0: push keys a borrar de cambios/ en el cleanup diferido {tipo: [keys]}
+        self._limpieza: Dict[str, List[str]] = {}
+        # v6.8.0: metricas de la sync en curso (None fuera de ejecutar_sincronizacion_completa)
+        self._telemetria: Optional[dict] = None
+        # v6.8.0: fallos / salteados del tipo en curso del pull (ver _contabilidad_pull)
+        self._cont_pull: Optional[dict] = None
+        # v6.8.0: si la BD tiene los indices unicos de ventas (migracion #7); se consulta una vez
+        self._ventas_unicas: Optional[bool] = None
         os.makedirs(os.path.dirname(self._log_path), exist_ok=True)
         # Adjuntar RotatingFileHandler dedicado al logger del modulo (5MB x 5 backups)
         # para que los _log() escriban con rotacion automatica en lugar del open() manual.
@@ -59,36 +89,29 @@ class FirebaseSyncManager:
             self._sync_logger = get_module_logger(f"{__name__}.fs", filename="sync.log")
         except Exception:
             self._sync_logger = logger  # fallback al logger del modulo
+        # v6.8.0: HTTP keep-alive + config cacheada, compartidos por proceso
+        self._http = FirebaseTransport.get_instance()
 
     # ─── Configuracion ───────────────────────────────────────────────
 
     def _get_sync_config(self) -> dict:
-        cfg = load_config()
-        return cfg.get("sync", {})
+        # v6.8.0: cacheada en el transporte (se invalida en config.save)
+        return self._http.sync_config()
 
     def _get_firebase_config(self) -> Tuple[str, str]:
         """Retorna (database_url, auth_token) desde la config."""
-        sync_cfg = self._get_sync_config()
-        fb = sync_cfg.get("firebase", {})
-        return fb.get("database_url", ""), fb.get("auth_token", "")
+        return self._http.firebase_config()
 
     # ─── Firebase REST helpers ────────────────────────────────────────
 
-    def _firebase_url(self, path: str) -> str:
-        db_url, token = self._get_firebase_config()
-        db_url = db_url.rstrip("/")
-        path = path.strip("/")
-        return f"{db_url}/{path}.json?auth={token}"
-
     def _firebase_get(self, path: str, params: dict = None) -> Optional[dict]:
+        """GET de un nodo."""
         try:
-            url = self._firebase_url(path)
-            resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            resp = self._http.request("GET", path, params=params, timeout=REQUEST_TIMEOUT)
             if resp.status_code != 200:
                 self._log(f"GET {path} HTTP {resp.status_code}: {resp.text[:200]}")
                 return None
-            result = resp.json()
-            return result
+            return resp.json()
         except Exception as e:
             self._log(f"GET {path} error: {e}")
             return None
@@ -96,8 +119,7 @@ class FirebaseSyncManager:
     def _firebase_post(self, path: str, data: dict) -> Optional[str]:
         """POST (push) data. Retorna el push key generado o None."""
         try:
-            url = self._firebase_url(path)
-            resp = requests.post(url, json=data, timeout=REQUEST_TIMEOUT)
+            resp = self._http.request("POST", path, json=data, timeout=REQUEST_TIMEOUT)
             if resp.status_code != 200:
                 self._log(f"POST {path} HTTP {resp.status_code}: {resp.text[:200]}")
                 return None
@@ -111,8 +133,7 @@ class FirebaseSyncManager:
 
     def _firebase_put(self, path: str, data) -> bool:
         try:
-            url = self._firebase_url(path)
-            resp = requests.put(url, json=data, timeout=REQUEST_TIMEOUT)
+            resp = self._http.request("PUT", path, json=data, timeout=REQUEST_TIMEOUT)
             resp.raise_for_status()
             return True
         except Exception as e:
@@ -122,8 +143,7 @@ class FirebaseSyncManager:
     def _firebase_patch(self, path: str, data: dict) -> bool:
         """PATCH (multi-path update) para escribir multiples keys de una vez."""
         try:
-            url = self._firebase_url(path)
-            resp = requests.patch(url, json=data, timeout=BATCH_TIMEOUT)
+            resp = self._http.request("PATCH", path, json=data, timeout=BATCH_TIMEOUT)
             if resp.status_code != 200:
                 self._log(f"PATCH {path} HTTP {resp.status_code}: {resp.text[:500]}")
                 return False
@@ -135,8 +155,7 @@ class FirebaseSyncManager:
     def _firebase_delete(self, path: str) -> bool:
         """DELETE de un node en Firebase. Usado por el auto-cleanup (v6.6.0)."""
         try:
-            url = self._firebase_url(path)
-            resp = requests.delete(url, timeout=10)
+            resp = self._http.request("DELETE", path, timeout=10)
             if resp.status_code not in (200, 204):
                 self._log(f"DELETE {path} HTTP {resp.status_code}: {resp.text[:200]}")
                 return False
@@ -162,42 +181,35 @@ class FirebaseSyncManager:
             db_url, token = self._get_firebase_config()
             if not db_url:
                 return False
-            url = f"{db_url.rstrip('/')}/.json?auth={token}&shallow=true"
-            resp = requests.get(url, timeout=5)
+            resp = self._http.request("GET", "", params={"shallow": "true"}, timeout=5)
             return resp.status_code == 200
         except Exception:
             return False
 
     # ─── Cola offline ─────────────────────────────────────────────────
 
+    # v6.8.0: la cola es la tabla offline_queue de sync_state.db (append-only,
+    # se borra por id al confirmar el envio). Ver app/sync_state.py.
+
     def _load_offline_queue(self) -> List[dict]:
         try:
-            if os.path.exists(self._queue_path):
-                with open(self._queue_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                return data if isinstance(data, list) else []
+            return [c for _, c in SyncState.get_instance().pendientes()]
         except Exception as e:
             self._log(f"Error cargando cola offline: {e}")
         return []
 
-    def _save_offline_queue(self, queue: List[dict]):
+    def _enqueue_change(self, tipo: str, accion: str, data: dict):
         try:
-            with open(self._queue_path, "w", encoding="utf-8") as f:
-                json.dump(queue[-MAX_QUEUE_SIZE:], f, ensure_ascii=False)
+            SyncState.get_instance().encolar({
+                "tipo": tipo,
+                "accion": accion,
+                "sucursal_origen": self.sucursal_local,
+                "timestamp": int(time.time() * 1000),
+                "data": data
+            })
         except Exception as e:
             self._log(f"Error guardando cola offline: {e}")
 
-    def _enqueue_change(self, tipo: str, accion: str, data: dict):
-        queue = self._load_offline_queue()
-        queue.append({
-            "tipo": tipo,
-            "accion": accion,
-            "sucursal_origen": self.sucursal_local,
-            "timestamp": int(time.time() * 1000),
-            "data": data
-        })
-        self._save_offline_queue(queue)
-
     def _flush_offline_queue(self, by_type: bool = False):
         """Envia todos los cambios en cola a Firebase.
 
@@ -205,25 +217,41 @@ class FirebaseSyncManager:
         por tipo, util para el panel de estado de sync. Si by_type=False (default), mantiene
         el contrato viejo y devuelve solo el int total (compat con callers existentes).
         """
-        queue = self._load_offline_queue()
+        cola = SyncState.get_instance()
+        queue = cola.pendientes()
         if not queue:
             return {} if by_type else 0
 
+        # v6.8.0: agrupado por tipo y enviado en batches PATCH de BATCH_SIZE con
+        # push keys generados aca (como push_all_existing), en vez de un POST
+        # por cambio. Los keys de un tipo salen ordenados como la cola.
+        por_tipo: Dict[str, List[Tuple[int, dict]]] = {}
+        for qid, change in queue:
+            por_tipo.setdefault(change.get("tipo") or "?", []).append((qid, change))
+
         sent_by_type: Dict[str, int] = {}
-        remaining = []
-        for change in queue:
-            tipo = change.get("tipo") or "?"
-            path = f"cambios/{tipo}"
-            key = self._firebase_post(path, change)
-            if key:
-                sent_by_type[tipo] = sent_by_type.get(tipo, 0) + 1
-            else:
-                remaining.append(change)
+        remaining = 0
+        for tipo, cambios in por_tipo.items():
+            ts = int(time.time() * 1000)
+            for i in range(0, len(cambios), BATCH_SIZE):
+                lote = cambios[i:i + BATCH_SIZE]
+                batch = LoteJSON()
+                for j, (_, change) in enumerate(lote):
+                    batch[self._generate_push_key(ts, seq=i + j)] = change
+                if not self._batch_patch(f"cambios/{tipo}", batch):
+                    # Se corta el tipo: si siguieran los batches posteriores, un
+                    # update podria quedar en Firebase antes que su create.
+                    remaining += len(cambios) - i
+                    self._log(f"Cola offline: batch {tipo} fallo, quedan {len(cambios) - i} en cola")
+                    break
+                # ack por batch: si la app se corta a mitad, no se reenvia lo ya aceptado
+                cola.confirmar([qid for qid, _ in lote])
+                sent_by_type[tipo] = sent_by_type.get(tipo, 0) + len(lote)
 
-        self._save_offline_queue(remaining)
+        cola.compactar()
         total_sent = sum(sent_by_type.values())
         if total_sent > 0:
-            self._log(f"Cola offline: {total_sent} enviados ({sent_by_type}), {len(remaining)} pendientes")
+            self._log(f"Cola offline: {total_sent} enviados ({sent_by_type}), {remaining} pendientes")
         return sent_by_type if by_type else total_sent
 
     # ─── Push: local -> Firebase ──────────────────────────────────────
@@ -387,7 +415,7 @@ class FirebaseSyncManager:
         if not sync_cfg.get("sync_productos", True):
             return True
         ts_base = int(time.time() * 1000)
-        batch = {}
+        batch = LoteJSON()
         data_by_key = {}
         for i, prod in enumerate(productos):
             key = self._generate_push_key()
@@ -537,25 +565,39 @@ class FirebaseSyncManager:
     # ─── Sync inicial: subir todo lo existente ───────────────────────
 
     @staticmethod
-    def _generate_push_key():
-        """Genera un key unico estilo Firebase push key (20 chars)."""
+    def _generate_push_key(ts: int = None, seq: int = None):
+        """Genera un key unico estilo Firebase push key (20 chars).
+
+        v6.8.0: con `ts` fijo y `seq` creciente los keys salen ordenados en el
+        mismo orden que `seq` (los 4 primeros chars aleatorios codifican seq),
+        para que un batch conserve el orden de la cola al pullearse por $key.
+        """
         chars = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
-        ts = int(time.time() * 1000)
+        if ts is None:
+            ts = int(time.time() * 1000)
         key_parts = []
         for _ in range(8):
             key_parts.append(chars[ts % 64])
             ts //= 64
         key_parts.reverse()
-        # 12 chars aleatorios
-        for _ in range(12):
+        n_random = 12
+        if seq is not None:
+            seq_parts = []
+            for _ in range(4):
+                seq_parts.append(chars[seq % 64])
+                seq //= 64
+            key_parts.extend(reversed(seq_parts))
+            n_random = 8
+        # chars aleatorios
+        for _ in range(n_random):
             key_parts.append(random.choice(chars))
         return "".join(key_parts)
 
-    def _batch_patch(self, path: str, batch: dict) -> bool:
-        """Envia un batch de datos via PATCH (multi-path update)."""
+    def _batch_patch(self, path: str, batch) -> bool:
+        """Envia un batch de datos via PATCH (multi-path update). `batch` es un dict
+        o un LoteJSON (v6.8.0: ya serializado a medida que se armo)."""
         try:
-            url = self._firebase_url(path)
-            resp = requests.patch(url, json=batch, timeout=BATCH_TIMEOUT)
+            resp = self._http.request("PATCH", path, json=batch, timeout=BATCH_TIMEOUT)
             if resp.status_code != 200:
                 self._log(f"BATCH PATCH {path} HTTP {resp.status_code}: {resp.text[:200]}")
                 return False
@@ -567,7 +609,67 @@ class FirebaseSyncManager:
     # Tipos validos para bulk push selectivo (v6.7.0)
     _BULK_PUSH_TIPOS = ("productos", "proveedores", "ventas", "pagos_proveedores", "compradores")
 
-    def push_all_existing(self, callback=None, tipos=None) -> Dict[str, int]:
+    # v6.8.0: columna que hace de marca de agua en el push incremental. Productos,
+    # proveedores y compradores tienen last_modified (onupdate) y la marca es el par
+    # (last_modified, id): un import masivo deja a todas sus filas con el mismo
+    # last_modified. Ventas y pagos son append-only y avanzan por id.
+    _MARCAS_PUSH = {
+        "productos": (Producto, "last_modified"),
+        "proveedores": (Proveedor, "last_modified"),
+        "compradores": (Comprador, "last_modified"),
+        "ventas": (Venta, "id"),
+        "pagos_proveedores": (PagoProveedor, "id"),
+    }
+
+    def _query_push(self, tipo: str, completo: bool = False):
+        """Query de las filas de `tipo` a subir, ordenada por su marca.
+
+        Con completo=False se queda con lo posterior a la ultima marca guardada
+        (si no hay marca, todo). Para los tipos con last_modified cada fila viene
+        como (objeto, last_modified en texto tal cual esta guardado).
+        """
+        modelo, campo = self._MARCAS_PUSH[tipo]
+        col = getattr(modelo, campo)
+        q = self.session.query(modelo)
+        if campo != "id":
+            # Se compara el texto guardado, no un datetime re-serializado: los
+            # backfills por SQL guardan "YYYY-MM-DD HH:MM:SS" sin microsegundos y
+            # contra "...SS.000000" ni el empate ni el ">" darian bien
+            col = type_coerce(col, String)
+            q = q.add_columns(col)
+        marca = None if completo else SyncState.get_instance().marca_push(tipo)
+        if marca is not None:
+            try:
+                if campo == "id":
+                    q = q.filter(col > int(marca))
+                else:
+                    texto, sep, ultimo_id = marca.rpartition("|")
+                    if not sep:
+                        raise ValueError(marca)
+                    q = q.filter(or_(col > texto, and_(col == texto, modelo.id > int(ultimo_id))))
+            except ValueError:
+                self._log(f"Marca de push invalida para {tipo} ({marca!r}), se sube todo")
+        if campo == "id":
+            return q.order_by(modelo.id)
+        return q.order_by(col, modelo.id)
+
+    def _guardar_marca_push(self, tipo: str, valor) -> None:
+        """Guarda la marca de `tipo` (ultimo valor subido sin fallos previos):
+        un id, o el par (last_modified en texto, id) que se guarda como "texto|id"."""
+        if valor is None:
+            return
+        if isinstance(valor, tuple):
+            valor = f"{valor[0]}|{valor[1]}"
+        try:
+            SyncState.get_instance().guardar_marca_push(tipo, str(valor))
+        except Exception as e:
+            self._log(f"No se pudo guardar la marca de push de {tipo}: {e}")
+
+    def contar_para_push(self, tipo: str, completo: bool = False) -> int:
+        """Cantidad de filas que subiria push_all_existing para `tipo`."""
+        return self._query_push(tipo, completo).order_by(None).count()
+
+    def push_all_existing(self, callback=None, tipos=None, completo: bool = False) -> Dict[str, int]:
         """
         Sube los datos locales existentes a Firebase usando batch PATCH.
 
@@ -578,6 +680,11 @@ class FirebaseSyncManager:
         En vez de 1 HTTP request por item (14K requests = horas), agrupa de a BATCH_SIZE (500)
         en un solo PATCH (28 requests = minutos).
 
+        v6.8.0: incremental. Por tipo se guarda una marca ((last_modified, id) o id,
+        ver _MARCAS_PUSH) hasta la ultima fila de un batch aceptado sin fallos antes;
+        el siguiente push sube solo lo posterior. completo=True ignora las marcas
+        y sube todo (y las vuelve a fijar).
+
         callback(progreso, total, tipo) se llama para informar progreso.
         Retorna {"productos": N, "proveedores": N, "ventas": N, "pagos_proveedores": N,
                  "compradores": N, "errores": N}
@@ -591,28 +698,33 @@ class FirebaseSyncManager:
         result["errores"] = 0
 
         if "productos" in seleccion:
-            self._push_all_productos_batch(result, callback)
+            self._push_all_productos_batch(result, callback, completo)
         if "proveedores" in seleccion:
-            self._push_all_proveedores_batch(result, callback)
+            self._push_all_proveedores_batch(result, callback, completo)
         if "compradores" in seleccion:
-            self._push_all_compradores_batch(result, callback)
+            self._push_all_compradores_batch(result, callback, completo)
         if "ventas" in seleccion:
-            self._push_all_ventas_batch(result, callback)
+            self._push_all_ventas_batch(result, callback, completo)
         if "pagos_proveedores" in seleccion:
-            self._push_all_pagos_proveedores_batch(result, callback)
+            self._push_all_pagos_proveedores_batch(result, callback, completo)
 
-        self._log(f"Sync inicial completada (tipos={sorted(seleccion)}): {result}")
+        self._log(f"Sync inicial completada (tipos={sorted(seleccion)}, "
+                  f"{'completa' if completo else 'incremental'}): {result}")
         return result
 
-    def _push_all_productos_batch(self, result: dict, callback=None) -> None:
+    def _push_all_productos_batch(self, result: dict, callback=None, completo: bool = True) -> None:
         ts_base = int(time.time() * 1000)
         try:
-            productos = self.session.query(Producto).all()
+            productos = self._query_push("productos", completo).all()
             total = len(productos)
             self._log(f"Sync inicial: subiendo {total} productos en batches de {BATCH_SIZE}...")
 
-            batch = {}
-            for i, prod in enumerate(productos):
+            batch = LoteJSON()
+            marca_batch = marca_ok = None
+            fallo = False
+            for i, (prod, marca_texto) in enumerate(productos):
+                if marca_texto is not None:
+                    marca_batch = (marca_texto, prod.id)
                 key = self._generate_push_key()
                 batch[key] = {
                     "sucursal_origen": self.sucursal_local,
@@ -632,24 +744,32 @@ class FirebaseSyncManager:
                     ok = self._batch_patch("cambios/productos", batch)
                     if ok:
                         result["productos"] += len(batch)
+                        if not fallo:
+                            marca_ok = marca_batch
                     else:
+                        fallo = True
                         result["errores"] += len(batch)
                         self._log(f"Batch productos fallo ({len(batch)} items)")
-                    batch = {}
+                    batch = LoteJSON()
                     if callback:
                         callback(i + 1, total, "productos")
+            self._guardar_marca_push("productos", marca_ok)
         except Exception as e:
             self._log(f"Sync inicial productos error: {e}")
 
-    def _push_all_proveedores_batch(self, result: dict, callback=None) -> None:
+    def _push_all_proveedores_batch(self, result: dict, callback=None, completo: bool = True) -> None:
         ts_base = int(time.time() * 1000)
         try:
-            proveedores = self.session.query(Proveedor).all()
+            proveedores = self._query_push("proveedores", completo).all()
             total = len(proveedores)
             self._log(f"Sync inicial: subiendo {total} proveedores en batches de {BATCH_SIZE}...")
 
-            batch = {}
-            for i, prov in enumerate(proveedores):
+            batch = LoteJSON()
+            marca_batch = marca_ok = None
+            fallo = False
+            for i, (prov, marca_texto) in enumerate(proveedores):
+                if marca_texto is not None:
+                    marca_batch = (marca_texto, prov.id)
                 key = self._generate_push_key()
                 batch[key] = {
                     "sucursal_origen": self.sucursal_local,
@@ -666,25 +786,33 @@ class FirebaseSyncManager:
                     ok = self._batch_patch("cambios/proveedores", batch)
                     if ok:
                         result["proveedores"] += len(batch)
+                        if not fallo:
+                            marca_ok = marca_batch
                     else:
+                        fallo = True
                         result["errores"] += len(batch)
                         self._log(f"Batch proveedores fallo ({len(batch)} items)")
-                    batch = {}
+                    batch = LoteJSON()
                     if callback:
                         callback(i + 1, total, "proveedores")
+            self._guardar_marca_push("proveedores", marca_ok)
         except Exception as e:
             self._log(f"Sync inicial proveedores error: {e}")
 
-    def _push_all_compradores_batch(self, result: dict, callback=None) -> None:
+    def _push_all_compradores_batch(self, result: dict, callback=None, completo: bool = True) -> None:
         """v6.7.0: sube todos los compradores (clientes) locales en batches PATCH."""
         ts_base = int(time.time() * 1000)
         try:
-            compradores = self.session.query(Comprador).all()
+            compradores = self._query_push("compradores", completo).all()
             total = len(compradores)
             self._log(f"Sync inicial: subiendo {total} compradores en batches de {BATCH_SIZE}...")
 
-            batch = {}
-            for i, comp in enumerate(compradores):
+            batch = LoteJSON()
+            marca_batch = marca_ok = None
+            fallo = False
+            for i, (comp, marca_texto) in enumerate(compradores):
+                if marca_texto is not None:
+                    marca_batch = (marca_texto, comp.id)
                 key = self._generate_push_key()
                 batch[key] = {
                     "sucursal_origen": self.sucursal_local,
@@ -703,31 +831,47 @@ class FirebaseSyncManager:
                     ok = self._batch_patch("cambios/compradores", batch)
                     if ok:
                         result["compradores"] += len(batch)
+                        if not fallo:
+                            marca_ok = marca_batch
                     else:
+                        fallo = True
                         result["errores"] += len(batch)
                         self._log(f"Batch compradores fallo ({len(batch)} items)")
-                    batch = {}
+                    batch = LoteJSON()
                     if callback:
                         callback(i + 1, total, "compradores")
+            self._guardar_marca_push("compradores", marca_ok)
         except Exception as e:
             self._log(f"Sync inicial compradores error: {e}")
 
-    def _push_all_ventas_batch(self, result: dict, callback=None) -> None:
+    def _push_all_ventas_batch(self, result: dict, callback=None, completo: bool = True) -> None:
         """v6.7.0: sube todas las ventas locales (creates) y luego sus NCs como updates.
 
         Las NCs van separadas con accion="update" después del create para que el dashboard
         merge la información sobre la venta original (mantiene compatibilidad con el flujo
         normal en linea de push_venta_modificada).
+
+        v6.8.0: items y productos se cargan con selectinload (un par de SELECT IN
+        por query en vez de dos lazy loads por venta). La marca es el id: una NC
+        emitida despues del push viaja por push_venta_modificada, no por aca.
         """
         ts_base = int(time.time() * 1000)
         try:
-            ventas = self.session.query(Venta).all()
+            ventas = (self._query_push("ventas", completo)
+                      .options(selectinload(Venta.items).selectinload(VentaItem.producto))
+                      .all())
             total = len(ventas)
+            puntos_venta = {}
             self._log(f"Sync inicial: subiendo {total} ventas en batches de {BATCH_SIZE}...")
 
-            batch = {}
+            batch = LoteJSON()
             ncs_updates = []  # acumular NCs para enviar después
+            marca_batch = marca_ok = None
+            fallo = False
             for i, v in enumerate(ventas):
+                marca_batch = v.id
+                if v.sucursal not in puntos_venta:
+                    puntos_venta[v.sucursal] = self._resolver_punto_venta(v.sucursal)
                 key = self._generate_push_key()
                 items_data = []
                 for it in (v.items or []):
@@ -763,7 +907,7 @@ class FirebaseSyncManager:
                         "afip_cae_vencimiento": v.afip_cae_vencimiento,
                         "afip_numero_comprobante": v.afip_numero_comprobante,
                         "tipo_comprobante": v.tipo_comprobante,
-                        "punto_venta": self._resolver_punto_venta(v.sucursal),
+                        "punto_venta": puntos_venta[v.sucursal],
                         # No mandamos nota_credito_* en el create — se manda como update separado
                         "items": items_data,
                     },
@@ -780,10 +924,13 @@ class FirebaseSyncManager:
                     ok = self._batch_patch("cambios/ventas", batch)
                     if ok:
                         result["ventas"] += len(batch)
+                        if not fallo:
+                            marca_ok = marca_batch
                     else:
+                        fallo = True
                         result["errores"] += len(batch)
                         self._log(f"Batch ventas fallo ({len(batch)} items)")
-                    batch = {}
+                    batch = LoteJSON()
                     if callback:
                         callback(i + 1, total, "ventas")
 
@@ -791,7 +938,7 @@ class FirebaseSyncManager:
             if ncs_updates:
                 self._log(f"Sync inicial: subiendo {len(ncs_updates)} notas de credito como updates...")
                 ts_nc = ts_base + total + 1
-                nc_batch = {}
+                nc_batch = LoteJSON()
                 for j, item in enumerate(ncs_updates):
                     v = item["venta"]
                     key = self._generate_push_key()
@@ -818,24 +965,31 @@ class FirebaseSyncManager:
                         if ok:
                             result["ventas"] += len(nc_batch)
                         else:
+                            # Sin marca: el proximo push repite ventas y NCs
+                            marca_ok = None
                             result["errores"] += len(nc_batch)
                             self._log(f"Batch NCs fallo ({len(nc_batch)} items)")
-                        nc_batch = {}
+                        nc_batch = LoteJSON()
                         if callback:
                             callback(total + j + 1, total + len(ncs_updates), "ventas")
+            self._guardar_marca_push("ventas", marca_ok)
         except Exception as e:
             self._log(f"Sync inicial ventas error: {e}")
 
-    def _push_all_pagos_proveedores_batch(self, result: dict, callback=None) -> None:
+    def _push_all_pagos_proveedores_batch(self, result: dict, callback=None, completo: bool = True) -> None:
         """v6.7.0: sube todos los pagos a proveedores locales en batches PATCH."""
         ts_base = int(time.time() * 1000)
         try:
-            pagos = self.session.query(PagoProveedor).all()
+            pagos = self._query_push("pagos_proveedores", completo).all()
             total = len(pagos)
             self._log(f"Sync inicial: subiendo {total} pagos a proveedores en batches de {BATCH_SIZE}...")
 
-            batch = {}
+            batch = LoteJSON()
+            marca_batch = marca_ok = None
+            fallo = False
             for i, pago in enumerate(pagos):
+                if pago.id is not None:
+                    marca_batch = pago.id
                 key = self._generate_push_key()
                 batch[key] = {
                     "sucursal_origen": self.sucursal_local,
@@ -857,20 +1011,33 @@ class FirebaseSyncManager:
                     ok = self._batch_patch("cambios/pagos_proveedores", batch)
                     if ok:
                         result["pagos_proveedores"] += len(batch)
+                        if not fallo:
+                            marca_ok = marca_batch
                     else:
+                        fallo = True
                         result["errores"] += len(batch)
                         self._log(f"Batch pagos_proveedores fallo ({len(batch)} items)")
-                    batch = {}
+                    batch = LoteJSON()
                     if callback:
                         callback(i + 1, total, "pagos_proveedores")
+            self._guardar_marca_push("pagos_proveedores", marca_ok)
         except Exception as e:
             self._log(f"Sync inicial pagos_proveedores error: {e}")
 
     # ─── Pull: Firebase -> local ──────────────────────────────────────
 
     def _get_last_processed_keys(self) -> Dict[str, Optional[str]]:
-        """Retorna dict con el ultimo key procesado por cada tipo de entidad."""
-        sync_cfg = self._get_sync_config()
+        """Retorna dict con el ultimo key procesado por cada tipo de entidad.
+
+        v6.8.0: los cursores viven en sync_state.db (tabla pull_cursores). La
+        primera vez se migran los de app_config.json y se sacan de la config.
+        """
+        estado = SyncState.get_instance()
+        keys = estado.cursores_pull()
+        if keys is not None:
+            return keys
+        cfg = load_config()
+        sync_cfg = cfg.get("sync", {}) or {}
         keys = sync_cfg.get("last_processed_keys", {})
         if not isinstance(keys, dict):
             # Migrar desde el formato viejo (key unico global)
@@ -882,15 +1049,18 @@ class FirebaseSyncManager:
         # v6.7.0: garantizar todos los tipos presentes (compradores agregado)
         for _t in ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores"):
             keys.setdefault(_t, None)
+        estado.guardar_cursores_pull(keys)
+        if "last_processed_keys" in sync_cfg or "last_processed_key" in sync_cfg:
+            sync_cfg.pop("last_processed_keys", None)
+            sync_cfg.pop("last_processed_key", None)
+            save_config(cfg)
+            self._log(f"Cursores de pull migrados a sync_state.db: {keys}")
         return keys
 
     def _set_last_processed_key(self, tipo: str, key: str):
         """Guarda el ultimo key procesado para un tipo especifico."""
-        cfg = load_config()
-        sync = cfg.setdefault("sync", {})
-        keys = sync.setdefault("last_processed_keys", {})
-        keys[tipo] = key
-        save_config(cfg)
+        # v6.8.0: un UPSERT en sync_state.db (antes: reescribir app_config.json por pagina)
+        SyncState.get_instance().guardar_cursores_pull({tipo: key})
         # Tambien guardar en Firebase para referencia
         self._firebase_put(f"meta/last_processed/{self.sucursal_local}/{tipo}", key)
 
@@ -904,19 +1074,13 @@ class FirebaseSyncManager:
 
         Tambien limpia el fail counter para que items que fueron skipeados puedan
         reintentarse desde cero.
+
+        v6.8.0: productos, proveedores y compradores arrancan desde su snapshot
+        (ver _cargar_snapshot) y solo replican el log posterior.
         """
-        cfg = load_config()
-        sync = cfg.setdefault("sync", {})
-        sync["last_processed_keys"] = {
-            "ventas": None, "productos": None, "proveedores": None,
-            "pagos_proveedores": None, "compradores": None,
-        }
-        save_config(cfg)
-        # Limpiar fail counter para que items skipeados reintenten
-        try:
-            self._save_fail_counter({})
-        except Exception:
-            pass
+        # Cursores a None y fail counter limpio para que items skipeados reintenten
+        SyncState.get_instance().reiniciar_pull(fallos=True)
+        self._cont_pull = None
         self._log("[FORCE-PULL] last_processed_keys reseteado a None y fail_counter limpiado")
 
     def force_pull_all(self, progress_callback=None, cancel_check=None) -> Dict[str, int]:
@@ -927,7 +1091,7 @@ class FirebaseSyncManager:
         self.reset_pull_cursors()
         return self.pull_changes(progress_callback=progress_callback, cancel_check=cancel_check)
 
-    def pull_changes(self, progress_callback=None, cancel_check=None) -> Dict[str, int]:
+    def pull_changes(self, progress_callback=None, cancel_check=None, tipos=None) -> Dict[str, int]:
         """
         Descarga y aplica cambios nuevos desde Firebase.
         Retorna {"ventas": N, "productos": N, "proveedores": N, "errores": N}
@@ -935,32 +1099,80 @@ class FirebaseSyncManager:
         v6.6.3:
           - progress_callback(tipo: str, page: int, applied: int, errors: int) — llamado tras cada pagina
           - cancel_check() -> bool — si retorna True, se aborta gracefully
+        v6.8.0: `tipos` limita el pull a esos tipos (modo stream: solo los que avisaron cambios).
         """
         result = {
             "ventas": 0, "productos": 0, "proveedores": 0,
             "pagos_proveedores": 0, "compradores": 0, "errores": 0,
         }
         last_keys = self._get_last_processed_keys()
-
-        for tipo in ["ventas", "productos", "proveedores", "pagos_proveedores", "compradores"]:
-            if cancel_check and cancel_check():
-                self._log(f"Pull cancelado por el usuario antes de procesar {tipo}")
-                break
-            entity_last_key = last_keys.get(tipo)
-            count, errors, new_last = self._pull_entity(
-                tipo, entity_last_key,
-                progress_callback=progress_callback,
-                cancel_check=cancel_check,
-            )
-            result[tipo] = count
-            result["errores"] += errors
-            if new_last:
-                self._set_last_processed_key(tipo, new_last)
-
+        tipos = [t for t in ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores")
+                 if tipos is None or t in tipos]
+
+        # v6.8.0: un tipo sin cursor (sucursal nueva, reset_pull_cursors) arranca
+        # desde su snapshot y despues solo replica la cola del log.
+        if (self._get_sync_config().get("snapshots") or {}).get("enabled", True):
+            for tipo in SNAPSHOT_TIPOS:
+                if last_keys.get(tipo) or tipo not in tipos:
+                    continue
+                if cancel_check and cancel_check():
+                    break
+                antes = result[tipo]
+                with self._fase(f"snapshot:{tipo}"):
+                    hasta = self._cargar_snapshot(tipo, result, progress_callback, cancel_check)
+                self._telemetria_sumar(f"snapshot:{tipo}", aplicados=result[tipo] - antes)
+                if hasta:
+                    last_keys[tipo] = hasta
+                    self._set_last_processed_key(tipo, hasta)
+
+        # v6.8.0: las descargas van a un pool de PULL_WORKERS hilos. La primera
+        # pagina de cada tipo se pide ya, y mientras se aplica la pagina N se
+        # descarga la N+1. Los apply siguen todos en este hilo (el escritor de
+        # SessionManager), asi que SQLite ve un solo escritor como antes.
+        pool = ThreadPoolExecutor(max_workers=PULL_WORKERS, thread_name_prefix="SyncFetch")
+        try:
+            primeras = {t: (last_keys.get(t), pool.submit(self._fetch_pagina, t, last_keys.get(t)))
+                        for t in tipos}
+            for tipo in tipos:
+                if cancel_check and cancel_check():
+                    self._log(f"Pull cancelado por el usuario antes de procesar {tipo}")
+                    break
+                entity_last_key = last_keys.get(tipo)
+                with self._fase(f"pull:{tipo}"):
+                    count, errors, new_last = self._pull_entity(
+                        tipo, entity_last_key,
+                        progress_callback=progress_callback,
+                        cancel_check=cancel_check,
+                        siguiente=primeras[tipo], pool=pool,
+                    )
+                self._telemetria_sumar(f"pull:{tipo}", aplicados=count, errores=errors)
+                result[tipo] += count
+                result["errores"] += errors
+                if new_last:
+                    self._set_last_processed_key(tipo, new_last)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        # v6.8.0: el cleanup diferido corre despues del pull, en otro hilo
+        self._lanzar_limpieza()
         return result
 
+    def _fetch_pagina(self, tipo: str, cursor: Optional[str]) -> Optional[dict]:
+        """GET de una pagina de cambios/{tipo} desde `cursor` (inclusivo). Solo HTTP:
+        se puede llamar desde los hilos del pool de pull_changes."""
+        params = {
+            "orderBy": '"$key"',
+            "limitToFirst": PAGE_SIZE + 1,  # +1 porque startAt es inclusivo
+        }
+        if cursor:
+            params["startAt"] = f'"{cursor}"'
+        else:
+            params["limitToFirst"] = PAGE_SIZE
+        return self._firebase_get(f"cambios/{tipo}", params)
+
     def _pull_entity(self, tipo: str, last_key: Optional[str],
-                     progress_callback=None, cancel_check=None) -> Tuple[int, int, Optional[str]]:
+                     progress_callback=None, cancel_check=None,
+                     siguiente=None, pool=None) -> Tuple[int, int, Optional[str]]:
         """
         Descarga cambios de un tipo CON PAGINACION.
         Firebase REST limita respuestas grandes; usamos limitToFirst para paginar.
@@ -969,10 +1181,17 @@ class FirebaseSyncManager:
         v6.6.0: auto-cleanup en Firebase. Tras procesar un cambio (propio o ajeno
         aplicado OK), si paso la safe_window_days (default 30), se borra de la nube.
         Esto reduce la cuota Firebase casi a 0 en estado estable.
+        v6.8.0: los keys se borran en lotes (PATCH a null, _limpiar_cambios) despues
+        del commit de la pagina, o al final del pull en segundo plano si
+        cleanup.diferido (default).
 
         v6.6.3:
           - progress_callback(tipo, page, applied, errors) — llamado al final de cada pagina
           - cancel_check() -> bool — si True, se interrumpe entre paginas
+
+        v6.8.0: `siguiente` = (cursor, Future) con una pagina ya pedida y `pool` un
+        executor para pedir la pagina siguiente mientras se aplica la actual. Si el
+        cursor real no coincide con el de la pagina pedida, se descarta y se baja de nuevo.
         """
         total_applied = 0
         total_errors = 0
@@ -984,8 +1203,11 @@ class FirebaseSyncManager:
         cleanup_cfg = (self._get_sync_config().get("cleanup") or {})
         cleanup_enabled = bool(cleanup_cfg.get("enabled", True))
         safe_window_days = int(cleanup_cfg.get("safe_window_days", 30))
+        # v6.8.0: diferido = juntar los keys y borrarlos en segundo plano al terminar el pull
+        cleanup_diferido = bool(cleanup_cfg.get("diferido", True))
 
         self._log(f"Pull {tipo}: inicio, last_key={last_key} (cleanup={cleanup_enabled} safe={safe_window_days}d)")
+        self._cont_pull = None   # v6.8.0: los fallos de este tipo se cargan de sync_state.db al usarse
 
         while True:
             # v6.6.3: chequear cancelacion antes de cada pagina
@@ -993,16 +1215,11 @@ class FirebaseSyncManager:
                 self._log(f"Pull {tipo}: cancelado por el usuario en pagina {page_num + 1}")
                 break
             page_num += 1
-            params = {
-                "orderBy": '"$key"',
-                "limitToFirst": PAGE_SIZE + 1,  # +1 porque startAt es inclusivo
-            }
-            if cursor:
-                params["startAt"] = f'"{cursor}"'
+            if siguiente is not None and siguiente[0] == cursor:
+                data = siguiente[1].result()
             else:
-                params["limitToFirst"] = PAGE_SIZE
-
-            data = self._firebase_get(f"cambios/{tipo}", params)
+                data = self._fetch_pagina(tipo, cursor)
+            siguiente = None
             if data is None:
                 self._log(f"Pull {tipo} pag{page_num}: error de red o auth")
                 break
@@ -1013,12 +1230,30 @@ class FirebaseSyncManager:
             keys = sorted(data.keys())
             self._log(f"Pull {tipo} pag{page_num}: {len(keys)} entradas recibidas")
 
+            # Si recibimos menos de PAGE_SIZE+1, ya no hay mas paginas
+            expected = PAGE_SIZE + 1 if last_key or (page_num > 1) else PAGE_SIZE
+            hay_mas = len(keys) >= expected
+            if hay_mas and pool is not None:
+                # v6.8.0: pedir ya la pagina siguiente (normalmente arranca en el ultimo key)
+                siguiente = (keys[-1], pool.submit(self._fetch_pagina, tipo, keys[-1]))
+
             page_applied = 0
             skipped_own = 0
             skipped_cursor = 0
             skipped_invalid = 0
             skipped_apply_fail = 0
             canceled_mid_page = False
+            # v6.8.0: la pagina se aplica en una transaccion (un SAVEPOINT por cambio)
+            # con productos/ventas precargados; el cleanup se manda despues del commit.
+            cursor_pagina = cursor
+            limpiar = []
+            try:
+                self._abrir_pagina(tipo, [data[k] for k in keys if isinstance(data[k], dict)
+                                          and data[k].get("sucursal_origen") != self.sucursal_local])
+            except Exception as e:
+                self._log(f"Pull {tipo} pag{page_num}: no se pudo abrir la transaccion: {e}")
+                total_errors += 1
+                break
             for _idx, push_key in enumerate(keys):
                 # v6.6.4: progress callback cada 25 items para que el usuario vea avance
                 # antes era solo al final de cada pagina (parecia colgado en pages grandes)
@@ -1048,33 +1283,11 @@ class FirebaseSyncManager:
                     cursor = push_key
                     # v6.6.0: cleanup de mis propios cambios viejos
                     if cleanup_enabled and self._is_old_enough(change, safe_window_days):
-                        if self._firebase_delete(f"cambios/{tipo}/{push_key}"):
-                            total_deleted += 1
+                        limpiar.append(push_key)
                     continue
 
                 try:
-                    accion = change.get("accion", "create")
-                    inner_data = change.get("data", {})
-
-                    # v6.6.4: reintentar hasta 3 veces con back-off corto (1, 2, 4s = 7s max)
-                    # antes era 5 × (3,6,12,24,48s = 93s), demasiado lento si hay contencion
-                    ok = False
-                    for _attempt in range(3):
-                        try:
-                            ok = self._apply_change(tipo, change)
-                            break
-                        except Exception as _retry_err:
-                            if "database is locked" in str(_retry_err) and _attempt < 2:
-                                import time as _t
-                                wait = 1 * (2 ** _attempt)  # 1, 2, 4 seg
-                                self._log(f"  DB locked, esperando {wait}s ({_attempt+1}/3)...")
-                                try:
-                                    self.session.rollback()
-                                except Exception as _rb_err:
-                                    self._log(f"  WARN: rollback fallo durante retry DB-locked: {_rb_err}")
-                                _t.sleep(wait)
-                                continue
-                            raise
+                    ok = self._apply_en_savepoint(tipo, change)
 
                     if ok:
                         page_applied += 1
@@ -1087,14 +1300,14 @@ class FirebaseSyncManager:
                     cursor = push_key
                     # v6.6.0: cleanup tras aplicar (o saltar duplicado) si paso safe_window
                     if cleanup_enabled and self._is_old_enough(change, safe_window_days):
-                        if self._firebase_delete(f"cambios/{tipo}/{push_key}"):
-                            total_deleted += 1
+                        limpiar.append(push_key)
                 except Exception as e:
                     # v6.6.2: skip-on-fail. Si una misma key falla MAX_RETRIES veces seguidas
                     # avanzamos el cursor de todas formas para no atascar el pull entero.
-                    # El item se registra en sync_skipped.log para que el usuario pueda
+                    # El item se registra (v6.8.0: tabla pull_saltados) para que el usuario pueda
                     # inspeccionar manualmente.
                     fail_count = self._bump_fail_count(tipo, push_key)
+                    self._telemetria_sumar(reintentos=1)
                     MAX_RETRIES = 3
                     if fail_count >= MAX_RETRIES:
                         self._log(f"Error aplicando {tipo}/{push_key}: {e}")
@@ -1105,14 +1318,28 @@ class FirebaseSyncManager:
                         # cleanup tambien: si paso safe_window, sacarlo de Firebase para
                         # que no nos siga molestando
                         if cleanup_enabled and self._is_old_enough(change, safe_window_days):
-                            if self._firebase_delete(f"cambios/{tipo}/{push_key}"):
-                                total_deleted += 1
+                            limpiar.append(push_key)
                     else:
                         self._log(f"Error aplicando {tipo}/{push_key}: {e}")
                         total_errors += 1
                         # NO avanzar cursor: se reintentara en el proximo ciclo
                         self._log(f"  -> CURSOR NO AVANZADO, se reintentara ({fail_count}/{MAX_RETRIES})")
 
+            pagina_ok = self._cerrar_pagina()
+            self._guardar_contabilidad_pull()
+            if pagina_ok:
+                if cleanup_diferido:
+                    self._limpieza.setdefault(tipo, []).extend(limpiar)
+                else:
+                    total_deleted += self._limpiar_cambios(tipo, limpiar)
+            else:
+                # Nada de la pagina quedo en la BD: volver el cursor y reintentar
+                self._log(f"Pull {tipo} pag{page_num}: commit fallo, cursor vuelve a {cursor_pagina}")
+                self._telemetria_sumar(reintentos=1)
+                cursor = cursor_pagina
+                page_applied = 0
+                total_errors += 1
+
             total_applied += page_applied
             self._log(f"Pull {tipo} pag{page_num} resumen: "
                       f"aplicados={page_applied}, skip_cursor={skipped_cursor}, "
@@ -1137,14 +1364,410 @@ class FirebaseSyncManager:
                 self._log(f"Pull {tipo}: detenido por errores, reintentara en proximo ciclo")
                 break
 
-            # Si recibimos menos de PAGE_SIZE+1, ya no hay mas paginas
-            expected = PAGE_SIZE + 1 if last_key or (page_num > 1) else PAGE_SIZE
-            if len(keys) < expected:
+            if not hay_mas:
                 break
 
         self._log(f"Pull {tipo}: total {total_applied} aplicados, {total_errors} errores en {page_num} paginas")
         return total_applied, total_errors, cursor
 
+    # ─── Aplicacion por pagina (v6.8.0) ──────────────────────────────
+    #
+    # _pull_entity abre una transaccion por pagina (_abrir_pagina), aplica cada
+    # cambio dentro de un SAVEPOINT (_apply_en_savepoint) y confirma todo junto
+    # (_cerrar_pagina). Los _apply_* usan _commit/_rollback: fuera de una pagina
+    # hacen commit/rollback como antes; dentro, flush / rollback al savepoint.
+    # Productos y ventas de la pagina se precargan con consultas por lotes y
+    # los _apply_* los buscan con _buscar_producto/_buscar_venta.
+
+    def _commit(self):
+        if self._savepoint is not None:
+            self.session.flush()
+        else:
+            self.session.commit()
+
+    def _rollback(self):
+        if self._savepoint is not None:
+            if self._savepoint.is_active:
+                self._savepoint.rollback()
+            self._cache_pagina = None  # pudo quedar algo del cambio deshecho
+        else:
+            self.session.rollback()
+
+    def _abrir_pagina(self, tipo: str, cambios: List[dict]) -> None:
+        """Confirma lo previo, abre BEGIN IMMEDIATE y precarga lo que consulta la pagina."""
+        self.session.commit()
+        t0 = time.perf_counter()
+        try:
+            for intento in range(3):
+                try:
+                    self.session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+                    break
+                except OperationalError as e:
+                    self.session.rollback()
+                    if "database is locked" not in str(e) or intento == 2:
+                        raise
+                    wait = 1 * (2 ** intento)  # 1, 2 seg
+                    self._log(f"  DB locked, esperando {wait}s ({intento + 1}/3)...")
+                    self._telemetria_sumar(bloqueos_bd=1)
+                    time.sleep(wait)
+        finally:
+            # Incluye el busy_timeout de SQLite, no solo los reintentos
+            self._telemetria_sumar(espera_bd_ms=(time.perf_counter() - t0) * 1000.0)
+        self._cache_pagina = self._precargar_pagina(tipo, cambios)
+
+    def _cerrar_pagina(self) -> bool:
+        """Commit de la pagina. False si fallo (la pagina entera queda deshecha)."""
+        self._cache_pagina = None
+        try:
+            self.session.commit()
+            return True
+        except Exception as e:
+            self._log(f"  ERROR confirmando pagina: {e}")
+            try:
+                self.session.rollback()
+            except Exception:
+                pass
+            return False
+
+    def _apply_en_savepoint(self, tipo: str, change: dict) -> bool:
+        """_apply_change dentro de un SAVEPOINT: si falla se deshace solo este cambio."""
+        sp = self.session.begin_nested()
+        self._savepoint = sp
+        try:
+            ok = self._apply_change(tipo, change)
+            if sp.is_active:
+                sp.commit()
+            return ok
+        except Exception:
+            if sp.is_active:
+                sp.rollback()
+            self._cache_pagina = None
+            raise
+        finally:
+            self._savepoint = None
+
+    _CLAVES_VENTA = ("numero_ticket", "numero_ticket_cae", "afip_numero_comprobante")
+
+    def _precargar_pagina(self, tipo: str, cambios: List[dict]) -> Optional[dict]:
+        """{"productos": {codigo: Producto|None}, "ventas": {(campo, suc, valor): Venta|None}}
+        para todo lo que referencian los cambios de la pagina (consultas IN de a 900)."""
+        if tipo not in ("ventas", "productos"):
+            return None
+        codigos = set()
+        claves = {}
+        for change in cambios:
+            data = change.get("data") or {}
+            if not isinstance(data, dict):
+                continue
+            if tipo == "productos":
+                if data.get("codigo_barra"):
+                    codigos.add(str(data["codigo_barra"]))
+                continue
+            for it in (data.get("items") or []):
+                if isinstance(it, dict) and it.get("codigo_barra"):
+                    codigos.add(str(it["codigo_barra"]))
+            suc = data.get("sucursal")
+            if not suc:
+                continue
+            # Los create que resuelve el INSERT ... ON CONFLICT solo necesitan el Nº AFIP
+            campos = self._CLAVES_VENTA
+            if change.get("accion", "create") == "create" and self._dedup_por_indice(data):
+                campos = ("afip_numero_comprobante",)
+            for s in {suc, str(suc).strip()}:
+                for campo in campos:
+                    if data.get(campo):
+                        claves.setdefault((campo, s), set()).add(str(data[campo]))
+
+        cache = {"productos": {}, "ventas": {}}
+        codigos = sorted(codigos)
+        for i in range(0, len(codigos), 900):
+            for p in self.session.query(Producto).filter(Producto.codigo_barra.in_(codigos[i:i + 900])):
+                cache["productos"].setdefault(str(p.codigo_barra), p)
+        for c in codigos:
+            cache["productos"].setdefault(c, None)
+
+        for (campo, suc), valores in claves.items():
+            col = getattr(Venta, campo)
+            valores = sorted(valores)
+            for i in range(0, len(valores), 900):
+                for v in (self.session.query(Venta)
+                          .filter(Venta.sucursal == suc, col.in_(valores[i:i + 900]))
+                          .order_by(Venta.id)):
+                    cache["ventas"].setdefault((campo, suc, str(getattr(v, campo))), v)
+            for val in valores:
+                cache["ventas"].setdefault((campo, suc, val), None)
+        return cache
+
+    def _buscar_producto(self, codigo) -> Optional[Producto]:
+        cache = self._cache_pagina
+        if cache is not None and str(codigo) in cache["productos"]:
+            return cache["productos"][str(codigo)]
+        return self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+
+    def _cache_producto(self, codigo, prod: Optional[Producto]) -> None:
+        if self._cache_pagina is not None:
+            self._cache_pagina["productos"][str(codigo)] = prod
+
+    def _buscar_venta(self, sucursal, numero_ticket, numero_ticket_cae, afip_num) -> Optional[Venta]:
+        """Venta de `sucursal` por numero_ticket > numero_ticket_cae > afip_numero_comprobante."""
+        cache = self._cache_pagina
+        for campo, valor in zip(self._CLAVES_VENTA, (numero_ticket, numero_ticket_cae, afip_num)):
+            if not valor:
+                continue
+            clave = (campo, sucursal, str(valor))
+            if cache is not None and clave in cache["ventas"]:
+                venta = cache["ventas"][clave]
+            else:
+                venta = self.session.query(Venta).filter(
+                    Venta.sucursal == sucursal, getattr(Venta, campo) == valor,
+                ).first()
+            if venta:
+                return venta
+        return None
+
+    def _dedup_por_indice(self, data: dict) -> bool:
+        """True si los indices unicos de ventas detectan solos un duplicado de `data`
+        (ticket sin CAE o ticket CAE); si no, hay que buscarla antes de insertar."""
+        if self._ventas_unicas is None:
+            nombres = {r[0] for r in self.session.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'ventas'"))}
+            self._ventas_unicas = set(VENTAS_INDICES_UNICOS) <= nombres
+        if not self._ventas_unicas:
+            return False
+        return bool((data.get("numero_ticket") and not data.get("afip_cae"))
+                    or data.get("numero_ticket_cae"))
+
+    def _olvidar_venta(self, sucursal, *valores) -> None:
+        """Saca del cache de la pagina las claves de una venta insertada sin ORM
+        (la proxima busqueda va a la BD)."""
+        if self._cache_pagina is None:
+            return
+        for campo, valor in zip(self._CLAVES_VENTA, valores):
+            if valor:
+                self._cache_pagina["ventas"].pop((campo, sucursal, str(valor)), None)
+
+    def _cache_venta(self, venta: Venta, presente: bool) -> None:
+        if self._cache_pagina is None:
+            return
+        for campo in self._CLAVES_VENTA:
+            valor = getattr(venta, campo)
+            if valor:
+                self._cache_pagina["ventas"][(campo, venta.sucursal, str(valor))] = venta if presente else None
+
+    # ─── Cleanup de cambios/ (v6.8.0) ─────────────────────────────────
+
+    def _limpiar_cambios(self, tipo: str, push_keys: List[str], pausa: float = 0.0) -> int:
+        """Borra push keys de cambios/{tipo} con PATCH multi-path {key: null},
+        de a CLEANUP_CHUNK por request. Retorna cuantos se borraron."""
+        borrados = 0
+        for i in range(0, len(push_keys), CLEANUP_CHUNK):
+            lote = push_keys[i:i + CLEANUP_CHUNK]
+            if i and pausa:
+                time.sleep(pausa)
+            if self._batch_patch(f"cambios/{tipo}", {k: None for k in lote}):
+                borrados += len(lote)
+            else:
+                self._log(f"Cleanup {tipo}: fallo un lote de {len(lote)} keys")
+        return borrados
+
+    def limpiar_pendientes(self) -> Dict[str, int]:
+        """Ejecuta el cleanup diferido juntado en los pulls. Retorna {tipo: borrados}."""
+        with _limpieza_lock:
+            pendiente, self._limpieza = self._limpieza, {}
+            out = {}
+            for tipo, keys in pendiente.items():
+                if keys:
+                    out[tipo] = self._limpiar_cambios(tipo, keys, pausa=CLEANUP_PAUSA)
+            if out:
+                self._log(f"Cleanup diferido: borrados de Firebase {out}")
+            return out
+
+    def _lanzar_limpieza(self) -> None:
+        """Corre limpiar_pendientes() en un hilo daemon (solo HTTP, no toca la BD).
+
+        Si la app se cierra antes, esos keys quedan en Firebase (como cuando un
+        DELETE fallaba): no afecta datos, solo cuota."""
+        if not any(self._limpieza.values()):
+            return
+        threading.Thread(target=self._limpiar_en_hilo, name="SyncCleanup", daemon=True).start()
+
+    def _limpiar_en_hilo(self) -> None:
+        try:
+            self.limpiar_pendientes()
+        except Exception as e:
+            self._log(f"Cleanup diferido error: {e}")
+
+    # ─── Snapshots de entidades (v6.8.0) ─────────────────────────────
+    #
+    # snapshots/{tipo} = {"hasta": push_key, "generado": ms, "sucursal_origen",
+    #                     "cantidad", "items": {clave: ultimo cambio de la entidad}}
+    # "items" es el log cambios/{tipo} compactado hasta "hasta" inclusive.
+    # Cualquier sucursal lo regenera cuando lo encuentra vencido
+    # (publicar_snapshots) y una sucursal sin cursor lo aplica de una vez
+    # (_cargar_snapshot) y sigue el pull desde "hasta".
+
+    @staticmethod
+    def _clave_snapshot(valor) -> str:
+        """Clave valida de Firebase para un codigo/nombre/cuit (escapa . $ # [ ] / %)."""
+        return quote(str(valor).strip(), safe="").replace(".", "%2E")
+
+    def _leer_snapshot(self, tipo: str, campo: Optional[str] = None) -> Tuple[bool, object]:
+        """GET de snapshots/{tipo}[/campo]. Retorna (ok, datos); a diferencia de
+        _firebase_get distingue "no existe" (True, None) de un error (False, None)."""
+        path = f"snapshots/{tipo}" + (f"/{campo}" if campo else "")
+        try:
+            resp = self._http.request("GET", path, timeout=BATCH_TIMEOUT)
+            if resp.status_code != 200:
+                self._log(f"GET {path} HTTP {resp.status_code}: {resp.text[:200]}")
+                return False, None
+            return True, resp.json()
+        except Exception as e:
+            self._log(f"GET {path} error: {e}")
+            return False, None
+
+    def _sumar_a_snapshot(self, tipo: str, items: dict, change: dict) -> None:
+        """Deja en `items` el cambio mas nuevo (por timestamp) de la entidad de `change`."""
+        valor = str((change.get("data") or {}).get(SNAPSHOT_TIPOS[tipo]) or "").strip()
+        if not valor:
+            return
+        clave = self._clave_snapshot(valor)
+        previo = items.get(clave)
+        if previo is None or int(change.get("timestamp") or 0) >= int(previo.get("timestamp") or 0):
+            items[clave] = change
+
+    def publicar_snapshots(self, forzar: bool = False) -> Dict[str, int]:
+        """Regenera los snapshots con mas de intervalo_horas (o todos si forzar).
+        Retorna {tipo: entidades en el snapshot} de los que se escribieron."""
+        snap_cfg = self._get_sync_config().get("snapshots") or {}
+        if not forzar and not snap_cfg.get("enabled", True):
+            return {}
+        intervalo_ms = float(snap_cfg.get("intervalo_horas", SNAPSHOT_INTERVALO_HORAS)) * 3600 * 1000
+        ahora = int(time.time() * 1000)
+        out = {}
+        for tipo in SNAPSHOT_TIPOS:
+            if not forzar:
+                ok, generado = self._leer_snapshot(tipo, "generado")
+                if not ok or (generado and ahora - int(generado) < intervalo_ms):
+                    continue
+            n = self._publicar_snapshot(tipo, ahora)
+            if n is not None:
+                out[tipo] = n
+        if out:
+            self._log(f"Snapshots publicados: {out}")
+        return out
+
+    def _publicar_snapshot(self, tipo: str, ahora: int) -> Optional[int]:
+        """Suma al snapshot actual los cambios del log posteriores a su "hasta" y lo
+        reescribe. Retorna la cantidad de entidades, o None si algo fallo."""
+        ok, snap = self._leer_snapshot(tipo)
+        if not ok:
+            return None
+        snap = snap if isinstance(snap, dict) else {}
+        items = dict(snap.get("items") or {})
+        hasta = snap.get("hasta")
+        cursor = hasta
+        limite = ahora - SNAPSHOT_MARGEN_MS
+        nuevos = 0
+        while True:
+            data = self._fetch_pagina(tipo, cursor)
+            if data is None:
+                self._log(f"Snapshot {tipo}: error leyendo cambios/, no se publica")
+                return None
+            if not isinstance(data, dict) or not data:
+                break
+            keys = sorted(data.keys())
+            expected = PAGE_SIZE + 1 if cursor else PAGE_SIZE
+            reciente = False
+            for push_key in keys:
+                if push_key == cursor:
+                    continue
+                change = data[push_key]
+                if isinstance(change, dict):
+                    if int(change.get("timestamp") or 0) > limite:
+                        reciente = True
+                        break
+                    self._sumar_a_snapshot(tipo, items, change)
+                    nuevos += 1
+                hasta = push_key
+            if reciente or len(keys) < expected:
+                break
+            cursor = keys[-1]
+
+        if not hasta:
+            return None
+        if not nuevos:
+            # Nada nuevo: solo renovar "generado" para no releer el log en cada sync
+            return len(items) if self._firebase_patch(f"snapshots/{tipo}", {"generado": ahora}) else None
+        try:
+            resp = self._http.request("PUT", f"snapshots/{tipo}", json={
+                "hasta": hasta,
+                "generado": ahora,
+                "sucursal_origen": self.sucursal_local,
+                "cantidad": len(items),
+                "items": items,
+            }, timeout=BATCH_TIMEOUT)
+            if resp.status_code != 200:
+                self._log(f"PUT snapshots/{tipo} HTTP {resp.status_code}: {resp.text[:200]}")
+                return None
+        except Exception as e:
+            self._log(f"PUT snapshots/{tipo} error: {e}")
+            return None
+        self._log(f"Snapshot {tipo}: {len(items)} entidades (+{nuevos} cambios) hasta {hasta}")
+        return len(items)
+
+    def _cargar_snapshot(self, tipo: str, result: dict,
+                         progress_callback=None, cancel_check=None) -> Optional[str]:
+        """Aplica snapshots/{tipo} en paginas (misma maquinaria que el pull).
+
+        Retorna el "hasta" del snapshot para usarlo de cursor, o None si no hay
+        snapshot o algo fallo (en ese caso el pull replica el log desde el principio;
+        lo ya aplicado se detecta como duplicado).
+        """
+        ok, snap = self._leer_snapshot(tipo)
+        if not ok or not isinstance(snap, dict) or not snap.get("hasta"):
+            return None
+        cambios = [c for c in (snap.get("items") or {}).values()
+                   if isinstance(c, dict) and c.get("sucursal_origen") != self.sucursal_local]
+        cambios.sort(key=lambda c: int(c.get("timestamp") or 0))
+        self._log(f"Snapshot {tipo}: aplicando {len(cambios)} entidades hasta {snap['hasta']}")
+
+        aplicados = errores = 0
+        for i in range(0, len(cambios), PAGE_SIZE):
+            if cancel_check and cancel_check():
+                self._log(f"Snapshot {tipo}: cancelado por el usuario")
+                return None
+            lote = cambios[i:i + PAGE_SIZE]
+            try:
+                self._abrir_pagina(tipo, lote)
+            except Exception as e:
+                self._log(f"Snapshot {tipo}: no se pudo abrir la transaccion: {e}")
+                return None
+            en_pagina = 0
+            for change in lote:
+                try:
+                    if self._apply_en_savepoint(tipo, change):
+                        en_pagina += 1
+                except Exception as e:
+                    errores += 1
+                    self._log(f"Snapshot {tipo}: error aplicando {change.get('data')}: {e}")
+            if self._cerrar_pagina():
+                aplicados += en_pagina
+            else:
+                errores += 1
+            if progress_callback:
+                try:
+                    progress_callback(tipo, i // PAGE_SIZE + 1, aplicados, errores)
+                except Exception:
+                    pass
+
+        result[tipo] += aplicados
+        if errores:
+            result["errores"] += errores
+            self._log(f"Snapshot {tipo}: {errores} errores, se replica el log completo")
+            return None
+        self._log(f"Snapshot {tipo}: {aplicados} aplicados")
+        return snap["hasta"]
+
     def _apply_change(self, tipo: str, change: dict) -> bool:
         accion = change.get("accion", "create")
         data = change.get("data", {})
@@ -1174,6 +1797,115 @@ class FirebaseSyncManager:
             return self._apply_comprador(data, timestamp)
         return False
 
+    # ─── Resumenes para el dashboard (v6.8.0) ─────────────────────────
+    #
+    # resumenes/{YYYY-MM-DD}/{sucursal} = {"sucursal", "fecha", "actualizado",
+    #     "modos": {modo: {"modo", "cantidad", "total", "cae_cantidad", "cae_total"}},
+    #     "anuladas": {mismo formato: ventas con nota de credito, ya sumadas en "modos"},
+    #     "pagos": {"cantidad", "total", "con_iva"},
+    #     "top": [{"codigo", "nombre", "cantidad", "total"}]}
+    # Cada sucursal publica los suyos desde ventas_diarias (VentaRepo.resumen_diario)
+    # y top_productos_por_rango. El dashboard lee un rango de dias de resumenes/ y
+    # baja cambios/ solo para ver las ventas una por una.
+
+    def publicar_resumenes(self, forzar: bool = False) -> int:
+        """Publica los resumenes de los ultimos `sync.resumenes.dias` dias que
+        cambiaron desde la publicacion anterior. Retorna cuantos dias se escribieron."""
+        res_cfg = self._get_sync_config().get("resumenes") or {}
+        if not forzar and not res_cfg.get("enabled", True):
+            return 0
+        hasta = date.today()
+        desde = hasta - timedelta(days=max(1, int(res_cfg.get("dias", RESUMENES_DIAS))) - 1)
+        nodos = self._resumenes_locales(desde, hasta)
+        suc = self._clave_snapshot(self.sucursal_local)
+        # Firmas en sync_state.db: cada sync arma un FirebaseSyncManager nuevo
+        estado = SyncState.get_instance()
+        publicadas = estado.firmas_resumen(self.sucursal_local)
+        ahora = int(time.time() * 1000)
+        batch, firmas = {}, {}
+        for dia, nodo in sorted(nodos.items()):
+            firma = hashlib.sha1(json.dumps(nodo, sort_keys=True).encode("utf-8")).hexdigest()
+            if not forzar and publicadas.get(dia) == firma:
+                continue
+            nodo["top"] = self._top_resumen(dia)
+            nodo["actualizado"] = ahora
+            batch[f"{dia}/{suc}"] = nodo
+            firmas[dia] = firma
+        # Dias que quedaron sin ventas ni pagos (borrados): sacar el nodo
+        for dia in [d for d in publicadas if d not in nodos and d >= desde.isoformat()]:
+            batch[f"{dia}/{suc}"] = None
+            firmas[dia] = None
+        if not batch:
+            return 0
+        if not self._batch_patch("resumenes", batch):
+            return 0
+        try:
+            estado.guardar_firmas_resumen(self.sucursal_local, firmas, antes_de=desde.isoformat())
+        except Exception as e:
+            self._log(f"No se pudieron guardar las firmas de resumenes: {e}")
+        self._log(f"Resumenes publicados: {len(batch)} dias de {self.sucursal_local}")
+        return len(batch)
+
+    def _resumenes_locales(self, desde: date, hasta: date) -> Dict[str, dict]:
+        """{dia: nodo sin "top"} de la sucursal local entre dos dias (inclusive)."""
+        from app.repository import VentaRepo
+        nodos: Dict[str, dict] = {}
+
+        def nodo(dia) -> dict:
+            dia = str(dia)[:10]
+            return nodos.setdefault(dia, {
+                "sucursal": self.sucursal_local, "fecha": dia, "modos": {}, "anuladas": {},
+                "pagos": {"cantidad": 0, "total": 0.0, "con_iva": 0.0},
+            })
+
+        def sumar(grupo: dict, modo, con_cae, cantidad, total) -> None:
+            modo = modo or "Efectivo"
+            m = grupo.setdefault(self._clave_snapshot(modo), {
+                "modo": modo, "cantidad": 0, "total": 0.0, "cae_cantidad": 0, "cae_total": 0.0})
+            m["cantidad"] += int(cantidad or 0)
+            m["total"] = round(m["total"] + float(total or 0), 2)
+            if con_cae:
+                m["cae_cantidad"] += int(cantidad or 0)
+                m["cae_total"] = round(m["cae_total"] + float(total or 0), 2)
+
+        for r in VentaRepo(self.session).resumen_diario(desde, hasta, self.sucursal_local):
+            sumar(nodo(r.fecha)["modos"], r.modo_pago, r.con_cae, r.cantidad, r.total)
+
+        inicio = datetime.combine(desde, datetime.min.time())
+        fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+        # Anuladas por nota de credito (el dashboard las descuenta de los totales)
+        dia = func.date(Venta.fecha)
+        con_cae = case((func.coalesce(Venta.afip_cae, "") != "", 1), else_=0)
+        anuladas = (self.session.query(dia, Venta.modo_pago, con_cae, func.count(Venta.id),
+                                       func.coalesce(func.sum(Venta.total), 0))
+                    .filter(Venta.sucursal == self.sucursal_local,
+                            Venta.fecha >= inicio, Venta.fecha < fin,
+                            func.coalesce(Venta.nota_credito_cae, "") != "")
+                    .group_by(dia, Venta.modo_pago, con_cae))
+        for d, modo, cae, cantidad, total in anuladas:
+            sumar(nodo(d)["anuladas"], modo, cae, cantidad, total)
+
+        monto = func.abs(PagoProveedor.monto)
+        dia = func.date(PagoProveedor.fecha)
+        pagos = (self.session.query(dia, func.count(PagoProveedor.id),
+                                    func.coalesce(func.sum(monto), 0),
+                                    func.coalesce(func.sum(case((PagoProveedor.incluye_iva, monto), else_=0)), 0))
+                 .filter(PagoProveedor.sucursal == self.sucursal_local,
+                         PagoProveedor.fecha >= inicio, PagoProveedor.fecha < fin)
+                 .group_by(dia))
+        for d, cantidad, total, con_iva in pagos:
+            nodo(d)["pagos"] = {"cantidad": int(cantidad), "total": round(float(total), 2),
+                                "con_iva": round(float(con_iva), 2)}
+        return nodos
+
+    def _top_resumen(self, dia: str) -> list:
+        from app.repository import VentaRepo
+        d = date.fromisoformat(dia)
+        filas = VentaRepo(self.session).top_productos_por_rango(d, d, self.sucursal_local, n=RESUMENES_TOP)
+        return [{"codigo": r.codigo_barra or "", "nombre": r.nombre or "(sin producto)",
+                 "cantidad": int(r.cantidad or 0), "total": round(float(r.total or 0), 2)}
+                for r in filas]
+
     # ─── Aplicar cambios a SQLite local ───────────────────────────────
 
     def _apply_venta(self, data: dict) -> bool:
@@ -1191,20 +1923,14 @@ class FirebaseSyncManager:
         numero_ticket_cae = data.get("numero_ticket_cae") or 0
         afip_num = data.get("afip_numero_comprobante") or 0
 
-        # Verificar duplicado: priorizar numero_ticket > numero_ticket_cae > afip_numero_comprobante
-        existing = None
-        if numero_ticket:
-            existing = self.session.query(Venta).filter_by(
-                numero_ticket=numero_ticket, sucursal=sucursal,
-            ).first()
-        if not existing and numero_ticket_cae:
-            existing = self.session.query(Venta).filter_by(
-                numero_ticket_cae=numero_ticket_cae, sucursal=sucursal,
-            ).first()
-        if not existing and afip_num:
-            existing = self.session.query(Venta).filter_by(
-                afip_numero_comprobante=afip_num, sucursal=sucursal,
-            ).first()
+        # Verificar duplicado: priorizar numero_ticket > numero_ticket_cae > afip_numero_comprobante.
+        # v6.8.0: con los indices unicos el ticket y el ticket CAE los resuelve el INSERT
+        # (ON CONFLICT DO NOTHING); solo queda buscar el Nº AFIP, que viene precargado.
+        por_indice = self._dedup_por_indice(data)
+        if por_indice:
+            existing = self._buscar_venta(sucursal, 0, 0, afip_num)
+        else:
+            existing = self._buscar_venta(sucursal, numero_ticket, numero_ticket_cae, afip_num)
         if existing:
             self._log(f"  _apply_venta SKIP: ya existe (id={existing.id}, ticket={numero_ticket}, cae_ticket={numero_ticket_cae}, afip_num={afip_num})")
             return False  # Ya existe
@@ -1232,7 +1958,7 @@ class FirebaseSyncManager:
         except (ValueError, TypeError):
             fecha = datetime.now()
 
-        venta = Venta(
+        valores = dict(
             sucursal=sucursal,
             fecha=fecha,
             modo_pago=data.get("modo_pago", "Efectivo"),
@@ -1255,32 +1981,45 @@ class FirebaseSyncManager:
             nota_credito_numero=data.get("nota_credito_numero"), # v6.6.0
         )
 
-        self.session.add(venta)
-        try:
+        if por_indice:
             self.session.flush()
-        except IntegrityError:
-            self.session.rollback()
-            return False
-        except Exception:
-            self.session.rollback()
-            raise
+            venta_id = self.session.execute(
+                sqlite_insert(Venta).values(**valores).on_conflict_do_nothing().returning(Venta.id)
+            ).scalar()
+            if venta_id is None:
+                self._log(f"  _apply_venta SKIP: ya existe (ticket={numero_ticket}, cae_ticket={numero_ticket_cae})")
+                return False
+            self._olvidar_venta(sucursal, numero_ticket, numero_ticket_cae, afip_num)
+        else:
+            venta = Venta(**valores)
+            self.session.add(venta)
+            try:
+                self.session.flush()
+            except IntegrityError:
+                self._rollback()
+                return False
+            except Exception:
+                self._rollback()
+                raise
+            self._cache_venta(venta, presente=True)
+            venta_id = venta.id
 
         # Agregar items
         for item_data in (data.get("items") or []):
             codigo = item_data.get("codigo_barra", "")
-            prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first() if codigo else None
+            prod = self._buscar_producto(codigo) if codigo else None
             if not prod and codigo:
                 self._log(f"  WARN: producto '{codigo}' no encontrado, item creado sin vinculo")
 
             vi = VentaItem(
-                venta_id=venta.id,
+                venta_id=venta_id,
                 producto_id=prod.id if prod else None,
                 cantidad=int(item_data.get("cantidad", 1)),
                 precio_unit=float(item_data.get("precio_unit", 0))
             )
             self.session.add(vi)
 
-        self.session.commit()
+        self._commit()
         _items_count = len(data.get("items") or [])
         self._log(f"Venta #{numero_ticket} recibida de {sucursal} ({_items_count} items, total={data.get('total', 0)})")
         return True
@@ -1288,11 +2027,16 @@ class FirebaseSyncManager:
     def _apply_venta_update(self, data: dict) -> bool:
         """Aplica una modificacion de venta (devolucion)."""
         numero_ticket = data.get("numero_ticket")
-        if not numero_ticket:
+        sucursal = data.get("sucursal")
+        if sucursal:
+            # v6.8.0: por las claves de la sucursal (indices), no por numero_ticket en todas
+            venta = self._buscar_venta(sucursal, numero_ticket or 0, data.get("numero_ticket_cae") or 0,
+                                       data.get("afip_numero_comprobante") or 0)
+        elif numero_ticket:
+            venta = self.session.query(Venta).filter_by(numero_ticket=numero_ticket).first()
+        else:
             self._log(f"  _apply_venta_update SKIP: sin numero_ticket")
             return False
-
-        venta = self.session.query(Venta).filter_by(numero_ticket=numero_ticket).first()
         if not venta:
             self._log(f"  _apply_venta_update SKIP: ticket #{numero_ticket} no existe localmente")
             return False
@@ -1320,7 +2064,7 @@ class FirebaseSyncManager:
                 # Recrear items
                 for item_data in items_data:
                     codigo = item_data.get("codigo_barra", "")
-                    prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first() if codigo else None
+                    prod = self._buscar_producto(codigo) if codigo else None
                     if not prod and codigo:
                         self._log(f"  WARN: producto '{codigo}' no encontrado en update, item sin vinculo")
                     vi = VentaItem(
@@ -1331,13 +2075,13 @@ class FirebaseSyncManager:
                     )
                     self.session.add(vi)
 
-                self.session.commit()
+                self._commit()
             except Exception as e:
-                self.session.rollback()
+                self._rollback()
                 self._log(f"Error actualizando items de venta #{numero_ticket}: {e}")
                 return False
         else:
-            self.session.commit()
+            self._commit()
 
         self._log(f"Venta #{numero_ticket} actualizada (devolucion)")
         return True
@@ -1358,19 +2102,7 @@ class FirebaseSyncManager:
         numero_ticket_cae = data.get("numero_ticket_cae") or 0
         afip_num = data.get("afip_numero_comprobante") or 0
 
-        venta = None
-        if numero_ticket:
-            venta = self.session.query(Venta).filter_by(
-                numero_ticket=numero_ticket, sucursal=sucursal,
-            ).first()
-        if not venta and numero_ticket_cae:
-            venta = self.session.query(Venta).filter_by(
-                numero_ticket_cae=numero_ticket_cae, sucursal=sucursal,
-            ).first()
-        if not venta and afip_num:
-            venta = self.session.query(Venta).filter_by(
-                afip_numero_comprobante=afip_num, sucursal=sucursal,
-            ).first()
+        venta = self._buscar_venta(sucursal, numero_ticket, numero_ticket_cae, afip_num)
 
         if not venta:
             self._log(f"  _apply_venta_delete: ya no existe (ticket={numero_ticket}, "
@@ -1381,13 +2113,14 @@ class FirebaseSyncManager:
             for item in list(venta.items):
                 self.session.delete(item)
             self.session.flush()
+            self._cache_venta(venta, presente=False)
             self.session.delete(venta)
-            self.session.commit()
+            self._commit()
             self._log(f"Venta #{numero_ticket or numero_ticket_cae or afip_num} "
                       f"({sucursal}) eliminada por sync")
             return True
         except Exception as e:
-            self.session.rollback()
+            self._rollback()
             self._log(f"  _apply_venta_delete ERROR: {e}")
             raise
 
@@ -1397,7 +2130,7 @@ class FirebaseSyncManager:
         if not codigo:
             return False
 
-        prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+        prod = self._buscar_producto(codigo)
         if prod:
             # Last-write-wins: comparar timestamps
             local_ts = 0
@@ -1440,26 +2173,27 @@ class FirebaseSyncManager:
             if hasattr(prod, "last_modified"):
                 prod.last_modified = datetime.fromtimestamp(timestamp / 1000) if timestamp else datetime.now()
             self.session.add(prod)
+            self._cache_producto(codigo, prod)
 
         try:
-            self.session.commit()
+            self._commit()
             self._log(f"Producto '{codigo}' sincronizado (precio={data.get('precio', 0)})")
             return True
         except IntegrityError:
-            self.session.rollback()
+            self._rollback()
             return False
 
     def _apply_producto_delete(self, data: dict) -> bool:
         """Elimina un producto local si existe.
 
         v6.7.1: si sync.confirm_delete_productos es True, NO borra inmediatamente.
-        Encola el delete en pending_deletes.json para que la UI muestre popup de
+        Encola el delete en borrados_pendientes (sync_state.db) para que la UI muestre popup de
         confirmacion al usuario en el hilo principal.
         """
         codigo = data.get("codigo_barra")
         if not codigo:
             return False
-        prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+        prod = self._buscar_producto(codigo)
         if not prod:
             return False  # ya no existe, nada que confirmar
 
@@ -1481,63 +2215,38 @@ class FirebaseSyncManager:
             return True  # tratado, cursor avanza; UI hara el resto
 
         # Sin confirmacion: borrar directo (comportamiento previo)
+        self._cache_producto(codigo, None)
         self.session.delete(prod)
-        self.session.commit()
+        self._commit()
         self._log(f"Producto '{codigo}' eliminado por sync")
         return True
 
     # ─── Pending deletes (v6.7.1) ─────────────────────────────────────
+    #
+    # v6.8.0: tabla borrados_pendientes de sync_state.db (antes sync_pending_deletes.json).
 
-    def _pending_deletes_path(self) -> str:
-        return os.path.join(_get_app_data_dir(), PENDING_DELETES_FILENAME)
-
-    def _load_pending_deletes(self) -> list:
-        try:
-            p = self._pending_deletes_path()
-            if os.path.exists(p):
-                with open(p, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                return data if isinstance(data, list) else []
-        except Exception as e:
-            self._log(f"Error cargando pending_deletes: {e}")
-        return []
-
-    def _save_pending_deletes(self, items: list):
+    def _enqueue_pending_delete(self, tipo: str, data: dict, origen: str = ""):
+        """v6.7.1: agrega un delete recibido a la cola para confirmacion en UI.
+        Si ya hay uno sin resolver para la misma entidad, no se duplica."""
         try:
-            with open(self._pending_deletes_path(), "w", encoding="utf-8") as f:
-                json.dump(items[-500:], f, ensure_ascii=False, indent=2)
+            SyncState.get_instance().agregar_borrado_pendiente(tipo, data, origen)
         except Exception as e:
-            self._log(f"Error guardando pending_deletes: {e}")
-
-    def _enqueue_pending_delete(self, tipo: str, data: dict, origen: str = ""):
-        """v6.7.1: agrega un delete recibido a la cola para confirmacion en UI."""
-        items = self._load_pending_deletes()
-        # Dedup: si ya hay uno con (tipo, codigo) sin resolver, no duplicar
-        codigo = data.get("codigo_barra") or data.get("nombre") or data.get("cuit")
-        for it in items:
-            if it.get("tipo") == tipo and (
-                it.get("data", {}).get("codigo_barra") == data.get("codigo_barra") and
-                it.get("data", {}).get("nombre") == data.get("nombre")
-            ):
-                return  # ya esta
-        items.append({
-            "tipo": tipo,
-            "origen": origen,
-            "timestamp": int(time.time() * 1000),
-            "data": data,
-        })
-        self._save_pending_deletes(items)
+            self._log(f"Error guardando pending_delete: {e}")
 
     def get_pending_deletes(self) -> list:
         """v6.7.1: lista de deletes pendientes de confirmacion (para la UI)."""
-        return self._load_pending_deletes()
+        try:
+            return SyncState.get_instance().borrados_pendientes()
+        except Exception as e:
+            self._log(f"Error cargando pending_deletes: {e}")
+            return []
 
     def accept_pending_delete(self, index: int) -> bool:
         """v6.7.1: confirmar borrado pendiente — borra el item localmente."""
-        items = self._load_pending_deletes()
+        items = self.get_pending_deletes()
         if not (0 <= index < len(items)):
             return False
-        item = items.pop(index)
+        item = items[index]
         tipo = item.get("tipo")
         data = item.get("data", {}) or {}
         try:
@@ -1549,20 +2258,19 @@ class FirebaseSyncManager:
                         self.session.delete(prod)
                         self.session.commit()
                         self._log(f"Producto '{codigo}' eliminado tras confirmacion del usuario")
-            self._save_pending_deletes(items)
+            SyncState.get_instance().quitar_borrado_pendiente(item["id"])
             return True
         except Exception as e:
             self.session.rollback()
             self._log(f"Error confirmando pending_delete: {e}")
-            self._save_pending_deletes(items + [item])  # regresa a la cola
-            return False
+            return False  # queda en la cola
 
     def reject_pending_delete(self, index: int) -> bool:
         """v6.7.1: rechazar borrado pendiente — re-publica el item para 'deshacer' la baja en otras sucursales."""
-        items = self._load_pending_deletes()
+        items = self.get_pending_deletes()
         if not (0 <= index < len(items)):
             return False
-        item = items.pop(index)
+        item = items[index]
         tipo = item.get("tipo")
         data = item.get("data", {}) or {}
         try:
@@ -1586,12 +2294,11 @@ class FirebaseSyncManager:
                 if not key:
                     self._enqueue_change("productos", "upsert", payload["data"])
                 self._log(f"Producto '{data.get('codigo_barra')}' delete RECHAZADO — re-publicado para deshacer")
-            self._save_pending_deletes(items)
+            SyncState.get_instance().quitar_borrado_pendiente(item["id"])
             return True
         except Exception as e:
             self._log(f"Error rechazando pending_delete: {e}")
-            self._save_pending_deletes(items + [item])
-            return False
+            return False  # queda en la cola
 
     def _apply_proveedor(self, data: dict, timestamp: int) -> bool:
         """Crea o actualiza un proveedor. Last-write-wins."""
@@ -1624,11 +2331,11 @@ class FirebaseSyncManager:
             self.session.add(prov)
 
         try:
-            self.session.commit()
+            self._commit()
             self._log(f"Proveedor '{nombre}' sincronizado")
             return True
         except IntegrityError:
-            self.session.rollback()
+            self._rollback()
             return False
 
     def _apply_proveedor_delete(self, data: dict) -> bool:
@@ -1639,7 +2346,7 @@ class FirebaseSyncManager:
         prov = self.session.query(Proveedor).filter(Proveedor.nombre == nombre).first()
         if prov:
             self.session.delete(prov)
-            self.session.commit()
+            self._commit()
             self._log(f"Proveedor '{nombre}' eliminado por sync")
             return True
         return False
@@ -1674,12 +2381,8 @@ class FirebaseSyncManager:
 
         # Asignar numero_ticket local si no viene
         if not numero_ticket:
-            last = (self.session.query(PagoProveedor)
-                    .filter(PagoProveedor.sucursal == sucursal,
-                            PagoProveedor.numero_ticket.isnot(None))
-                    .order_by(PagoProveedor.numero_ticket.desc())
-                    .first())
-            numero_ticket = (last.numero_ticket + 1) if last else 1
+            from app.repository import PagoProveedorRepo
+            numero_ticket = PagoProveedorRepo(self.session).siguiente_ticket(sucursal)
 
         pago = PagoProveedor(
             sucursal=sucursal,
@@ -1695,9 +2398,9 @@ class FirebaseSyncManager:
         )
         self.session.add(pago)
         try:
-            self.session.commit()
+            self._commit()
         except IntegrityError:
-            self.session.rollback()
+            self._rollback()
             return False
         self._log(f"Pago prov #{numero_ticket} a {proveedor_nombre} recibido (${monto}, suc={sucursal})")
         return True
@@ -1710,7 +2413,7 @@ class FirebaseSyncManager:
 
         comp = self.session.query(Comprador).filter(Comprador.cuit == cuit).first()
         if comp:
-            # No tenemos last_modified en Comprador; aceptamos last-write-wins por orden de llegada
+            # Last-write-wins por orden de llegada (last_modified es solo la marca del push)
             comp.nombre = data.get("nombre", comp.nombre) or comp.nombre
             comp.domicilio = data.get("domicilio", comp.domicilio) or comp.domicilio
             comp.localidad = data.get("localidad", comp.localidad) or comp.localidad
@@ -1728,11 +2431,11 @@ class FirebaseSyncManager:
             self.session.add(comp)
 
         try:
-            self.session.commit()
+            self._commit()
             self._log(f"Comprador CUIT {cuit} sincronizado")
             return True
         except IntegrityError:
-            self.session.rollback()
+            self._rollback()
             return False
 
     def _apply_comprador_delete(self, data: dict) -> bool:
@@ -1743,14 +2446,14 @@ class FirebaseSyncManager:
         comp = self.session.query(Comprador).filter(Comprador.cuit == cuit).first()
         if comp:
             self.session.delete(comp)
-            self.session.commit()
+            self._commit()
             self._log(f"Comprador CUIT {cuit} eliminado por sync")
             return True
         return False
 
     # ─── Orquestacion ─────────────────────────────────────────────────
 
-    def ejecutar_sincronizacion_completa(self) -> Dict:
+    def ejecutar_sincronizacion_completa(self, tipos=None) -> Dict:
         """
         Ciclo completo de sync:
         1. Flush cola offline
@@ -1760,15 +2463,23 @@ class FirebaseSyncManager:
         v6.7.0: incluye `por_tipo` con desglose por entidad (productos/ventas/proveedores/
         pagos_proveedores/compradores) para que el panel UI muestre que se subio/bajo de cada
         cosa, no solo totales.
+        v6.8.0: con `tipos` (aviso del stream, ver app/firebase_stream.py) el pull es solo
+        de esos tipos y no se publican snapshots (lo hace la sync completa de respaldo).
+        Los resumenes del dashboard (publicar_resumenes) se publican en toda sync.
         """
         TIPOS = ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores")
         por_tipo: Dict[str, Dict[str, int]] = {t: {"sent": 0, "recv": 0, "err": 0} for t in TIPOS}
         errores_list = []
+        # v6.8.0: telemetria de esta corrida (ver _fase / _registrar_corrida)
+        self._telemetria = {"fases": {}, "reintentos": 0, "bloqueos_bd": 0, "espera_bd_ms": 0.0}
+        inicio, t0, http_antes = int(time.time() * 1000), time.perf_counter(), self._http.totales()
 
         # 1. Flush cola offline (con desglose por tipo)
         sent_by_type: Dict[str, int] = {}
         try:
-            sent_by_type = self._flush_offline_queue(by_type=True) or {}
+            with self._fase("flush"):
+                sent_by_type = self._flush_offline_queue(by_type=True) or {}
+            self._telemetria_sumar("flush", enviados=sum(sent_by_type.values()))
         except Exception as e:
             errores_list.append(f"Error flush cola: {e}")
         for t, n in sent_by_type.items():
@@ -1777,7 +2488,7 @@ class FirebaseSyncManager:
 
         # 2. Pull cambios remotos
         try:
-            result = self.pull_changes()
+            result = self.pull_changes(tipos=tipos)
             for t in TIPOS:
                 por_tipo[t]["recv"] = int(result.get(t, 0) or 0)
             if result.get("errores", 0) > 0:
@@ -1785,10 +2496,32 @@ class FirebaseSyncManager:
         except Exception as e:
             errores_list.append(f"Error pull: {e}")
 
+        # 3. v6.8.0: regenerar los snapshots vencidos (no cuenta como error de sync)
+        if tipos is None:
+            try:
+                with self._fase("snapshots"):
+                    publicados = self.publicar_snapshots()
+                self._telemetria_sumar("snapshots", publicados=len(publicados))
+            except Exception as e:
+                self._log(f"Snapshots error: {e}")
+
+        # 4. v6.8.0: resumenes diarios para el dashboard (solo los dias que cambiaron)
+        try:
+            with self._fase("resumenes"):
+                n_resumenes = self.publicar_resumenes()
+            self._telemetria_sumar("resumenes", publicados=n_resumenes)
+        except Exception as e:
+            self._log(f"Resumenes error: {e}")
+
         enviados = sum(p["sent"] for p in por_tipo.values())
         recibidos = sum(p["recv"] for p in por_tipo.values())
 
         self._log(f"Sync completa: {enviados} enviados, {recibidos} recibidos, {len(errores_list)} errores")
+        telemetria = self._registrar_corrida(inicio, (time.perf_counter() - t0) * 1000.0, http_antes,
+                                             enviados, recibidos, len(errores_list), tipos)
+        # v6.8.0: latencias HTTP acumuladas desde la sync anterior
+        self._log(f"HTTP: {self._http.resumen()}")
+        self._http.reset_metricas()
 
         # Enviar alerta si hubo errores de sync
         if errores_list:
@@ -1807,7 +2540,79 @@ class FirebaseSyncManager:
             "recibidos": recibidos,
             "errores": errores_list,
             "por_tipo": por_tipo,  # v6.7.0
+            "telemetria": telemetria,  # v6.8.0
+        }
+
+    # ─── Telemetria (v6.8.0) ──────────────────────────────────────────
+    #
+    # ejecutar_sincronizacion_completa junta en self._telemetria el tiempo, los
+    # requests y los bytes de cada fase (flush, snapshot:{tipo}, pull:{tipo},
+    # snapshots) y los contadores globales (reintentos, bloqueos_bd,
+    # espera_bd_ms); al terminar lo guarda en sync_state.db (tabla sync_runs).
+    # Fuera de una sync completa (pull manual, push inicial) no se mide nada.
+
+    def _telemetria_sumar(self, fase: Optional[str] = None, ms: float = 0.0, **contadores) -> None:
+        """Suma contadores a una fase (o a los globales si fase es None)."""
+        t = self._telemetria
+        if t is None:
+            return
+        destino = t
+        if fase is not None:
+            destino = t["fases"].setdefault(fase, {"ms": 0.0})
+            destino["ms"] += ms
+        for k, v in contadores.items():
+            destino[k] = destino.get(k, 0) + v
+
+    @contextmanager
+    def _fase(self, fase: str):
+        """Mide duracion, requests y bytes de lo que corre dentro del with.
+        Los GETs del pool de pull cuentan en la fase en curso cuando terminan."""
+        if self._telemetria is None:
+            yield
+            return
+        antes, t0 = self._http.totales(), time.perf_counter()
+        try:
+            yield
+        finally:
+            despues = self._http.totales()
+            self._telemetria_sumar(fase, (time.perf_counter() - t0) * 1000.0,
+                                   **{k: despues[k] - antes[k] for k in despues})
+
+    def _registrar_corrida(self, inicio: int, duracion_ms: float, http_antes: dict,
+                           enviados: int, recibidos: int, errores: int, tipos=None) -> dict:
+        """Cierra la telemetria de la corrida y la guarda. Retorna el registro."""
+        t, self._telemetria = self._telemetria or {}, None
+        http = self._http.totales()
+        aplicados = sum(f.get("aplicados", 0) for f in t.get("fases", {}).values())
+        ms_apply = sum(f["ms"] for k, f in t.get("fases", {}).items() if k.startswith(("pull:", "snapshot:")))
+        corrida = {
+            "inicio": inicio,
+            "sucursal": self.sucursal_local,
+            "duracion_ms": round(duracion_ms, 1),
+            "enviados": enviados,
+            "recibidos": recibidos,
+            "errores": errores,
+            "requests": http["requests"] - http_antes["requests"],
+            "bytes_out": http["bytes_out"] - http_antes["bytes_out"],
+            "bytes_in": http["bytes_in"] - http_antes["bytes_in"],
+            "reintentos": t.get("reintentos", 0),
+            "bloqueos_bd": t.get("bloqueos_bd", 0),
+            "espera_bd_ms": round(t.get("espera_bd_ms", 0.0), 1),
+            "aplicados_por_seg": round(aplicados * 1000.0 / ms_apply, 1) if ms_apply else 0.0,
+            "tipos": sorted(tipos) if tipos is not None else None,   # pull parcial (modo stream)
+            "fases": {k: {c: round(v, 1) if isinstance(v, float) else v for c, v in f.items()}
+                      for k, f in t.get("fases", {}).items()},
+            "http": self._http.metricas(),
         }
+        try:
+            SyncState.get_instance().registrar_corrida(corrida)
+        except Exception as e:
+            self._log(f"Telemetria: no se pudo guardar la corrida: {e}")
+        self._log(f"Telemetria: {corrida['duracion_ms']:.0f}ms, {corrida['requests']} requests, "
+                  f"out={corrida['bytes_out'] / 1024:.0f}KB in={corrida['bytes_in'] / 1024:.0f}KB, "
+                  f"{corrida['aplicados_por_seg']:.0f} aplicados/s, reintentos={corrida['reintentos']}, "
+                  f"espera BD={corrida['espera_bd_ms']:.0f}ms")
+        return corrida
 
     # ─── Test de conexion ─────────────────────────────────────────────
 
@@ -1821,8 +2626,7 @@ class FirebaseSyncManager:
             return False, "Token de autenticacion no configurado."
 
         try:
-            url = f"{db_url.rstrip('/')}/.json?auth={token}&shallow=true"
-            resp = requests.get(url, timeout=10)
+            resp = self._http.request("GET", "", params={"shallow": "true"}, timeout=10)
 
             if resp.status_code == 200:
                 return True, "Conexion exitosa con Firebase."
@@ -1869,11 +2673,9 @@ class FirebaseSyncManager:
 
         # ---- Upload (cola offline) ----
         try:
-            queue = self._load_offline_queue()
-            for item in queue:
-                tipo = item.get("tipo")
+            for tipo, n in SyncState.get_instance().contar_por_tipo().items():
                 if tipo in result["upload"]:
-                    result["upload"][tipo] += 1
+                    result["upload"][tipo] += n
         except Exception as e:
             result["ok"] = False
             result["error"] = f"Error leyendo cola offline: {e}"
@@ -1894,7 +2696,7 @@ class FirebaseSyncManager:
             return result
 
         # v6.6.2: usar el helper real (la clase no tiene un atributo last_processed_keys,
-        # los cursores viven en config["sync"]["last_processed_keys"]).
+        # v6.8.0: los cursores viven en sync_state.db, tabla pull_cursores).
         try:
             last_keys = self._get_last_processed_keys() or {}
         except Exception:
@@ -1903,20 +2705,13 @@ class FirebaseSyncManager:
 
         for tipo in ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores"):
             try:
-                # Reusar el helper interno _firebase_get_path (paginado por orderBy)
-                from urllib.parse import urlencode
-                path = f"cambios/{tipo}.json"
+                path = f"cambios/{tipo}"
                 params = {"orderBy": '"$key"'}
                 last_k = last_keys.get(tipo)
                 if last_k:
                     params["startAt"] = f'"{last_k}"'
                 params["limitToFirst"] = str(max_per_type + 1)  # +1 para detectar "hay mas"
-                if token:
-                    params["auth"] = token
-                url = f"{db_url.rstrip('/')}/{path}?{urlencode(params)}"
-
-                import requests
-                r = requests.get(url, timeout=10)
+                r = self._http.request("GET", path, params=params, timeout=10)
                 if r.status_code != 200:
                     continue
                 data = r.json() or {}
@@ -2020,8 +2815,7 @@ class FirebaseSyncManager:
                 return result
             for tipo in ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores"):
                 try:
-                    url = f"{db_url.rstrip('/')}/cambios/{tipo}.json?shallow=true&auth={token}"
-                    r = requests.get(url, timeout=15)
+                    r = self._http.request("GET", f"cambios/{tipo}", params={"shallow": "true"}, timeout=15)
                     if r.status_code == 200:
                         data = r.json() or {}
                         # shallow=true devuelve dict {key: true, ...}
@@ -2036,11 +2830,9 @@ class FirebaseSyncManager:
 
         # ---- Upload queue ----
         try:
-            queue = self._load_offline_queue()
-            for item in queue:
-                tipo = item.get("tipo")
+            for tipo, n in SyncState.get_instance().contar_por_tipo().items():
                 if tipo in result["upload_queue"]:
-                    result["upload_queue"][tipo] += 1
+                    result["upload_queue"][tipo] += n
         except Exception:
             pass
 
@@ -2054,50 +2846,52 @@ class FirebaseSyncManager:
 
     # ─── Skip-on-fail helpers (v6.6.2) ────────────────────────────────
 
-    def _fail_counter_path(self) -> str:
-        return os.path.join(_get_app_data_dir(), "sync_fail_counter.json")
-
-    def _load_fail_counter(self) -> dict:
-        try:
-            if os.path.exists(self._fail_counter_path()):
-                with open(self._fail_counter_path(), "r", encoding="utf-8") as f:
-                    return json.load(f) or {}
-        except Exception:
-            pass
-        return {}
+    # v6.8.0: los contadores viven en la tabla pull_fallos de sync_state.db (antes
+    # sync_fail_counter.json, reescrito entero en cada bump y en cada reset, o sea
+    # por cada cambio aplicado). _pull_entity los carga una vez por tipo, los
+    # modifica en memoria y _guardar_contabilidad_pull los escribe al cerrar
+    # cada pagina junto con los salteados.
+
+    def _contabilidad_pull(self, tipo: str) -> dict:
+        c = self._cont_pull
+        if c is None or c["tipo"] != tipo:
+            c = self._cont_pull = {
+                "tipo": tipo,
+                "fallos": SyncState.get_instance().fallos_pull(tipo),
+                "cambiados": {}, "borrar": set(), "saltados": [],
+            }
+        return c
 
-    def _save_fail_counter(self, data: dict) -> None:
+    def _guardar_contabilidad_pull(self) -> None:
+        c = self._cont_pull
+        if c is None:
+            return
         try:
-            with open(self._fail_counter_path(), "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            SyncState.get_instance().guardar_fallos_pull(c["tipo"], c["cambiados"], c["borrar"], c["saltados"])
         except Exception as e:
             self._log(f"WARN: no se pudo persistir fail counter: {e}")
+        c["cambiados"], c["borrar"], c["saltados"] = {}, set(), []
 
     def _bump_fail_count(self, tipo: str, push_key: str) -> int:
         """Incrementa el contador de fallos para (tipo, push_key) y devuelve el nuevo valor."""
-        data = self._load_fail_counter()
-        bucket = data.setdefault(tipo, {})
-        n = int(bucket.get(push_key, 0)) + 1
-        bucket[push_key] = n
-        self._save_fail_counter(data)
+        c = self._contabilidad_pull(tipo)
+        n = int(c["fallos"].get(push_key, 0)) + 1
+        c["fallos"][push_key] = n
+        c["cambiados"][push_key] = n
+        c["borrar"].discard(push_key)
         return n
 
     def _reset_fail_count(self, tipo: str, push_key: str) -> None:
         """Limpia el contador para (tipo, push_key) cuando se aplica OK o se skipea por duplicado."""
-        data = self._load_fail_counter()
-        bucket = data.get(tipo) or {}
-        if push_key in bucket:
-            bucket.pop(push_key, None)
-            data[tipo] = bucket
-            self._save_fail_counter(data)
-
-    def _skipped_log_path(self) -> str:
-        return os.path.join(_get_app_data_dir(), "logs", "sync_skipped.log")
+        c = self._contabilidad_pull(tipo)
+        if push_key in c["fallos"]:
+            c["fallos"].pop(push_key, None)
+            c["cambiados"].pop(push_key, None)
+            c["borrar"].add(push_key)
 
     def _log_skipped(self, tipo: str, push_key: str, change: dict, err: str, fail_count: int) -> None:
         """Registra un cambio que fue skipeado permanentemente para inspeccion del usuario."""
         try:
-            os.makedirs(os.path.dirname(self._skipped_log_path()), exist_ok=True)
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             origen = change.get("sucursal_origen", "?")
             data = change.get("data", {}) or {}
@@ -2116,21 +2910,17 @@ class FirebaseSyncManager:
                 ident = "?"
             line = (
                 f"[{ts}] [{self.sucursal_local}] SKIP {tipo}/{push_key} "
-                f"(origen={origen}, fallos={fail_count}): {ident} :: {err}\n"
+                f"(origen={origen}, fallos={fail_count}): {ident} :: {err}"
             )
-            with open(self._skipped_log_path(), "a", encoding="utf-8") as f:
-                f.write(line)
+            # v6.8.0: tabla pull_saltados (se escribe con el resto de la pagina)
+            self._contabilidad_pull(tipo)["saltados"].append((push_key, fail_count, line))
         except Exception as e:
-            self._log(f"WARN: no se pudo escribir sync_skipped.log: {e}")
+            self._log(f"WARN: no se pudo registrar el item salteado: {e}")
 
     def get_skipped_log_lines(self, max_lines: int = 200) -> list:
         """Retorna las ultimas N lineas del log de items skipeados, para mostrar en UI."""
         try:
-            if not os.path.exists(self._skipped_log_path()):
-                return []
-            with open(self._skipped_log_path(), "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            return [ln.rstrip() for ln in lines[-max_lines:]]
+            return SyncState.get_instance().saltados(max_lines)
         except Exception:
             return []
 
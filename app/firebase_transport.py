@@ -0,0 +1,316 @@
+# app/firebase_transport.py
+"""
+Transporte HTTP para la REST API de Firebase (v6.8.0).
+
+Antes cada _firebase_get/_post/... hacia un requests.get/post suelto (conexion
+TCP + handshake TLS nuevos por request) y releia app_config.json para armar
+la URL. Aca:
+
+  - un unico requests.Session por proceso con HTTPAdapter (keep-alive y pool
+    de conexiones por host), compartido por todos los FirebaseSyncManager;
+  - la seccion `sync` de la config cacheada en memoria; se invalida sola
+    cuando alguien llama a config.save() (ver config.add_save_listener);
+  - contadores por metodo HTTP: n, errores, latencia total/maxima y bytes
+    enviados / recibidos (recibidos = lo que viajo por la red, comprimido);
+  - cuerpos de batch serializados entrada por entrada (LoteJSON);
+  - streams de eventos de la RTDB (abrir_stream + eventos_sse) para el modo
+    "stream" de la sync (ver app/firebase_stream.py).
+
+Uso:
+    from app.firebase_transport import FirebaseTransport
+    t = FirebaseTransport.get_instance()
+    resp = t.request("GET", "cambios/ventas", params={"shallow": "true"})
+"""
+import json as _json
+import logging
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import load as load_config, add_save_listener
+
+logger = logging.getLogger(__name__)
+
+# Singleton
+_instance = None
+_instance_lock = threading.Lock()
+
+REQUEST_TIMEOUT = 30   # segundos (igual que firebase_sync)
+POOL_CONNECTIONS = 4   # hosts distintos cacheados (en la practica: la URL de la RTDB)
+POOL_MAXSIZE = 8       # conexiones keep-alive por host
+STREAM_CHUNK = 64 * 1024   # bytes por lectura de un stream de eventos
+# v6.8.0: la RTDB manda keep-alive cada ~30 s; sin datos en este tiempo el stream se da por muerto
+STREAM_READ_TIMEOUT = 90
+
+
+class FirebaseTransport:
+    """requests.Session compartido + config cacheada + metricas de latencia."""
+
+    def __init__(self, pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE):
+        self._pool_connections = pool_connections
+        self._pool_maxsize = pool_maxsize
+        self._http = None
+        self._sync_cfg = None
+        self._lock = threading.Lock()
+        self._metricas: Dict[str, Dict[str, float]] = {}
+        add_save_listener(self.invalidar_config)
+
+    @classmethod
+    def get_instance(cls) -> "FirebaseTransport":
+        """Retorna la instancia singleton."""
+        global _instance
+        with _instance_lock:
+            if _instance is None:
+                _instance = cls()
+            return _instance
+
+    # ─── Configuracion cacheada ──────────────────────────────────────
+
+    def sync_config(self) -> dict:
+        """Seccion `sync` de app_config.json (leida una vez hasta el proximo save)."""
+        cfg = self._sync_cfg
+        if cfg is None:
+            cfg = load_config().get("sync", {}) or {}
+            self._sync_cfg = cfg
+        return cfg
+
+    def firebase_config(self) -> Tuple[str, str]:
+        """(database_url, auth_token) de la config cacheada."""
+        fb = self.sync_config().get("firebase", {}) or {}
+        return fb.get("database_url", ""), fb.get("auth_token", "")
+
+    def invalidar_config(self):
+        """Descarta la config cacheada (se vuelve a leer en el proximo request)."""
+        self._sync_cfg = None
+
+    # ─── HTTP ────────────────────────────────────────────────────────
+
+    def _session(self) -> requests.Session:
+        http = self._http
+        if http is None:
+            with self._lock:
+                if self._http is None:
+                    http = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self._pool_connections,
+                                          pool_maxsize=self._pool_maxsize)
+                    http.mount("https://", adapter)
+                    http.mount("http://", adapter)
+                    self._http = http
+                http = self._http
+        return http
+
+    def url(self, path: str) -> str:
+        """URL REST de `path` (sin el token de auth)."""
+        db_url, _ = self.firebase_config()
+        path = path.strip("/")
+        if not path.endswith(".json"):
+            path = f"{path}.json"
+        return f"{db_url.rstrip('/')}/{path}"
+
+    def request(self, method: str, path: str, params: Optional[dict] = None,
+                json=None, timeout: float = REQUEST_TIMEOUT) -> requests.Response:
+        """Hace el request sobre la conexion persistente (agrega `auth`).
+
+        Las excepciones de requests se propagan igual que con requests.get/...;
+        cada llamada suma a las metricas de su metodo. `json` puede ser un
+        LoteJSON (se manda su cuerpo ya serializado).
+        """
+        method = method.upper()
+        _, token = self.firebase_config()
+        q = dict(params or {})
+        if token:
+            q["auth"] = token
+        data = headers = None
+        if isinstance(json, LoteJSON):
+            data, headers, json = json.cuerpo(), {"Content-Type": "application/json"}, None
+        t0 = time.perf_counter()
+        error = True
+        enviados = recibidos = 0
+        try:
+            resp = self._session().request(method, self.url(path), params=q, json=json,
+                                           data=data, headers=headers,
+                                           timeout=timeout)
+            error = resp.status_code >= 400
+            enviados = len(resp.request.body or b"")
+            recibidos = _bytes_recibidos(resp)
+            return resp
+        finally:
+            self._registrar(method, (time.perf_counter() - t0) * 1000.0, error, enviados, recibidos)
+
+    def abrir_stream(self, path: str, params: Optional[dict] = None,
+                     read_timeout: float = STREAM_READ_TIMEOUT) -> requests.Response:
+        """GET en modo streaming de la REST API (Accept: text/event-stream).
+
+        Va por una conexion propia, fuera del pool: queda abierta mientras dure
+        el stream. Los eventos se leen con eventos_sse(resp); para cortarlo
+        desde otro hilo, resp.close(). Cuenta en las metricas como "STREAM".
+        """
+        _, token = self.firebase_config()
+        q = dict(params or {})
+        if token:
+            q["auth"] = token
+        t0 = time.perf_counter()
+        error = True
+        try:
+            # Sin gzip: el servidor podria retener eventos hasta llenar un bloque
+            resp = requests.get(self.url(path), params=q, stream=True,
+                                headers={"Accept": "text/event-stream", "Accept-Encoding": "identity"},
+                                timeout=(REQUEST_TIMEOUT, read_timeout))
+            error = resp.status_code >= 400
+            return resp
+        finally:
+            self._registrar("STREAM", (time.perf_counter() - t0) * 1000.0, error)
+
+    def cerrar(self):
+        """Cierra las conexiones del pool (se reabren solas en el proximo request)."""
+        with self._lock:
+            http, self._http = self._http, None
+        if http is not None:
+            http.close()
+
+    # ─── Metricas ────────────────────────────────────────────────────
+
+    def _registrar(self, method: str, ms: float, error: bool, enviados: int = 0, recibidos: int = 0):
+        with self._lock:
+            m = self._metricas.setdefault(method, {"n": 0, "errores": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                   "bytes_out": 0, "bytes_in": 0})
+            m["n"] += 1
+            m["errores"] += int(error)
+            m["total_ms"] += ms
+            m["max_ms"] = max(m["max_ms"], ms)
+            m["bytes_out"] += enviados
+            m["bytes_in"] += recibidos
+
+    def metricas(self) -> Dict[str, Dict[str, float]]:
+        """{metodo: {n, errores, total_ms, max_ms, prom_ms, bytes_out, bytes_in}} desde el ultimo reset."""
+        with self._lock:
+            out = {k: dict(v) for k, v in self._metricas.items()}
+        for m in out.values():
+            m["prom_ms"] = m["total_ms"] / m["n"] if m["n"] else 0.0
+        return out
+
+    def reset_metricas(self):
+        with self._lock:
+            self._metricas.clear()
+
+    def totales(self) -> Dict[str, float]:
+        """{requests, errores, bytes_out, bytes_in} sumando todos los metodos."""
+        out = {"requests": 0, "errores": 0, "bytes_out": 0, "bytes_in": 0}
+        for m in self.metricas().values():
+            out["requests"] += m["n"]
+            out["errores"] += m["errores"]
+            out["bytes_out"] += m["bytes_out"]
+            out["bytes_in"] += m["bytes_in"]
+        return out
+
+    def resumen(self) -> str:
+        """Una linea con las metricas por metodo, para el log de sync."""
+        partes = [f"{k} n={m['n']} err={m['errores']} prom={m['prom_ms']:.0f}ms max={m['max_ms']:.0f}ms "
+                  f"out={m['bytes_out'] / 1024:.0f}KB in={m['bytes_in'] / 1024:.0f}KB"
+                  for k, m in sorted(self.metricas().items())]
+        return "; ".join(partes) or "sin requests"
+
+
+# ─── Serializacion incremental (v6.8.0) ──────────────────────────────
+
+_ENCODER = _json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+class LoteJSON:
+    """Objeto JSON {key: valor} para un PATCH multi-path, serializado a medida que
+    se agregan entradas (batch[key] = valor). En memoria queda solo el cuerpo
+    compacto en bytes, no los 500 dicts mas su texto.
+    """
+
+    def __init__(self):
+        self._buf = bytearray(b"{")
+        self._n = 0
+        self._error = None
+
+    def __setitem__(self, key: str, valor):
+        try:
+            entrada = _ENCODER.encode(str(key)) + ":" + _ENCODER.encode(valor)
+        except ValueError as e:
+            # NaN/inf: igual que requests, el error sale al mandar el batch
+            self._error = e
+            return
+        if self._n:
+            self._buf += b","
+        self._buf += entrada.encode("utf-8")
+        self._n += 1
+
+    def __len__(self) -> int:
+        return self._n
+
+    def cuerpo(self) -> bytes:
+        if self._error is not None:
+            raise self._error
+        return bytes(self._buf) + b"}"
+
+
+def _bytes_recibidos(resp: requests.Response) -> int:
+    """Bytes del cuerpo tal como viajaron (comprimidos si vino con gzip)."""
+    try:
+        return int(resp.raw.tell())
+    except Exception:
+        return len(resp.content or b"")
+
+
+# ─── Server-Sent Events (v6.8.0) ─────────────────────────────────────
+
+def _bloques_stream(resp: requests.Response) -> Iterator[bytes]:
+    """Bytes de un response abierto apenas llegan (sin esperar a llenar un bloque)."""
+    raw = resp.raw
+    if getattr(raw, "chunked", False):
+        yield from resp.iter_content(chunk_size=None)   # un bloque por chunk HTTP
+    elif hasattr(raw, "read1"):
+        while True:
+            bloque = raw.read1(STREAM_CHUNK)
+            if not bloque:
+                return
+            yield bloque
+    else:
+        yield from resp.iter_content(chunk_size=1)
+
+
+def eventos_sse(resp: requests.Response) -> Iterator[Tuple[str, object]]:
+    """(evento, data) de un response text/event-stream a medida que llegan.
+
+    La RTDB manda `put` / `patch` con data {"path": ..., "data": ...},
+    `keep-alive` (data null), `cancel` y `auth_revoked`. El data se devuelve
+    parseado como JSON (o el texto tal cual si no lo es). Termina cuando el
+    servidor cierra la conexion.
+    """
+    buf = bytearray()
+    evento, datos = None, []
+    for bloque in _bloques_stream(resp):
+        desde = len(buf)
+        buf += bloque
+        inicio = 0
+        while True:
+            fin = buf.find(b"\n", max(inicio, desde))
+            if fin < 0:
+                break
+            linea = bytes(buf[inicio:fin]).rstrip(b"\r").decode("utf-8", "replace")
+            inicio = fin + 1
+            if not linea:
+                if evento is not None or datos:
+                    texto = "\n".join(datos)
+                    try:
+                        valor = _json.loads(texto) if texto else None
+                    except ValueError:
+                        valor = texto
+                    yield evento or "message", valor
+                evento, datos = None, []
+            elif not linea.startswith(":"):
+                campo, _, valor = linea.partition(":")
+                if valor.startswith(" "):
+                    valor = valor[1:]
+                if campo == "event":
+                    evento = valor
+                elif campo == "data":
+                    datos.append(valor)
+        del buf[:inicio]
@@ -415,6 +415,9 @@ class BackupConfigPanel(QWidget):
             db_path + "-wal",
             config_path,
             os.path.join(app_data_dir, "sync_queue.json"),
+            os.path.join(app_data_dir, "sync_state.db"),
+            os.path.join(app_data_dir, "sync_state.db-wal"),
+            os.path.join(app_data_dir, "sync_state.db-shm"),
             os.path.join(app_data_dir, "config_restore.marker"),
         ]
         logs_dir = os.path.join(app_data_dir, "logs")
@@ -481,7 +484,7 @@ del "%~f0"
             "- Historial de ventas sincronizadas\n"
             "- Historial de productos sincronizados\n"
             "- Historial de proveedores sincronizados\n"
-            "- Cursores de sincronización (last_processed_keys)\n\n"
+            "- Cursores de sincronización\n\n"
             "⚠ IMPORTANTE: Ambas sucursales deben estar sincronizadas\n"
             "antes de vaciar, o se perderán cambios pendientes.\n\n"
             "La sincronización seguirá funcionando normalmente después.\n"
@@ -519,6 +522,7 @@ del "%~f0"
         try:
             import requests
             from app.config import load as load_config, save as save_config
+            from app.sync_state import SyncState
 
             cfg = load_config()
             sync_cfg = cfg.get("sync", {})
@@ -566,7 +570,8 @@ del "%~f0"
             else:
                 errores.append(f"cursores: HTTP {resp.status_code}")
 
-            # 5) Resetear cursores locales en config
+            # 5) Resetear cursores locales (v6.8.0: sync_state.db; en config si no se migraron)
+            SyncState.get_instance().reiniciar_pull(fallos=False)
             sync_cfg.pop("last_processed_keys", None)
             sync_cfg.pop("last_processed_key", None)
             cfg["sync"] = sync_cfg
@@ -730,45 +730,8 @@ class ProductosDialog(QDialog):
             QMessageBox.warning(self,'Error',f'No se pudo leer:\n{e}')
             return
 
-        # Clasificar filas
-        nuevos = {}  # dict por codigo para deduplicar
-        modificados, sin_cambios, filas_omitidas = [], 0, 0
-        for _, row in df.iterrows():
-            codigo = self._limpiar_valor_excel(row.get('codigo_barra',''))
-            nombre = self._limpiar_valor_excel(row.get('nombre',''))
-            try:
-                import math
-                raw_precio = row.get('precio', 0)
-                if isinstance(raw_precio, float) and math.isnan(raw_precio):
-                    raw_precio = 0
-                precio = float(raw_precio)
-            except: precio = 0.0
-            categoria = self._limpiar_valor_excel(row.get('categoria','')) or None
-            if not codigo or not nombre or codigo == 'nan' or nombre == 'nan':
-                filas_omitidas += 1
-                continue
-            prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
-            if prod:
-                hay_diff = (
-                    prod.nombre != nombre or
-                    abs((prod.precio or 0) - precio) > 0.001 or
-                    (prod.categoria or '') != (categoria or '')
-                )
-                if hay_diff:
-                    modificados.append({
-                        'codigo_barra': codigo,
-                        'nombre_actual': prod.nombre, 'nombre_nuevo': nombre,
-                        'precio_actual': prod.precio or 0, 'precio_nuevo': precio,
-                        'categoria_actual': prod.categoria, 'categoria_nueva': categoria,
-                        'prod_obj': prod,
-                    })
-                else:
-                    sin_cambios += 1
-            else:
-                nuevos[codigo] = {'codigo_barra': codigo, 'nombre': nombre,
-                                  'precio': precio, 'categoria': categoria}
-
-        nuevos_list = list(nuevos.values())
+        # Clasificar filas (v6.8.0: merge vectorizado contra el catalogo)
+        nuevos_list, modificados, sin_cambios, filas_omitidas = self.prod_repo.diff_importacion(df)
 
         if not nuevos_list and not modificados:
             QMessageBox.information(self, 'Importación',
@@ -783,20 +746,13 @@ class ProductosDialog(QDialog):
             return
 
         try:
-            cont_nuevos, cont_actualizados = 0, 0
-            for p in nuevos_list:
-                self.session.add(Producto(codigo_barra=p['codigo_barra'], nombre=p['nombre'],
-                                          precio=p['precio'], categoria=p['categoria']))
-                cont_nuevos += 1
+            filas = list(nuevos_list)
             if modo == 'todos' and mod_seleccionados:
-                for m in mod_seleccionados:
-                    prod = m['prod_obj']
-                    prod.nombre = m['nombre_nuevo']
-                    prod.precio = m['precio_nuevo']
-                    prod.categoria = m['categoria_nueva']
-                    cont_actualizados += 1
-
-            self.session.commit()
+                filas += [{'codigo_barra': m['codigo_barra'], 'nombre': m['nombre_nuevo'],
+                           'precio': m['precio_nuevo'], 'categoria': m['categoria_nueva']}
+                          for m in mod_seleccionados]
+            nuevos_rows, actualizados_rows = self.prod_repo.bulk_upsert(pandas.DataFrame(filas))
+            cont_nuevos, cont_actualizados = len(nuevos_rows), len(actualizados_rows)
             self.cargar()
             self.data_changed.emit()
             QMessageBox.information(self,'Importación',
@@ -1110,7 +1066,7 @@ class ImportPreviewDialog(QDialog):
         """
         nuevos: list of dicts {codigo_barra, nombre, precio, categoria}
         modificados: list of dicts {codigo_barra, nombre_actual, nombre_nuevo, precio_actual,
-                     precio_nuevo, categoria_actual, categoria_nueva, prod_obj}
+                     precio_nuevo, categoria_actual, categoria_nueva, producto_id}
         sin_cambios: int (cantidad)
         """
         super().__init__(parent)
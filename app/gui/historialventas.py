@@ -126,6 +126,8 @@ class HistorialVentasWidget(QWidget):
     - Programación de envíos (diario/semanal/mensual a hora fija).
     - Doble clic en una venta => dialog con items vendidos.
     """
+    PAGE_SIZE = 500   # ventas por pagina en el listado (v6.8.0)
+
     def __init__(self, session, sucursal_actual: Optional[str] = None, parent=None, es_admin: bool = False):
         super().__init__(parent)
         self.session = session
@@ -134,6 +136,9 @@ class HistorialVentasWidget(QWidget):
         self.es_admin = es_admin
 
         self._ventas_cache: List[Venta] = []
+        # v6.8.0: el listado se carga por paginas (keyset); los totales salen de SQL
+        self._ventas_cursor = None
+        self._ventas_totales: Optional[dict] = None
 
         root = QVBoxLayout(self)
 
@@ -258,6 +263,12 @@ class HistorialVentasWidget(QWidget):
         bar = QHBoxLayout()
         self.lbl_resumen = QLabel("0 ventas — Total $0.00")
         bar.addWidget(self.lbl_resumen)
+
+        self.btn_cargar_mas = QPushButton("Cargar más")
+        self.btn_cargar_mas.setToolTip(f"Cargar las siguientes {self.PAGE_SIZE} ventas del rango")
+        self.btn_cargar_mas.clicked.connect(self._cargar_mas)
+        self.btn_cargar_mas.setVisible(False)
+        bar.addWidget(self.btn_cargar_mas)
         bar.addStretch(1)
 
         self.chk_incluir_items = QCheckBox("Incluir detalle de productos en Excel")
@@ -468,10 +479,6 @@ class HistorialVentasWidget(QWidget):
 
         return card
 
-    def _obtener_ventas_rango(self, dt_min, dt_max, sucursal=None):
-        """Obtiene ventas en un rango de fechas con una sola query SQL."""
-        return self.repo.listar_por_rango(dt_min, dt_max, sucursal)
-
     def _actualizar_estadisticas(self):
         """Actualiza las estadísticas basándose en los filtros actuales"""
         from collections import defaultdict
@@ -491,26 +498,32 @@ class HistorialVentasWidget(QWidget):
         filtros_texto += f"  |  CAE: {cae_nombre}  |  Pago: {pago_nombre}"
         self.stats_filtros_banner.setText(filtros_texto)
 
-        # Consultar ventas usando el método correcto
-        ventas = self._obtener_ventas_rango(dt_min, dt_max, suc)
-        logger.debug("Total ventas encontradas: %d", len(ventas))
+        # Resumen diario (v6.8.0): filas por (sucursal, dia, modo_pago, con_cae)
+        # en vez de materializar cada Venta del rango.
+        desde_d = dt_min.date()
+        hasta_d = (dt_max - timedelta(days=1)).date()   # dt_max es exclusivo
+        filas = self.repo.resumen_diario(desde_d, hasta_d, suc)
+        logger.debug("Filas de resumen diario: %d", len(filas))
 
         # Filtro CAE (Sin CAE / Con CAE)
+        con_cae = None
         if cae_txt == "sin cae":
-            ventas = [v for v in ventas if not getattr(v, "afip_cae", None)]
+            con_cae = False
+            filas = [f for f in filas if not f.con_cae]
         elif cae_txt == "con cae":
-            ventas = [v for v in ventas if getattr(v, "afip_cae", None)]
+            con_cae = True
+            filas = [f for f in filas if f.con_cae]
 
         # Subfiltro forma de pago
         if pago_txt in ("efectivo", "tarjeta"):
-            ventas = [v for v in ventas if (getattr(v, "modo_pago", "") or "").lower() == pago_txt]
-            logger.debug("Ventas después de filtrar por %s: %d", pago_txt, len(ventas))
+            filas = [f for f in filas if (f.modo_pago or "").lower() == pago_txt]
+            logger.debug("Filas después de filtrar por %s: %d", pago_txt, len(filas))
 
         # Calcular KPIs
-        total = sum(getattr(v, 'total', 0) or 0 for v in ventas)
-        cantidad = len(ventas)
+        total = sum(f.total or 0 for f in filas)
+        cantidad = sum(f.cantidad for f in filas)
         promedio = total / cantidad if cantidad > 0 else 0
-        total_interes = sum(getattr(v, 'interes_monto', 0) or 0 for v in ventas)
+        total_interes = sum(f.interes or 0 for f in filas)
         logger.debug("KPIs - Total: $%s, Cantidad: %d, Promedio: $%s", total, cantidad, promedio)
 
         # Actualizar KPI cards
@@ -520,29 +533,31 @@ class HistorialVentasWidget(QWidget):
         self.kpi_interes.findChild(QLabel, "kpi_value").setText(f"${total_interes:,.2f}")
 
         # Generar gráfico de barras
-        self._generar_grafico_ventas(ventas, dt_min, dt_max)
+        self._generar_grafico_ventas(filas, dt_min, dt_max)
 
         # Generar gráfico de torta para formas de pago
-        self._generar_grafico_formas_pago(ventas)
+        self._generar_grafico_formas_pago(filas)
 
         # Mostrar comparativa solo si se seleccionó "Todas" las sucursales
         if suc is None:  # "Todas"
             self.stats_comparativa_group.setVisible(True)
-            self._generar_comparativa_sucursales(dt_min, dt_max, pago_txt)
+            self._generar_comparativa_sucursales(filas)
         else:
             self.stats_comparativa_group.setVisible(False)
 
         # Calcular top productos
-        self._calcular_top_productos(ventas)
+        self._calcular_top_productos(
+            desde_d, hasta_d, suc,
+            pago_txt if pago_txt in ("efectivo", "tarjeta") else None, con_cae)
 
-    def _generar_grafico_ventas(self, ventas, dt_min, dt_max):
-        """Genera un gráfico de barras con las ventas por día"""
+    def _generar_grafico_ventas(self, filas, dt_min, dt_max):
+        """Genera un gráfico de barras con las ventas por día (filas de resumen_diario)"""
         try:
             from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
             from matplotlib.figure import Figure
             from collections import defaultdict
 
-            logger.debug("Generando gráfico de ventas con %d ventas", len(ventas))
+            logger.debug("Generando gráfico de ventas con %d filas", len(filas))
 
             # Limpiar contenedor anterior
             for i in reversed(range(self.stats_chart_layout.count())):
@@ -550,14 +565,11 @@ class HistorialVentasWidget(QWidget):
                 if widget:
                     widget.deleteLater()
 
-            # Agrupar ventas por día
+            # Agrupar por día
             ventas_por_dia = defaultdict(float)
-            for v in ventas:
-                fecha = getattr(v, 'fecha', None)
-                if fecha:
-                    dia = fecha.date()
-                    total = getattr(v, 'total', 0) or 0
-                    ventas_por_dia[dia] += total
+            for f in filas:
+                if f.fecha:
+                    ventas_por_dia[f.fecha] += f.total or 0
 
             # Ordenar por fecha
             dias = sorted(ventas_por_dia.keys())
@@ -600,14 +612,14 @@ class HistorialVentasWidget(QWidget):
         except Exception as e:
             logger.error("Error generando gráfico: %s", e, exc_info=True)
 
-    def _generar_grafico_formas_pago(self, ventas):
+    def _generar_grafico_formas_pago(self, filas):
         """Genera un gráfico de torta mostrando la distribución de formas de pago"""
         try:
             from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
             from matplotlib.figure import Figure
             from collections import defaultdict
 
-            logger.debug("Generando gráfico de torta con %d ventas", len(ventas))
+            logger.debug("Generando gráfico de torta con %d filas", len(filas))
 
             # Limpiar contenedor anterior
             for i in reversed(range(self.stats_pie_layout.count())):
@@ -617,10 +629,8 @@ class HistorialVentasWidget(QWidget):
 
             # Agrupar ventas por forma de pago
             formas_pago = defaultdict(float)
-            for v in ventas:
-                modo = getattr(v, 'modo_pago', 'Desconocido') or 'Desconocido'
-                total = getattr(v, 'total', 0) or 0
-                formas_pago[modo] += total
+            for f in filas:
+                formas_pago[f.modo_pago or 'Desconocido'] += f.total or 0
 
             logger.debug("Formas de pago encontradas: %s", dict(formas_pago))
 
@@ -673,8 +683,8 @@ class HistorialVentasWidget(QWidget):
         except Exception as e:
             logger.error("Error generando gráfico de torta: %s", e, exc_info=True)
 
-    def _generar_comparativa_sucursales(self, dt_min, dt_max, forma_txt):
-        """Genera gráficos comparativos entre sucursales"""
+    def _generar_comparativa_sucursales(self, filas):
+        """Genera gráficos comparativos entre sucursales (filas ya filtradas)"""
         try:
             from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
             from matplotlib.figure import Figure
@@ -689,12 +699,9 @@ class HistorialVentasWidget(QWidget):
             sucursales_data = {}
             _suc_rep = sorted((_load_cfg_suc().get("business") or {}).get("sucursales") or {})
             for sucursal in _suc_rep:
-                ventas = self._obtener_ventas_rango(dt_min, dt_max, sucursal=sucursal)
-                if forma_txt in ("efectivo", "tarjeta"):
-                    ventas = [v for v in ventas if v.modo_pago.lower() == forma_txt]
-
-                total = sum(getattr(v, 'total', 0) or 0 for v in ventas)
-                cantidad = len(ventas)
+                propias = [f for f in filas if f.sucursal == sucursal]
+                total = sum(f.total or 0 for f in propias)
+                cantidad = sum(f.cantidad for f in propias)
                 promedio = total / cantidad if cantidad > 0 else 0
 
                 sucursales_data[sucursal] = {
@@ -778,28 +785,15 @@ class HistorialVentasWidget(QWidget):
         except Exception as e:
             logger.error("Error generando comparativa: %s", e)
 
-    def _calcular_top_productos(self, ventas):
-        """Calcula y muestra los top 10 productos más vendidos"""
-        from collections import defaultdict
-
-        productos_stats = defaultdict(lambda: {'cantidad': 0, 'total': 0.0})
-
-        for venta in ventas:
-            items = getattr(venta, 'items', []) or []
-            for item in items:
-                prod = getattr(item, 'producto', None)
-                if prod:
-                    nombre = getattr(prod, 'nombre', 'Sin nombre')
-                    cantidad = getattr(item, 'cantidad', 0) or 0
-                    precio = getattr(item, 'precio_unit', 0) or 0
-
-                    productos_stats[nombre]['cantidad'] += cantidad
-                    productos_stats[nombre]['total'] += cantidad * precio
-
-        # Ordenar por cantidad y tomar top 10
-        top_productos = sorted(productos_stats.items(),
-                              key=lambda x: x[1]['cantidad'],
-                              reverse=True)[:10]
+    def _calcular_top_productos(self, desde, hasta, sucursal=None, modo_pago=None, con_cae=None):
+        """Calcula y muestra los top 10 productos más vendidos (agregado en SQL, v6.8.0)"""
+        filas = self.repo.top_productos_por_rango(
+            desde, hasta, sucursal, modo_pago=modo_pago, con_cae=con_cae, n=11)
+        # Solo items con producto asociado (como antes)
+        top_productos = [
+            (f.nombre or 'Sin nombre', {'cantidad': f.cantidad or 0, 'total': f.total or 0.0})
+            for f in filas if f.producto_id is not None
+        ][:10]
 
         # Actualizar tabla con altura ajustada
         self.stats_top_productos.setRowCount(len(top_productos))
@@ -843,46 +837,30 @@ class HistorialVentasWidget(QWidget):
         cae_txt = self.cmb_cae.currentText().lower()
         pago_txt = self.cmb_pago.currentText().lower()
 
-        # Del repo si existe listar_por_rango; si no, fallback por fecha día a día
-        ventas = []
-        try:
-            if hasattr(self.repo, "listar_por_rango"):
-                ventas = self.repo.listar_por_rango(dt_min, dt_max, sucursal=suc)   # si tu repo soporta sucursal
-            else:
-                # fallback: día a día
-                cur = dt_min.date()
-                while cur < dt_max.date():
-                    try:
-                        ventas += self.repo.listar_por_fecha(cur, sucursal=suc)
-                    except Exception:
-                        ventas += self.repo.listar_por_fecha(cur)
-                    cur += timedelta(days=1)
-        except Exception:
-            ventas = []
-
-        # Filtro CAE (Sin CAE / Con CAE)
+        # v6.8.0: filtros en SQL + cursor keyset; solo se materializa la primera pagina
+        filtros = {}
         if cae_txt == "sin cae":
-            ventas = [v for v in ventas if not getattr(v, "afip_cae", None)]
+            filtros["con_cae"] = False
         elif cae_txt == "con cae":
-            ventas = [v for v in ventas if getattr(v, "afip_cae", None)]
-
-        # Subfiltro forma de pago (siempre evaluado, AND con CAE)
+            filtros["con_cae"] = True
         if pago_txt in ("efectivo", "tarjeta"):
-            def _forma(v):
-                raw = (getattr(v, "forma_pago", "") or getattr(v, "modo_pago", "") or getattr(v, "modo", "") or "").lower()
-                return "tarjeta" if raw.startswith("tarj") else "efectivo"
-            ventas = [v for v in ventas if _forma(v) == pago_txt]
-
-        # Filtro por texto
+            filtros["forma"] = pago_txt
         q = (self.txt_buscar.text() or "").strip().lower()
         if q:
-            def _match(v):
-                if getattr(v, 'afip_cae', None) and getattr(v, 'numero_ticket_cae', None):
-                    nro = str(v.numero_ticket_cae)
-                else:
-                    nro = str(getattr(v, "numero_ticket", "") or getattr(v, "id", ""))
-                return q in nro.lower()
-            ventas = [v for v in ventas if _match(v)]
+            filtros["ticket_contiene"] = q
+
+        ventas = []
+        self._ventas_totales = None
+        self._cerrar_cursor()
+        try:
+            self._ventas_cursor = self.repo.cursor_por_rango(
+                dt_min, dt_max, sucursal=suc, page_size=self.PAGE_SIZE, **filtros)
+            ventas = self._ventas_cursor.siguiente()
+            self._ventas_totales = self._ventas_cursor.totales()
+        except Exception as e:
+            logger.warning("[HISTORIAL] Error listando ventas: %s", e)
+            self._cerrar_cursor()
+            ventas = []
 
         # Obtener pagos a proveedores del mismo rango
         pagos_prov = []
@@ -898,6 +876,38 @@ class HistorialVentasWidget(QWidget):
         self._pagos_cache = pagos_prov
         self._pintar_tabla()
 
+    def _cargar_mas(self):
+        """Agrega la siguiente pagina del cursor al listado."""
+        cur = self._ventas_cursor
+        if cur is None or not cur.hay_mas:
+            return
+        try:
+            self._ventas_cache = list(self._ventas_cache) + cur.siguiente()
+        except Exception as e:
+            logger.warning("[HISTORIAL] Error cargando mas ventas: %s", e)
+            return
+        self._pintar_tabla()
+
+    def _cerrar_cursor(self):
+        """Suelta el cursor actual (y su conexion al archivo historico, si tiene)."""
+        cur, self._ventas_cursor = self._ventas_cursor, None
+        if cur is not None:
+            try:
+                cur.cerrar()
+            except Exception:
+                pass
+
+    def _repo_listado(self):
+        """Repo del que salen las ventas listadas (el del cursor si lee del archivo)."""
+        cur = self._ventas_cursor
+        return cur.repo if cur is not None else self.repo
+
+    def _iter_paginas_filtradas(self):
+        """Todas las ventas del rango/filtros actuales (para exportar), en paginas."""
+        if self._ventas_cursor is not None:
+            return self._ventas_cursor.iterar_paginas()
+        return iter([list(self._ventas_cache)])
+
     def _pintar_tabla(self):
         # v6.6.0: 16 columnas (agregada Nº Comprobante en pos 14, ID corrido a 15)
         if self.tbl.columnCount() != 16:
@@ -916,6 +926,11 @@ class HistorialVentasWidget(QWidget):
         tot_tarjeta  = 0.0
         total_cae = 0.0  # Total con CAE (excluye NC)
 
+        try:
+            logs = self._repo_listado().ult_logs([getattr(v, "id", None) for v in self._ventas_cache])
+        except Exception:
+            logs = None
+
         for v in self._ventas_cache:
             row = self.tbl.rowCount()
             self.tbl.insertRow(row)
@@ -983,7 +998,7 @@ class HistorialVentasWidget(QWidget):
                     pass
 
             # Comentario
-            coment = self._obtener_comentario(v)
+            coment = self._obtener_comentario(v, logs)
 
             # Campos AFIP
             cae = getattr(v, "afip_cae", None) or ""
@@ -1115,15 +1130,26 @@ class HistorialVentasWidget(QWidget):
         # Resumen inferior
         pagos_txt = f" — Pagos: -${tot_pagos:.2f}" if tot_pagos > 0 else ""
         iva_ventas = total_cae * 21.0 / 121.0   # IVA embebido sobre Total CAE
+        # v6.8.0: con paginado, los totales son del rango completo (SQL), no solo lo cargado
+        cant_txt = f"{len(self._ventas_cache)} ventas"
+        tot_sql = self._ventas_totales
+        if tot_sql is not None:
+            total, tot_efectivo, tot_tarjeta = tot_sql['total'], tot_sql['efectivo'], tot_sql['tarjeta']
+            total_cae = tot_sql['total_cae']
+            iva_ventas = total_cae * 21.0 / 121.0
+            if tot_sql['cantidad'] > len(self._ventas_cache):
+                cant_txt = f"{tot_sql['cantidad']} ventas (mostrando {len(self._ventas_cache)})"
         self.lbl_resumen.setText(
-            f"{len(self._ventas_cache)} ventas — Efectivo ${tot_efectivo:.2f} — Tarjeta ${tot_tarjeta:.2f} — Total ${total:.2f}"
+            f"{cant_txt} — Efectivo ${tot_efectivo:.2f} — Tarjeta ${tot_tarjeta:.2f} — Total ${total:.2f}"
             f" — Total CAE ${total_cae:.2f} — IVA Ventas ${iva_ventas:.2f} — IVA Compras ${iva_compras:.2f}{pagos_txt}"
         )
+        cur = self._ventas_cursor
+        self.btn_cargar_mas.setVisible(bool(cur is not None and cur.hay_mas))
 
         # Ocultar ID (última columna, ahora 15 con la columna Nº Comprobante en v6.6.0)
         self.tbl.setColumnHidden(15, True)
 
-    def _obtener_comentario(self, v) -> str:
+    def _obtener_comentario(self, v, logs: Optional[dict] = None) -> str:
         # 1) Atributos directos de la venta
         for k in ("comentario", "motivo", "nota"):
             val = getattr(v, k, None)
@@ -1134,6 +1160,9 @@ class HistorialVentasWidget(QWidget):
         vid = getattr(v, "id", None)
         if not vid:
             return ""
+        # v6.8.0: ultimo log precargado en bloque (VentaRepo.ult_logs)
+        if logs is not None:
+            return str(logs.get(vid) or "")
         for fn in ("obtener_ultimo_log", "ult_log"):
             try:
                 if hasattr(self.repo, fn):
@@ -1359,9 +1388,19 @@ class HistorialVentasWidget(QWidget):
             QMessageBox.warning(self, "AFIP", f"Error al reintentar:\n{e}")
 
     # ------------------- Exportar / enviar -------------------
+    def _iter_ventas_con_logs(self):
+        """(venta, logs_de_la_pagina): el ultimo log se trae en bloque por pagina."""
+        for pagina in self._iter_paginas_filtradas():
+            try:
+                logs = self._repo_listado().ult_logs([getattr(v, "id", None) for v in pagina])
+            except Exception:
+                logs = None
+            for v in pagina:
+                yield v, logs
+
     def _armar_dataframe(self) -> pd.DataFrame:
         rows = []
-        for v in self._ventas_cache:
+        for v, logs in self._iter_ventas_con_logs():
             forma_raw = (getattr(v, "forma_pago", "") or getattr(v, "modo_pago", "") or getattr(v, "modo", "") or "").lower()
             forma = "Tarjeta" if forma_raw.startswith("tarj") else "Efectivo"
             rows.append({
@@ -1373,7 +1412,7 @@ class HistorialVentasWidget(QWidget):
                 "total":    float(getattr(v, "total", 0.0) or 0.0),
                 "pagado":   float(getattr(v, "pagado", 0.0) or 0.0),
                 "vuelto":   float(getattr(v, "vuelto", 0.0) or 0.0),
-                "comentarios": self._obtener_comentario(v),
+                "comentarios": self._obtener_comentario(v, logs),
                 "interes":   float(_get_any(v, ["interes_monto", "interes", "monto_interes"], 0.0) or 0.0),
                 "descuento": float(_get_any(v, ["descuento_monto", "descuento", "monto_descuento"], 0.0) or 0.0),
                 "cae": getattr(v, "afip_cae", "") or "",
@@ -1413,77 +1452,10 @@ class HistorialVentasWidget(QWidget):
 
     # historialventas.py
     def _armar_dataframe_items(self) -> pd.DataFrame:
-        items_rows = []
-        for v in self._ventas_cache:
-            vid = getattr(v, "id", None)
-            if not vid:
-                continue
-
-            # 1) Intento por el repo
-            try:
-                items = self.repo.listar_items(vid)
-            except Exception:
-                items = []
-
-            # 2) Fallback directo a la DB si el repo no trae nada
-            if not items:
-                try:
-                    from app.models import VentaItem
-                    items = self.session.query(VentaItem).filter_by(venta_id=vid).all()
-                except Exception:
-                    items = []
-
-            # 3) Normalización por ítem
-            for it in items:
-                prod = getattr(it, "producto", None)
-
-                # Categoría (si existe)
-                cat = getattr(prod, "categoria", "") if prod else ""
-
-                # Código (varios alias) + fallback a producto
-                codigo = (
-                    getattr(it, "codigo", None)
-                    or getattr(it, "codigo_barra", None)
-                    or getattr(it, "producto_codigo", None)
-                )
-                if not codigo and prod:
-                    codigo = getattr(prod, "codigo_barra", "") or getattr(prod, "codigo", "")
-
-                # Nombre (varios alias) + fallback a producto
-                nombre = getattr(it, "nombre", None)
-                if not nombre and prod:
-                    nombre = getattr(prod, "nombre", "") or getattr(prod, "descripcion", "")
-
-                # Cantidad
-                try:
-                    cant = float(getattr(it, "cantidad", 1) or 1)
-                except Exception:
-                    cant = 1.0
-
-                # Precio unitario (varios alias)
-                try:
-                    pu = float(
-                        getattr(it, "precio_unitario",
-                            getattr(it, "precio_unit",
-                                getattr(it, "precio", 0.0)
-                            )
-                        ) or 0.0
-                    )
-                except Exception:
-                    pu = 0.0
-
-                items_rows.append({
-                    "venta_id": vid,
-                    "ticket": getattr(v, "numero_ticket", None) or vid,
-                    "codigo": codigo or "",
-                    "nombre": nombre or "",
-                    "categoria": cat,
-                    "cantidad": cant,
-                    "precio_unitario": pu,
-                    "total_linea": cant * pu
-                })
-
-        return pd.DataFrame(items_rows)
+        # v6.8.0: items y productos precargados por pagina (sin consulta por venta/item)
+        if self._ventas_cursor is not None:
+            return self._ventas_cursor.dataframe_items()
+        return pd.DataFrame()
 
 
     def _exportar_a_xlsx_local(self):
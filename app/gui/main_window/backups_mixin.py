@@ -391,6 +391,7 @@ class BackupsMixin:
         """
         Realiza backup ZIP (nivel configurable) de:
         - Base SQLite (copia segura mediante API backup)
+        - Archivos historicos ventas_YYYY.db, en archivo/ (v6.8.0)
         - app_config.json
         Archiva como: <dest>/<tag>-YYYYmmdd-HHMMSS.zip
 
@@ -487,6 +488,7 @@ class BackupsMixin:
 
         # Copia segura de SQLite a un archivo temporal .sqlite
         tmp_copy = db_path + ".backup_tmp.sqlite"
+        tmp_archivos = []
         try:
             # Preferir backup por API nativa (segura con BD en uso)
             try:
@@ -510,6 +512,22 @@ class BackupsMixin:
             ) as zf:
                 # DB
                 zf.write(tmp_copy, arcname=os.path.basename(db_path))
+                # v6.8.0: archivo historico de ventas (sin esto el backup pierde esos años)
+                from app import sales_archive
+                for archivo in sales_archive.archivos_en(os.path.dirname(db_path)):
+                    tmp_arch = str(archivo) + ".backup_tmp.sqlite"
+                    tmp_archivos.append(tmp_arch)
+                    try:
+                        src = sqlite3.connect(f"file:{archivo}?mode=ro", uri=True)
+                        dst = sqlite3.connect(tmp_arch)
+                        try:
+                            src.backup(dst)
+                        finally:
+                            dst.close()
+                            src.close()
+                        zf.write(tmp_arch, arcname=f"{sales_archive.ARCHIVO_ZIP_DIR}/{archivo.name}")
+                    except Exception as e_arch:
+                        logger.error("[BACKUP] No se pudo incluir el archivo %s: %r", archivo.name, e_arch)
                 # Config JSON (si existe)
                 if CONFIG_PATH and os.path.exists(CONFIG_PATH):
                     zf.write(CONFIG_PATH, arcname="app_config.json")
@@ -521,12 +539,13 @@ class BackupsMixin:
             except Exception as e_verify:
                 logger.warning(f"[BACKUP] Verificacion de integridad fallo: {e_verify!r}")
         finally:
-            # limpiar temporal
-            try:
-                if os.path.exists(tmp_copy):
-                    os.remove(tmp_copy)
-            except Exception:
-                pass
+            # limpiar temporales
+            for tmp in [tmp_copy] + tmp_archivos:
+                try:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                except Exception:
+                    pass
 
         # --------- limpieza (retención) ----------
         try:
@@ -645,8 +664,11 @@ class BackupsMixin:
                     member_db = n
                     break
             if not member_db:
+                from app import sales_archive
                 for n in names:
                     low = n.lower()
+                    if sales_archive.es_archivo(n):
+                        continue  # ventas_YYYY.db: archivo historico, no la BD principal
                     if low.endswith(".db") or low.endswith(".sqlite"):
                         member_db = n
                         break
@@ -704,6 +726,34 @@ class BackupsMixin:
             except Exception: pass
             return
 
+        # 9b) v6.8.0: archivos historicos de ventas del backup. Si la BD restaurada
+        # es de antes de un archivado, las ventas que quedaron en los dos lados se
+        # sacan del archivo (si no, las vistas del Historial las muestran dos veces)
+        try:
+            from app import sales_archive
+            carpeta_bd = os.path.dirname(db_path)
+            for n in zf.namelist():
+                if n.startswith(sales_archive.ARCHIVO_ZIP_DIR + "/") and sales_archive.es_archivo(n):
+                    shutil.copy2(zf.extract(n, path=tmpdir), os.path.join(carpeta_bd, os.path.basename(n)))
+            sales_archive.quitar_superpuestas(db_path)
+        except Exception as e:
+            QMessageBox.warning(self, "Restaurar",
+                                f"No se pudo restaurar el archivo histórico de ventas:\n{e}")
+
+        # 9c) v6.8.0: los cursores del pull estan en sync_state.db, que no viaja en el
+        # backup. Con la BD vieja hay que volver a bajar lo que llego despues del
+        # backup: cursores a cero (reaplicar es seguro, las ventas se deduplican
+        # por clave natural y el resto son upserts). Las marcas del push incremental
+        # tambien: apuntan a filas de la BD reemplazada, y con ellas el proximo
+        # push_all_existing se saltaria lo restaurado con last_modified anterior
+        try:
+            from app.sync_state import SyncState
+            estado = SyncState.get_instance()
+            estado.reiniciar_pull(fallos=False)
+            estado.borrar_marcas_push()
+        except Exception as e:
+            logger.warning("[RESTORE] No se pudieron reiniciar los cursores de sync: %r", e)
+
         # 10) Restaurar config si procede
         if restore_cfg and CONFIG_PATH:
             try:
@@ -879,11 +929,12 @@ class BackupsMixin:
                     raise RuntimeError(f"ZIP corrupto: {bad}")
 
                 # 2. Extraer la DB
-                db_member = None
+                db_member = db_name if db_name in zf.namelist() else None
                 for name in zf.namelist():
-                    if name.endswith('.db') or name.endswith('.sqlite') or name == db_name:
-                        db_member = name
+                    if db_member:
                         break
+                    if '/' not in name and (name.endswith('.db') or name.endswith('.sqlite')):
+                        db_member = name
 
                 if not db_member:
                     logger.warning("[BACKUP] No se encontro DB en el ZIP para verificar")
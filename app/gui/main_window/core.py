@@ -62,6 +62,7 @@ from app.config import (
 )
 from app.models import Producto, Proveedor, Venta, VentaItem
 from app.repository import prod_repo, VentaRepo, UsuarioRepo, PagoProveedorRepo
+from app.catalog_index import ProductCatalogIndex
 from app.gui.qt_helpers import freeze_table
 from pathlib import Path
 from PyQt5.QtMultimedia import QSoundEffect
@@ -91,6 +92,7 @@ from app.firebase_sync import FirebaseSyncManager
 # ║   self.username             core.__init__ (param)    audit logs, ventas                    "" si vacío            ║
 # ║   self.es_admin             core.__init__ (param)    config, audit, eliminaciones masivas  bool (default False)   ║
 # ║   self.prod_repo            core.__init__            productos, stats, ventas              prod_repo(session)     ║
+# ║   self.catalogo             core.__init__            ventas, core (lookups por codigo)     ProductCatalogIndex    ║
 # ║   self.venta_repo           core.__init__            ventas_finalizacion, stats, historial VentaRepo(session)     ║
 # ║   self.pago_prov_repo       core.__init__            historial, reportes (IVA compras)     PagoProveedorRepo      ║
 # ║   self.comprador_service    core.__init__            ventas_finalizacion, compradores      CompradorService       ║
@@ -202,6 +204,13 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
         self.proveedores = ProveedorService(self.session)  # NUEVO
         self.compradores_svc = CompradorService(self.session)
         self.prod_repo = prod_repo(self.session, Producto)
+        # v6.8.0: indice en memoria del catalogo (scan -> cesta sin query a SQLite).
+        # Se actualiza solo via eventos de Session (ABM, importacion, sync).
+        self.catalogo = ProductCatalogIndex.get_instance()
+        try:
+            self.catalogo.cargar(self.prod_repo)
+        except Exception as _cat_err:
+            logger.warning("[CATALOGO] no se pudo cargar el indice: %s", _cat_err)
         
         self.venta_repo = VentaRepo(self.session)
         self.pago_prov_repo = PagoProveedorRepo(self.session)
@@ -302,6 +311,8 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
         self._sync_start_time = None      # timestamp de inicio de la sync actual
         self._sync_timer = QTimer(self)
         self._sync_timer.timeout.connect(lambda: self._ejecutar_sincronizacion(manual=False))
+        self._sync_listener = None        # v6.8.0: CambiosListener del modo stream
+        self._stream_pendientes = set()   # v6.8.0: tipos avisados por el stream sin bajar aun
         self._last_sync_time = None
         self._sync_log_entries = []
         # Iniciar sync despues de que la UI cargue (no en __init__ para evitar problemas)
@@ -447,6 +458,25 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
         try:
             if hasattr(self, '_sync_timer') and self._sync_timer is not None:
                 self._sync_timer.stop()
+            self._detener_stream()
+        except Exception:
+            pass
+
+        # v6.8.0: terminar el hilo escritor y cerrar los pools de fondo
+        try:
+            from app.session_manager import SessionManager
+            SessionManager.get_instance().cerrar()
+        except Exception:
+            pass
+        try:
+            from app.firebase_transport import FirebaseTransport
+            FirebaseTransport.get_instance().cerrar()
+        except Exception:
+            pass
+        try:
+            from app import sync_state
+            if sync_state._instance is not None:
+                sync_state._instance.cerrar()
         except Exception:
             pass
 
@@ -1195,10 +1225,9 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
         # Pedir código de barras, traer y permitir editar (código, nombre, precio)
         try:
             from PyQt5.QtWidgets import QInputDialog, QMessageBox
-            from app.models import Producto
             cb, ok = QInputDialog.getText(self, "Editar producto", "Código de barras:")
             if not ok or not cb: return
-            prod = self.session.query(Producto).filter_by(codigo_barra=str(cb).strip()).first()
+            prod = self.prod_repo.buscar_por_codigo_indexado(str(cb).strip())
             if not prod:
                 QMessageBox.information(self, "Editar", "Producto no encontrado.")
                 return
@@ -1239,10 +1268,9 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
         # Popup: ingresar código -> imprime código+nombre+precio
         try:
             from PyQt5.QtWidgets import QInputDialog, QMessageBox
-            from app.models import Producto
             cb, ok = QInputDialog.getText(self, "Imprimir código", "Código de barras:")
             if not ok or not cb: return
-            prod = self.session.query(Producto).filter_by(codigo_barra=str(cb).strip()).first()
+            prod = self.prod_repo.buscar_por_codigo_indexado(str(cb).strip())
             if not prod:
                 QMessageBox.information(self, "Imprimir", "Producto no encontrado.")
                 return
@@ -1416,9 +1444,10 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
 
             # Autocomplete usando los mismos datos del completer de ventas
             try:
-                from app.repository import prod_repo
-                repo = prod_repo(self.session)
-                pares = repo.listar_codigos_nombres()
+                if self.catalogo.cargado:
+                    pares = self.catalogo.pares_codigo_nombre()
+                else:
+                    pares = self.prod_repo.listar_codigos_nombres()
                 items_list = [f"{(c or '').strip()} - {(n or '').strip()}" for (c, n) in pares]
                 completer = QCompleter(items_list, dlg)
                 completer.setCaseSensitivity(Qt.CaseInsensitive)
@@ -1462,18 +1491,30 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
                     return
 
                 from app.models import Producto
+                # v6.8.0: resolver contra el indice en memoria (solo lectura, sin SQL)
+                cat = self.catalogo if self.catalogo.cargado else None
                 # Buscar por código de barras exacto primero
-                prod = self.session.query(Producto).filter_by(codigo_barra=text).first()
+                if cat is not None:
+                    prod = cat.por_codigo(text)
+                else:
+                    prod = self.session.query(Producto).filter_by(codigo_barra=text).first()
                 if not prod:
                     # Si el texto es "CODIGO - NOMBRE" (del completer), extraer el código
                     if " - " in text:
                         code_part = text.split(" - ")[0].strip()
-                        prod = self.session.query(Producto).filter_by(codigo_barra=code_part).first()
+                        if cat is not None:
+                            prod = cat.por_codigo(code_part)
+                        else:
+                            prod = self.session.query(Producto).filter_by(codigo_barra=code_part).first()
                 if not prod:
                     # Buscar por nombre parcial
-                    prod = self.session.query(Producto).filter(
-                        Producto.nombre.ilike(f"%{text}%")
-                    ).first()
+                    if cat is not None:
+                        _res = cat.buscar(text, limit=1)
+                        prod = _res[0] if _res else None
+                    else:
+                        prod = self.session.query(Producto).filter(
+                            Producto.nombre.ilike(f"%{text}%")
+                        ).first()
 
                 if prod:
                     lbl_nombre.setText(f"{prod.nombre or 'Sin nombre'}")
@@ -1559,7 +1600,7 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
                 return
             codigo, nombre, precio, categoria = datos
             # Upsert por código
-            prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+            prod = self.prod_repo.buscar_por_codigo_indexado(codigo)
             if prod:
                 # Snapshot antes de modificar para log por campo
                 viejos = {'nombre': prod.nombre, 'precio': prod.precio, 'categoria': prod.categoria}
@@ -1605,13 +1646,12 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
         try:
             from PyQt5.QtWidgets import QInputDialog, QMessageBox
             from app.gui.dialogs import QuickEditProductoDialog
-            from app.models import Producto
 
             cb, ok = QInputDialog.getText(self, "Editar producto", "Código de barras:")
             if not ok or not cb:
                 return
             codigo = str(cb).strip()
-            prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+            prod = self.prod_repo.buscar_por_codigo_indexado(codigo)
             if not prod:
                 QMessageBox.information(self, "Editar", "Producto no encontrado.")
                 return
@@ -1695,6 +1735,7 @@ class MainWindow(ProductosMixin, VentasMixin, VentasTicketMixin, VentasFinalizac
             # Parar timers mientras se muestra el login
             try:
                 self._sync_timer.stop()
+                self._detener_stream()
             except Exception:
                 pass
             try:
@@ -402,59 +402,9 @@ class ProductosMixin:
             show_error(self, "leer el archivo Excel", e, context="import_excel_read")
             return
 
-        # Clasificar filas: nuevos, modificados, sin cambios
-        nuevos = {}  # dict por codigo_barra para deduplicar
-        modificados = []
-        sin_cambios = 0
-        filas_omitidas = 0
-
-        for _, row in df.iterrows():
-            codigo = self._limpiar_valor_excel(row.get('codigo_barra', ''))
-            nombre = self._limpiar_valor_excel(row.get('nombre', ''))
-            try:
-                raw_precio = row.get('precio', 0)
-                import math
-                if isinstance(raw_precio, float) and math.isnan(raw_precio):
-                    raw_precio = 0
-                precio = float(raw_precio)
-            except Exception:
-                precio = 0.0
-            categoria = self._limpiar_valor_excel(row.get('categoria', '')) or None
-            if not codigo or not nombre or codigo == 'nan' or nombre == 'nan':
-                filas_omitidas += 1
-                continue
-
-            prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
-            if prod:
-                # Verificar si hay diferencias
-                hay_diff = (
-                    prod.nombre != nombre or
-                    abs((prod.precio or 0) - precio) > 0.001 or
-                    (prod.categoria or '') != (categoria or '')
-                )
-                if hay_diff:
-                    modificados.append({
-                        'codigo_barra': codigo,
-                        'nombre_actual': prod.nombre,
-                        'nombre_nuevo': nombre,
-                        'precio_actual': prod.precio or 0,
-                        'precio_nuevo': precio,
-                        'categoria_actual': prod.categoria,
-                        'categoria_nueva': categoria,
-                        'prod_obj': prod,
-                    })
-                else:
-                    sin_cambios += 1
-            else:
-                # Deduplicar por codigo: si ya hay uno, queda el ultimo
-                nuevos[codigo] = {
-                    'codigo_barra': codigo,
-                    'nombre': nombre,
-                    'precio': precio,
-                    'categoria': categoria,
-                }
-
-        nuevos_list = list(nuevos.values())
+        # Clasificar filas: nuevos, modificados, sin cambios (v6.8.0: merge vectorizado
+        # contra el catalogo en vez de un SELECT por fila)
+        nuevos_list, modificados, sin_cambios, filas_omitidas = self.prod_repo.diff_importacion(df)
 
         # Si no hay nada que importar
         if not nuevos_list and not modificados:
@@ -475,53 +425,39 @@ class ProductosMixin:
             return
 
         try:
-            cont_nuevos = 0
-            cont_actualizados = 0
-            sync_data = []  # guardar datos planos (no ORM) para sync en threads
-
-            # Insertar nuevos (siempre, en ambos modos)
-            for p in nuevos_list:
-                prod = Producto(
-                    codigo_barra=p['codigo_barra'], nombre=p['nombre'],
-                    precio=p['precio'], categoria=p['categoria']
-                )
-                self.session.add(prod)
-                cont_nuevos += 1
+            from app.catalog_index import CatalogEntry
+            filas = list(nuevos_list)
 
             # Actualizar modificados (solo si modo != 'solo_nuevos')
             if modo == 'todos' and mod_seleccionados:
                 for m in mod_seleccionados:
-                    prod = m['prod_obj']
-                    # Log antes de modificar
+                    # Log antes de modificar (snapshot con los valores actuales)
+                    prod = CatalogEntry(m['producto_id'], m['codigo_barra'], m['nombre_actual'],
+                                        m['precio_actual'], m['categoria_actual'])
                     for campo, actual, nuevo_val in [
-                        ('nombre', prod.nombre, m['nombre_nuevo']),
+                        ('nombre', m['nombre_actual'], m['nombre_nuevo']),
                         ('precio', prod.precio, m['precio_nuevo']),
-                        ('categoria', prod.categoria or '', m['categoria_nueva'] or ''),
+                        ('categoria', m['categoria_actual'] or '', m['categoria_nueva'] or ''),
                     ]:
                         if str(actual or '') != str(nuevo_val or ''):
                             self._log_product_change(prod, campo, actual, nuevo_val, 'Importar Excel - Actualizar')
-                    prod.nombre = m['nombre_nuevo']
-                    prod.precio = m['precio_nuevo']
-                    prod.categoria = m['categoria_nueva']
-                    cont_actualizados += 1
-
-            self.session.commit()
+                    filas.append({
+                        'codigo_barra': m['codigo_barra'], 'nombre': m['nombre_nuevo'],
+                        'precio': m['precio_nuevo'], 'categoria': m['categoria_nueva'],
+                    })
 
-            # Log de nuevos y recoger datos para sync (después del commit para tener IDs)
-            for p in nuevos_list:
-                prod = self.session.query(Producto).filter_by(codigo_barra=p['codigo_barra']).first()
-                if prod:
-                    self._log_product_change(
-                        prod, 'producto', '',
-                        f"{p['codigo_barra']} / {p['nombre']} / ${p['precio']}",
-                        'Importar Excel - Nuevo producto'
-                    )
-                    sync_data.append(prod)
+            # Un solo upsert por lotes; devuelve IDs/datos planos para log y sync
+            nuevos_rows, actualizados_rows = self.prod_repo.bulk_upsert(pd.DataFrame(filas))
+            cont_nuevos = len(nuevos_rows)
+            cont_actualizados = len(actualizados_rows)
 
-            # Sync de modificados
-            if modo == 'todos' and mod_seleccionados:
-                for m in mod_seleccionados:
-                    sync_data.append(m['prod_obj'])
+            for prod in nuevos_rows:
+                self._log_product_change(
+                    prod, 'producto', '',
+                    f"{prod.codigo_barra} / {prod.nombre} / ${prod.precio}",
+                    'Importar Excel - Nuevo producto'
+                )
+            sync_data = list(nuevos_rows) + list(actualizados_rows)
 
             # Sync batch: 1 solo PATCH en vez de N requests seriados (mucho más rápido)
             if sync_data:
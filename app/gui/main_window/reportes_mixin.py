@@ -423,12 +423,12 @@ class ReportesMixin:
             _desde = _dt_cls.combine(_d, _dt_cls.min.time())
             _hasta = _dt_cls.combine(_d, _dt_cls.max.time())
 
-            _ventas_rep = self.venta_repo.listar_por_rango(_desde, _hasta, None)
-            _total_ventas = sum(v.total for v in _ventas_rep)
-            _cant = len(_ventas_rep)
+            # v6.8.0: totales desde el resumen diario (sin materializar las ventas)
+            _filas = self.venta_repo.resumen_diario(_d, _d, None)
+            _total_ventas = sum(f.total for f in _filas)
+            _cant = sum(f.cantidad for f in _filas)
 
-            _iva_v_cae = [v for v in _ventas_rep if getattr(v, 'afip_cae', None)]
-            _total_cae = sum(v.total for v in _iva_v_cae)
+            _total_cae = sum(f.total for f in _filas if f.con_cae)
             _iva_ventas = round(_total_cae - _total_cae / 1.21, 2)
 
             _iva_compras = 0.0
@@ -325,21 +325,22 @@ class StatsMixin:
         filtros_texto += f"  |  Forma de pago: {forma_nombre}"
         self.stats_filtros_banner.setText(filtros_texto)
 
-        # Obtener ventas del repositorio
+        # Resumen diario (v6.8.0): filas por (sucursal, dia, modo_pago, con_cae)
+        # en vez de materializar cada Venta del rango.
         desde_dt = datetime.combine(desde_date, datetime.min.time())
         hasta_dt = datetime.combine(hasta_date, datetime.max.time())
 
-        ventas = self.venta_repo.listar_por_rango(desde_dt, hasta_dt, sucursal)
+        filas = self.venta_repo.resumen_diario(desde_date, hasta_date, sucursal)
 
         # Filtrar por forma de pago si es necesario
         if forma:
-            ventas = [v for v in ventas if v.modo_pago.lower().startswith(forma[:3])]
+            filas = [f for f in filas if f.modo_pago.lower().startswith(forma[:3])]
 
         # Calcular KPIs
-        total_ventas = sum(v.total for v in ventas)
-        cant_ventas = len(ventas)
+        total_ventas = sum(f.total for f in filas)
+        cant_ventas = sum(f.cantidad for f in filas)
         promedio = total_ventas / cant_ventas if cant_ventas > 0 else 0
-        interes_total = sum(getattr(v, 'interes_monto', 0) or 0 for v in ventas)
+        interes_total = sum(f.interes or 0 for f in filas)
 
         # Actualizar labels de KPIs
         self.kpi_total_ventas.findChild(QLabel, "kpi_value").setText(f"${total_ventas:,.2f}")
@@ -357,8 +358,7 @@ class StatsMixin:
             logger.warning("[STATS] Error calculando IVA compras: %s", _iva_err)
 
         # IVA: ventas con CAE
-        ventas_cae = [v for v in ventas if getattr(v, 'afip_cae', None)]
-        total_cae = sum(v.total for v in ventas_cae)
+        total_cae = sum(f.total for f in filas if f.con_cae)
         iva_ventas = round(total_cae - total_cae / 1.21, 2)
 
         saldo_iva = round(iva_compras - iva_ventas, 2)
@@ -370,9 +370,8 @@ class StatsMixin:
 
         # Preparar datos para gráfico de ventas por día
         ventas_por_dia = defaultdict(float)
-        for v in ventas:
-            fecha = v.fecha.date() if hasattr(v.fecha, 'date') else v.fecha
-            ventas_por_dia[fecha] += v.total
+        for f in filas:
+            ventas_por_dia[f.fecha] += f.total
 
         # Generar gráfico
         self._generar_grafico_ventas(ventas_por_dia, desde_date, hasta_date)
@@ -380,12 +379,12 @@ class StatsMixin:
         # Si se eligió "Todas las sucursales", mostrar comparativa
         if sucursal is None and hasattr(self, 'direcciones') and len(self.direcciones) > 1:
             self.stats_comparativa_group.setVisible(True)
-            self._generar_comparativa_sucursales(desde_dt, hasta_dt, forma)
+            self._generar_comparativa_sucursales(filas)
         else:
             self.stats_comparativa_group.setVisible(False)
 
         # Calcular top productos
-        self._calcular_top_productos(ventas)
+        self._calcular_top_productos(desde_date, hasta_date, sucursal, forma)
 
     def _generar_grafico_ventas(self, ventas_por_dia, desde, hasta):
         """Genera el gráfico de ventas por día usando matplotlib"""
@@ -449,51 +448,22 @@ class StatsMixin:
             error_label.setStyleSheet("color: red; padding: 20px;")
             self.stats_chart_layout.addWidget(error_label)
 
-    def _calcular_top_productos(self, ventas):
-        """Calcula y muestra los productos más vendidos (optimizado: 1 query en vez de N)"""
-        from collections import defaultdict
+    def _calcular_top_productos(self, desde, hasta, sucursal=None, forma=None):
+        """Calcula y muestra los productos más vendidos (agregado en SQL, v6.8.0)"""
         from PyQt5.QtWidgets import QTableWidgetItem
-        from sqlalchemy.orm import joinedload
-        from app.models import VentaItem, Producto
-
-        # Acumular por producto
-        productos_stats = defaultdict(lambda: {'cantidad': 0, 'total': 0, 'nombre': '', 'codigo': ''})
-
-        if not ventas:
-            self.table_top_productos.setRowCount(0)
-            return
-
-        # Una sola query para TODOS los items de todas las ventas
-        venta_ids = [v.id for v in ventas]
-        all_items = (
-            self.session.query(VentaItem)
-            .filter(VentaItem.venta_id.in_(venta_ids))
-            .options(joinedload(VentaItem.producto))
-            .all()
-        )
-
-        for item in all_items:
-            if hasattr(item, 'producto') and item.producto:
-                prod_id = item.producto.id
-                nombre = item.producto.nombre
-                codigo = item.producto.codigo_barra
-            else:
-                prod_id = f"item_{item.id}"
-                nombre = getattr(item, 'nombre', 'Producto desconocido')
-                codigo = getattr(item, 'codigo', 'N/A')
 
-            cantidad = getattr(item, 'cantidad', 1)
-            precio = getattr(item, 'precio_unit', 0)
+        filas = self.venta_repo.top_productos_por_rango(
+            desde, hasta, sucursal, modo_pago=forma[:3] if forma else None, n=10)
 
-            productos_stats[prod_id]['cantidad'] += cantidad
-            productos_stats[prod_id]['total'] += cantidad * precio
-            productos_stats[prod_id]['nombre'] = nombre
-            productos_stats[prod_id]['codigo'] = codigo
-
-        # Ordenar por cantidad vendida
-        top_productos = sorted(productos_stats.items(),
-                              key=lambda x: x[1]['cantidad'],
-                              reverse=True)[:10]
+        top_productos = [
+            (f.producto_id, {
+                'cantidad': f.cantidad or 0,
+                'total': f.total or 0,
+                'nombre': f.nombre or 'Producto desconocido',
+                'codigo': f.codigo_barra or 'N/A',
+            })
+            for f in filas
+        ]
 
         # Actualizar tabla
         self.table_top_productos.setRowCount(0)
@@ -504,30 +474,24 @@ class StatsMixin:
             self.table_top_productos.setItem(i, 2, QTableWidgetItem(str(int(stats['cantidad']))))
             self.table_top_productos.setItem(i, 3, QTableWidgetItem(f"${stats['total']:,.2f}"))
 
-    def _generar_comparativa_sucursales(self, desde_dt, hasta_dt, forma):
-        """Genera un gráfico comparativo entre sucursales"""
+    def _generar_comparativa_sucursales(self, filas):
+        """Genera un gráfico comparativo entre sucursales (desde filas de resumen_diario)"""
         try:
             import matplotlib
             matplotlib.use('Qt5Agg')
             from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
             from matplotlib.figure import Figure
-            from collections import defaultdict
 
             # Limpiar canvas anterior
             for i in reversed(range(self.stats_comparativa_layout.count())):
                 self.stats_comparativa_layout.itemAt(i).widget().setParent(None)
 
-            # Obtener ventas de cada sucursal
+            # Acumular por sucursal (las filas ya vienen filtradas por forma de pago)
             sucursales_data = {}
             for sucursal_nombre in self.direcciones.keys():
-                ventas = self.venta_repo.listar_por_rango(desde_dt, hasta_dt, sucursal_nombre)
-
-                # Filtrar por forma de pago si es necesario
-                if forma:
-                    ventas = [v for v in ventas if v.modo_pago.lower().startswith(forma[:3])]
-
-                total = sum(v.total for v in ventas)
-                cantidad = len(ventas)
+                propias = [f for f in filas if f.sucursal == sucursal_nombre]
+                total = sum(f.total for f in propias)
+                cantidad = sum(f.cantidad for f in propias)
                 sucursales_data[sucursal_nombre] = {
                     'total': total,
                     'cantidad': cantidad,
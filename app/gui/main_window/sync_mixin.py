@@ -141,6 +141,7 @@ class SyncNotificationsMixin:
         interval_min = sync_cfg.get("interval_minutes", 5)
 
         self._sync_timer.stop()
+        self._detener_stream()
 
         if not enabled:
             self._firebase_sync = None
@@ -158,6 +159,11 @@ class SyncNotificationsMixin:
             self._sync_timer.setInterval(ms)
             self._sync_timer.start()
             logger.info(f"[SYNC] Timer iniciado: cada {ms}ms ({max(interval_min, 2)} min)")
+        elif mode == "stream":
+            # v6.8.0: hasta que el stream conecte (o si se corta) se sigue con el intervalo
+            self._sync_timer.setInterval(max(interval_min * 60 * 1000, 120_000))
+            self._sync_timer.start()
+            self._iniciar_stream(sucursal_actual)
 
         # Solo disparar singleShot la PRIMERA vez (no al reconfigurar)
         # Esto evita syncs duplicadas cuando se guarda la configuración
@@ -165,13 +171,61 @@ class SyncNotificationsMixin:
             self._sync_initial_fired = True
             QTimer.singleShot(3000, lambda: self._ejecutar_sincronizacion(manual=False))
 
+    # ─── Modo stream (v6.8.0, ver app/firebase_stream.py) ───────────
+
+    def _iniciar_stream(self, sucursal):
+        from app.firebase_stream import CambiosListener
+        # Los callbacks llegan desde los hilos del listener: pasar al hilo de Qt
+        self._sync_listener = CambiosListener(
+            sucursal,
+            on_cambios=lambda tipos: QTimer.singleShot(0, lambda t=tipos: self._on_stream_cambios(t)),
+            on_estado=lambda estado: QTimer.singleShot(0, lambda e=estado: self._on_stream_estado(e)),
+        ).iniciar()
+        logger.info("[SYNC] Stream de cambios iniciado")
+
+    def _detener_stream(self):
+        listener = getattr(self, '_sync_listener', None)
+        self._sync_listener = None
+        if listener is not None:
+            listener.detener()
+
+    def _on_stream_estado(self, estado):
+        """Con el stream conectado el timer queda solo como respaldo; si no, vuelve al intervalo."""
+        from app.firebase_stream import ESTADO_CONECTADO, STREAM_RESPALDO_MINUTOS
+        if getattr(self, '_sync_listener', None) is None:
+            return
+        interval_min = load_config().get("sync", {}).get("interval_minutes", 5)
+        minutos = max(interval_min, 2)
+        if estado == ESTADO_CONECTADO:
+            minutos = max(minutos, STREAM_RESPALDO_MINUTOS)
+        self._sync_timer.setInterval(minutos * 60 * 1000)
+        self._sync_timer.start()
+        logger.info(f"[SYNC] Stream {estado}: sync completa cada {minutos} min")
+
+    def _on_stream_cambios(self, tipos):
+        """Cambios remotos avisados por el stream: pull solo de esos tipos."""
+        if getattr(self, '_sync_listener', None) is None:
+            return
+        self._stream_pendientes |= set(tipos)
+        self._ejecutar_sincronizacion(manual=False, tipos=self._stream_pendientes)
+
+    def _relanzar_stream_pendiente(self):
+        """Si el stream aviso mientras corria otra sync, bajar ahora esos tipos."""
+        if getattr(self, '_stream_pendientes', None) and getattr(self, '_sync_listener', None):
+            QTimer.singleShot(0, lambda: self._ejecutar_sincronizacion(
+                manual=False, tipos=self._stream_pendientes))
+
     def _reiniciar_sync_scheduler(self):
         """Reinicia el scheduler cuando se guarda la configuracion (sin sync inmediata)."""
         self._setup_sync_scheduler()
         self._actualizar_texto_boton_sync()
 
-    def _ejecutar_sincronizacion(self, manual=False):
-        """Ejecuta un ciclo de sincronizacion via Firebase (en hilo background)."""
+    def _ejecutar_sincronizacion(self, manual=False, tipos=None):
+        """Ejecuta un ciclo de sincronizacion via Firebase (en hilo background).
+
+        v6.8.0: `tipos` = pull solo de esos tipos (avisos del modo stream). Si ya
+        hay una sync corriendo, quedan en _stream_pendientes y se bajan al terminar.
+        """
         cfg = load_config()
         sync_cfg = cfg.get("sync", {})
         enabled = sync_cfg.get("enabled", False)
@@ -199,6 +253,9 @@ class SyncNotificationsMixin:
 
         self._sync_running = True
         self._sync_start_time = datetime.now()
+        # v6.8.0: esta sync cubre los avisos del stream acumulados hasta ahora
+        tipos = None if tipos is None else sorted(set(tipos) | self._stream_pendientes)
+        self._stream_pendientes = set()
 
         # Liberar cualquier lock pendiente de la sesión principal ANTES de lanzar
         # el thread de sync. Esto evita "database is locked" por contención.
@@ -221,27 +278,22 @@ class SyncNotificationsMixin:
 
         import threading
 
+        sucursal = getattr(self, 'sucursal', 'Sarmiento')
+
+        def _sync_job(thread_session):
+            sync_manager = FirebaseSyncManager(thread_session, sucursal)
+            r = sync_manager.ejecutar_sincronizacion_completa(tipos=tipos)
+            r["_mismatches"] = sync_manager.get_price_mismatches()
+            return r
+
         def _sync_worker():
             resultado = None
             err_msg = None
             try:
-                from app.database import SessionLocal
-                from sqlalchemy import text as _sa_text
-                thread_session = SessionLocal()
-                # Timeout largo para el thread de sync (30s) — da tiempo a que
-                # la sesión principal libere cualquier lock de escritura
-                try:
-                    thread_session.execute(_sa_text("PRAGMA busy_timeout=30000"))
-                except Exception:
-                    pass
-                try:
-                    sucursal = getattr(self, 'sucursal', 'Sarmiento')
-                    sync_manager = FirebaseSyncManager(thread_session, sucursal)
-                    resultado = sync_manager.ejecutar_sincronizacion_completa()
-                    mismatches = sync_manager.get_price_mismatches()
-                    resultado["_mismatches"] = mismatches
-                finally:
-                    thread_session.close()
+                # v6.8.0: la sync corre en el hilo escritor de SessionManager
+                # (conexion propia, busy_timeout 30s), nunca con la sesion de la GUI
+                from app.session_manager import SessionManager
+                resultado = SessionManager.get_instance().escribir(_sync_job)
             except Exception as e:
                 err_msg = str(e)
                 logger.error(f"[SYNC] Worker exception: {err_msg}")
@@ -412,6 +464,7 @@ class SyncNotificationsMixin:
 
         except Exception as e:
             logger.error(f"[SYNC] Error procesando resultado: {e}")
+        self._relanzar_stream_pendiente()
 
     def _on_sync_error(self, error_msg):
         """Callback en el hilo principal cuando la sync falla."""
@@ -424,6 +477,7 @@ class SyncNotificationsMixin:
         logger.error(f"[SYNC] Error: {error_msg}")
         self._actualizar_indicador_sync(error=error_msg)
         self._update_sync_button_text("⚠ Sync error - Reintentar")
+        self._relanzar_stream_pendiente()
 
     def _actualizar_indicador_sync(self, enviados=0, recibidos=0, errores=None, error=None):
         """Actualiza el indicador de sincronizacion en la barra de estado"""
@@ -653,33 +707,56 @@ class SyncNotificationsMixin:
                 time_str = f"{secs}s"
             self._update_sync_button_text(f"⟳ Sincronizando... {time_str}")
 
+    # Tipos de _sync_push cuya entidad es un objeto ORM que se relee en el hilo
+    _SYNC_PUSH_RECARGA = ("venta", "venta_mod", "producto", "proveedor", "pago_proveedor", "comprador")
+
     def _sync_push(self, tipo, entity, accion="upsert"):
-        """Helper para publicar un cambio en Firebase (no-bloqueante)."""
+        """Helper para publicar un cambio en Firebase (no-bloqueante).
+
+        v6.8.0: el hilo no toca la sesion de la GUI. Las entidades ORM se
+        releen por id en una sesion de solo lectura de SessionManager.
+        """
         if not self._firebase_sync:
             return
         import threading
+        from sqlalchemy import inspect as _sa_inspect
+        recargar = tipo in self._SYNC_PUSH_RECARGA
+        if recargar:
+            try:
+                clase, pk = type(entity), _sa_inspect(entity).identity
+            except Exception as e:
+                self._firebase_sync._log(f"Push {tipo} omitido, entidad sin identidad: {e}")
+                return
+        sucursal = getattr(self, 'sucursal', 'Sarmiento')
         def _do():
             try:
-                if tipo == "venta":
-                    self._firebase_sync.push_venta(entity)
-                elif tipo == "venta_mod":
-                    self._firebase_sync.push_venta_modificada(entity)
-                elif tipo == "venta_del":
-                    self._firebase_sync.push_venta_eliminada(entity)
-                elif tipo == "producto":
-                    self._firebase_sync.push_producto(entity, accion)
-                elif tipo == "producto_del":
-                    self._firebase_sync.push_producto_eliminado(entity)
-                elif tipo == "proveedor":
-                    self._firebase_sync.push_proveedor(entity, accion)
-                elif tipo == "proveedor_del":
-                    self._firebase_sync.push_proveedor_eliminado(entity)
-                elif tipo == "pago_proveedor":
-                    self._firebase_sync.push_pago_proveedor(entity)
-                elif tipo == "comprador":
-                    self._firebase_sync.push_comprador(entity, accion)
-                elif tipo == "comprador_del":
-                    self._firebase_sync.push_comprador_eliminado(entity)
+                from app.session_manager import SessionManager
+                with SessionManager.get_instance().lectura() as s:
+                    obj = s.get(clase, pk) if recargar else entity
+                    if obj is None:
+                        self._firebase_sync._log(f"Push {tipo} omitido: la entidad ya no existe")
+                        return
+                    mgr = FirebaseSyncManager(s, sucursal)
+                    if tipo == "venta":
+                        mgr.push_venta(obj)
+                    elif tipo == "venta_mod":
+                        mgr.push_venta_modificada(obj)
+                    elif tipo == "venta_del":
+                        mgr.push_venta_eliminada(obj)
+                    elif tipo == "producto":
+                        mgr.push_producto(obj, accion)
+                    elif tipo == "producto_del":
+                        mgr.push_producto_eliminado(obj)
+                    elif tipo == "proveedor":
+                        mgr.push_proveedor(obj, accion)
+                    elif tipo == "proveedor_del":
+                        mgr.push_proveedor_eliminado(obj)
+                    elif tipo == "pago_proveedor":
+                        mgr.push_pago_proveedor(obj)
+                    elif tipo == "comprador":
+                        mgr.push_comprador(obj, accion)
+                    elif tipo == "comprador_del":
+                        mgr.push_comprador_eliminado(obj)
             except Exception as e:
                 self._firebase_sync._log(f"Push {tipo} error: {e}")
         threading.Thread(target=_do, daemon=True).start()
@@ -691,10 +768,21 @@ class SyncNotificationsMixin:
         if not self._firebase_sync or not lista:
             return
         import threading
+        # v6.8.0: solo ids cruzan al hilo; los productos se releen en una sesion de lectura
+        ids = [getattr(e, "id", None) for e in lista]
+        sucursal = getattr(self, 'sucursal', 'Sarmiento')
         def _do():
             try:
                 if tipo == "producto":
-                    self._firebase_sync.push_productos_batch(lista)
+                    from app.models import Producto
+                    from app.session_manager import SessionManager
+                    with SessionManager.get_instance().lectura() as s:
+                        productos = []
+                        validos = [i for i in ids if i is not None]
+                        for k in range(0, len(validos), 900):
+                            productos += (s.query(Producto)
+                                          .filter(Producto.id.in_(validos[k:k + 900])).all())
+                        FirebaseSyncManager(s, sucursal).push_productos_batch(productos)
                 else:
                     # Fallback: si no hay implementación batch, caer al seriado
                     for ent in lista:
@@ -848,10 +936,12 @@ class SyncNotificationsMixin:
 
                     # 4. Borrar cola de sync offline
                     try:
-                        from app.config import _get_app_data_dir
-                        queue_path = os.path.join(_get_app_data_dir(), "sync_queue.json")
-                        if os.path.exists(queue_path):
-                            os.remove(queue_path)
+                        from app import sync_state
+                        if sync_state._instance is not None:
+                            sync_state._instance.cerrar()
+                        for queue_path in sync_state.archivos():
+                            if os.path.exists(queue_path):
+                                os.remove(queue_path)
                     except Exception:
                         pass
 
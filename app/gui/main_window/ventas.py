@@ -313,7 +313,7 @@ class VentasMixin:
             text = self.input_venta_buscar.text().strip()
             if not text or len(text) < 3:
                 return
-            prod = self.prod_repo.buscar_por_codigo(text)
+            prod = self._producto_por_codigo(text)
             if prod:
                 self.agregar_a_cesta()
                 return
@@ -355,11 +355,11 @@ class VentasMixin:
 
                 # 1) Buscar por código explícito (si se separó)
                 if code:
-                    prod = self.prod_repo.buscar_por_codigo(code)
+                    prod = self._producto_por_codigo(code)
 
                 # 2) Si no encontró, intentar código si term es numérico "largo"
                 if not prod and term.isdigit():
-                    prod = self.prod_repo.buscar_por_codigo(term)
+                    prod = self._producto_por_codigo(term)
 
                 # 3) Si aún no, buscar por nombre con fuzzy matching.
                 #    IMPORTANTE: NO aplicar fuzzy a términos numéricos — los códigos
@@ -382,6 +382,11 @@ class VentasMixin:
                     precio_actual = 0.0
                 if precio_actual <= 0:
                     try:
+                        # El indice devuelve un snapshot: para editar hace falta el objeto ORM
+                        if not isinstance(prod, Producto):
+                            prod = self.prod_repo.obtener(prod.id)
+                            if prod is None:
+                                return
                         from app.gui.dialogs import QuickEditProductoDialog
                         dlg = QuickEditProductoDialog(prod, self)
                         dlg.setWindowTitle(f'Precio requerido - {prod.nombre}')
@@ -494,6 +499,17 @@ class VentasMixin:
                 # Liberar el guard en el siguiente ciclo de eventos (evita dobles por Enter/completer)
                 QTimer.singleShot(0, lambda: setattr(self, "_agregando_guard", False))
 
+    def _producto_por_codigo(self, codigo):
+        """v6.8.0: resuelve un código exacto contra el índice en memoria del catálogo.
+
+        Devuelve un CatalogEntry (codigo_barra/nombre/precio/categoria/id) sin tocar
+        SQLite. Si el índice no está cargado, cae a la query de prod_repo.
+        """
+        catalogo = getattr(self, "catalogo", None)
+        if catalogo is not None and catalogo.cargado:
+            return catalogo.por_codigo(codigo)
+        return self.prod_repo.buscar_por_codigo(codigo)
+
     def _agregar_producto_rapido(self, term):
         """Abre un diálogo para agregar un producto nuevo al vuelo desde ventas."""
         from app.gui.dialogs import agregar_producto_rapido_dialog
@@ -30,28 +30,18 @@ class _ForcePullWorker(QThread):
     def run(self):
         try:
             from app.firebase_sync import FirebaseSyncManager
-            from app.database import SessionLocal
-            from sqlalchemy import text as _sa_text
-            session = SessionLocal()
-            # v6.6.4: PRAGMA synchronous=NORMAL hace los commits ~10x mas rapidos
-            # (1 fsync por checkpoint, no por commit). Seguro en WAL mode.
-            # busy_timeout reducido a 5s porque ahora retry interno es rapido.
-            try:
-                session.execute(_sa_text("PRAGMA busy_timeout=5000"))
-                session.execute(_sa_text("PRAGMA synchronous=NORMAL"))
-                session.execute(_sa_text("PRAGMA journal_mode=WAL"))
-                session.commit()
-            except Exception:
-                pass
-            try:
+            from app.session_manager import SessionManager
+
+            # v6.8.0: el force pull corre en el hilo escritor de SessionManager
+            # (serializado con la sync periodica, conexion propia en WAL)
+            def _job(session):
                 mgr = FirebaseSyncManager(session, self.sucursal)
-                resultado = mgr.force_pull_all(
+                return mgr.force_pull_all(
                     progress_callback=lambda tipo, page, applied, errors: self.progress.emit(tipo, page, applied, errors),
                     cancel_check=lambda: self._cancel,
                 )
-                self.finished_ok.emit(resultado)
-            finally:
-                session.close()
+            resultado = SessionManager.get_instance().escribir(_job)
+            self.finished_ok.emit(resultado)
         except Exception as e:
             self.failed.emit(str(e))
 
@@ -106,6 +96,8 @@ class SyncConfigPanel(QWidget):
         self.cmb_modo = NoScrollComboBox()
         self.cmb_modo.addItem("Automatica (intervalo fijo)", "interval")
         self.cmb_modo.addItem("Manual (boton en status bar)", "manual")
+        # v6.8.0: escucha cambios/ con un stream de Firebase; el intervalo queda de respaldo
+        self.cmb_modo.addItem("Tiempo real (escucha cambios)", "stream")
         lay_modo.addRow("Modo:", self.cmb_modo)
 
         self.lbl_intervalo = QLabel("Intervalo:")
@@ -220,6 +212,33 @@ class SyncConfigPanel(QWidget):
         )
         lay_cleanup.addRow("Margen de seguridad:", self.spn_safe_window)
 
+        # v6.8.0: borrar en lotes en segundo plano al terminar el pull
+        self.chk_cleanup_diferido = QCheckBox("Borrar en segundo plano despues de cada pull")
+        self.chk_cleanup_diferido.setToolTip(
+            "Activado: los cambios a borrar se juntan durante el pull y se borran\n"
+            "despues, en lotes y sin demorar la sincronizacion.\n"
+            "Desactivado: se borran en lotes al terminar cada pagina del pull."
+        )
+        lay_cleanup.addRow(self.chk_cleanup_diferido)
+
+        # v6.8.0: snapshots compactados para arrancar sucursales nuevas
+        self.chk_snapshots = QCheckBox("Publicar snapshots de productos, proveedores y clientes")
+        self.chk_snapshots.setToolTip(
+            "Una vez por dia se guarda en Firebase el ultimo estado de cada producto,\n"
+            "proveedor y cliente. Una sucursal nueva (o un 'Forzar pull completo')\n"
+            "carga ese resumen de una vez y solo baja los cambios posteriores."
+        )
+        lay_cleanup.addRow(self.chk_snapshots)
+
+        # v6.8.0: resumenes diarios para el dashboard web
+        self.chk_resumenes = QCheckBox("Publicar resumenes diarios para el dashboard web")
+        self.chk_resumenes.setToolTip(
+            "Despues de cada sincronizacion se suben los totales por dia de esta\n"
+            "sucursal (medios de pago, CAE, pagos a proveedores, productos mas vendidos).\n"
+            "El dashboard los lee en vez de bajar todas las ventas de cambios/."
+        )
+        lay_cleanup.addRow(self.chk_resumenes)
+
         lbl_cleanup_info = QLabel(
             "Esto solo borra los <b>registros de transito</b> en Firebase, "
             "no los productos/ventas locales."
@@ -282,6 +301,12 @@ class SyncConfigPanel(QWidget):
             _chk.toggled.connect(self._on_bulk_chk_toggled)
             lay_inicial.addWidget(_chk)
 
+        # v6.8.0: por defecto se sube solo lo nuevo/modificado desde el ultimo push
+        self.chk_bulk_completo = QCheckBox("Subir todo de nuevo (ignorar lo ya subido)")
+        self.chk_bulk_completo.setChecked(False)
+        self.chk_bulk_completo.setStyleSheet("font-size: 11px; color: #555; padding: 4px 0 2px 0;")
+        lay_inicial.addWidget(self.chk_bulk_completo)
+
         # Barra de progreso (oculta hasta que se usa)
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -391,7 +416,7 @@ class SyncConfigPanel(QWidget):
         self.btn_force_pull.clicked.connect(self._force_pull)
         lay_inicial.addWidget(self.btn_force_pull)
 
-        # v6.6.2: boton Ver items con error (sync_skipped.log)
+        # v6.6.2: boton Ver items con error (v6.8.0: tabla pull_saltados de sync_state.db)
         self.btn_ver_errores = QPushButton("  Ver items con error (skipeados)  ")
         self.btn_ver_errores.setCursor(Qt.PointingHandCursor)
         self.btn_ver_errores.setMinimumHeight(34)
@@ -434,6 +459,15 @@ class SyncConfigPanel(QWidget):
         btn_log.clicked.connect(self._mostrar_log_sync)
         lay_log.addWidget(btn_log)
 
+        # v6.8.0: telemetria por corrida (sync_state.db, tabla sync_runs)
+        btn_rend = QPushButton("  Ver rendimiento por sincronización  ")
+        btn_rend.setCursor(Qt.PointingHandCursor)
+        btn_rend.setToolTip("Duracion por fase, requests, KB enviados/recibidos, "
+                            "cambios aplicados por segundo, reintentos y esperas por BD bloqueada "
+                            "de las ultimas sincronizaciones.")
+        btn_rend.clicked.connect(self._mostrar_rendimiento_sync)
+        lay_log.addWidget(btn_rend)
+
         root.addWidget(gb_log)
 
         # ===== BOTONES =====
@@ -632,9 +666,17 @@ class SyncConfigPanel(QWidget):
                 self.tbl_historial_sync.setItem(i, col, it)
 
     def _on_modo_changed(self):
-        visible = (self.cmb_modo.currentData() == "interval")
+        modo = self.cmb_modo.currentData()
+        visible = modo in ("interval", "stream")
         self.lbl_intervalo.setVisible(visible)
         self.spn_intervalo.setVisible(visible)
+        # v6.8.0: en modo stream el intervalo se usa solo si el stream se corta
+        self.lbl_intervalo.setText("Intervalo si se corta:" if modo == "stream" else "Intervalo:")
+        self.spn_intervalo.setToolTip(
+            "En tiempo real los cambios llegan apenas se suben. Si la conexion de\n"
+            "escucha se corta, se vuelve a sincronizar cada este intervalo hasta\n"
+            "que reconecte (y con el stream activo, una sync completa cada 30 min)."
+            if modo == "stream" else "")
 
     def _load_config(self):
         sync_cfg = self.cfg.get("sync", {})
@@ -663,6 +705,9 @@ class SyncConfigPanel(QWidget):
         cleanup = (sync_cfg.get("cleanup") or {})
         self.chk_cleanup_enabled.setChecked(bool(cleanup.get("enabled", True)))
         self.spn_safe_window.setValue(int(cleanup.get("safe_window_days", 30)))
+        self.chk_cleanup_diferido.setChecked(bool(cleanup.get("diferido", True)))
+        self.chk_snapshots.setChecked(bool((sync_cfg.get("snapshots") or {}).get("enabled", True)))
+        self.chk_resumenes.setChecked(bool((sync_cfg.get("resumenes") or {}).get("enabled", True)))
 
     def _save_config(self):
         cfg = load_config()
@@ -682,13 +727,25 @@ class SyncConfigPanel(QWidget):
             "sync_proveedores": self.chk_sync_proveedores.isChecked(),
             "confirm_delete_productos": self.chk_confirm_delete_prod.isChecked(),  # v6.7.1
             "last_sync": old_sync.get("last_sync"),
-            "last_processed_keys": old_sync.get("last_processed_keys", {}),
             # v6.6.1: cleanup configurable desde UI
             "cleanup": {
                 "enabled": self.chk_cleanup_enabled.isChecked(),
                 "safe_window_days": int(self.spn_safe_window.value()),
+                "diferido": self.chk_cleanup_diferido.isChecked(),  # v6.8.0
+            },
+            # v6.8.0: snapshots de entidades
+            "snapshots": {
+                **(old_sync.get("snapshots") or {}),
+                "enabled": self.chk_snapshots.isChecked(),
+            },
+            "resumenes": {
+                **(old_sync.get("resumenes") or {}),
+                "enabled": self.chk_resumenes.isChecked(),
             },
         }
+        # v6.8.0: cursores todavia no migrados a sync_state.db (los saca la proxima sync)
+        if "last_processed_keys" in old_sync:
+            cfg["sync"]["last_processed_keys"] = old_sync["last_processed_keys"]
 
         # Guardar refresh_seconds a nivel raíz (no dentro de sync)
         cfg["refresh_seconds"] = self.spn_refresh.value()
@@ -1095,12 +1152,24 @@ class SyncConfigPanel(QWidget):
             "pagos_proveedores": ("Pagos a proveedores", PagoProveedor),
             "compradores": ("Clientes", Comprador),
         }
+        from app.firebase_sync import FirebaseSyncManager
+        sync = FirebaseSyncManager(session, sucursal)
+        completo = self.chk_bulk_completo.isChecked()
         try:
-            counts = {t: session.query(ETIQUETAS[t][1]).count() for t in seleccion}
+            # v6.8.0: solo lo que falta subir (salvo "Subir todo de nuevo")
+            counts = {t: sync.contar_para_push(t, completo) for t in seleccion}
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudieron contar items locales:\n{e}")
             return
 
+        if not any(counts.values()):
+            QMessageBox.information(
+                self, "Sync inicial",
+                "No hay cambios nuevos para subir desde el ultimo envio.\n"
+                "Marca 'Subir todo de nuevo' para reenviar todo."
+            )
+            return
+
         lineas_conf = ["Subiras a Firebase:", ""]
         for tipo in ("productos", "proveedores", "ventas", "pagos_proveedores", "compradores"):
             if tipo in seleccion:
@@ -1118,11 +1187,8 @@ class SyncConfigPanel(QWidget):
         ) != QMessageBox.Yes:
             return
 
-        from app.firebase_sync import FirebaseSyncManager
         from PyQt5.QtWidgets import QApplication
 
-        sync = FirebaseSyncManager(session, sucursal)
-
         # Mostrar barra de progreso y deshabilitar boton
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
@@ -1143,7 +1209,8 @@ class SyncConfigPanel(QWidget):
         QApplication.processEvents()
 
         try:
-            result = sync.push_all_existing(callback=progress_callback, tipos=seleccion)
+            result = sync.push_all_existing(callback=progress_callback, tipos=seleccion,
+                                            completo=completo)
             errores = result.get("errores", 0)
 
             self.progress_bar.setValue(self.progress_bar.maximum())
@@ -1234,6 +1301,109 @@ class SyncConfigPanel(QWidget):
 
         dlg.exec_()
 
+    # Colores del grafico de rendimiento por fase
+    _RENDIMIENTO_FASES = (
+        ("flush", "Envio (cola)", "#1565c0"),
+        ("snapshot", "Snapshots (carga)", "#8e24aa"),
+        ("pull", "Descarga y aplicacion", "#2e7d32"),
+        ("snapshots", "Snapshots (publicacion)", "#ef6c00"),
+        ("resumenes", "Resumenes (dashboard)", "#00838f"),
+    )
+
+    def _mostrar_rendimiento_sync(self):
+        """v6.8.0: historial de metricas por sincronizacion (grafico + tabla)."""
+        from PyQt5.QtWidgets import QDialog, QVBoxLayout, QDialogButtonBox
+        from datetime import datetime as _dt
+
+        try:
+            from app.sync_state import SyncState
+            corridas = SyncState.get_instance().corridas(50)
+        except Exception as e:
+            QMessageBox.warning(self, "Rendimiento de sincronización", f"Error leyendo metricas: {e}")
+            return
+
+        dlg = QDialog(self)
+        dlg.setWindowTitle("Rendimiento de sincronización")
+        dlg.resize(900, 640)
+        layout = QVBoxLayout(dlg)
+
+        if not corridas:
+            layout.addWidget(QLabel("Todavía no hay sincronizaciones registradas."))
+        else:
+            antiguas = list(reversed(corridas))  # el grafico va de la mas vieja a la mas nueva
+            try:
+                from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+                from matplotlib.figure import Figure
+
+                fig = Figure(figsize=(9, 3), dpi=100)
+                ax = fig.add_subplot(111)
+                xs = range(len(antiguas))
+                base = [0.0] * len(antiguas)
+                for prefijo, etiqueta, color in self._RENDIMIENTO_FASES:
+                    seg = []
+                    for c in antiguas:
+                        fases = c.get("fases") or {}
+                        seg.append(sum(f.get("ms", 0) for k, f in fases.items()
+                                       if k.split(":")[0] == prefijo) / 1000.0)
+                    if any(seg):
+                        ax.bar(xs, seg, bottom=base, color=color, label=etiqueta)
+                        base = [b + v for b, v in zip(base, seg)]
+                ax.set_xticks(list(xs))
+                ax.set_xticklabels([_dt.fromtimestamp(c["inicio"] / 1000).strftime("%d/%m %H:%M")
+                                    for c in antiguas], rotation=45, ha="right", fontsize=7)
+                ax.set_ylabel("Segundos")
+                ax.set_title("Duración por fase", fontsize=11, fontweight="bold")
+                ax.grid(axis="y", alpha=0.3)
+                if any(base):
+                    ax.legend(fontsize=8)
+                fig.tight_layout()
+                canvas = FigureCanvas(fig)
+                canvas.setMinimumHeight(260)
+                layout.addWidget(canvas)
+                canvas.draw()
+            except Exception as e:
+                layout.addWidget(QLabel(f"No se pudo generar el gráfico: {e}"))
+
+            cols = ("Fecha", "Duración", "Enviados", "Recibidos", "Aplicados/s", "Requests",
+                    "KB enviados", "KB recibidos", "Reintentos", "Espera BD", "Errores")
+            tabla = QTableWidget(len(corridas), len(cols), dlg)
+            tabla.setHorizontalHeaderLabels(cols)
+            tabla.verticalHeader().setVisible(False)
+            tabla.setEditTriggers(QTableWidget.NoEditTriggers)
+            tabla.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+            for fila, c in enumerate(corridas):
+                espera = f"{c['espera_bd_ms'] / 1000:.1f}s"
+                if c.get("bloqueos_bd"):
+                    espera += f" ({c['bloqueos_bd']} bloqueos)"
+                valores = (
+                    _dt.fromtimestamp(c["inicio"] / 1000).strftime("%d/%m/%Y %H:%M:%S"),
+                    f"{c['duracion_ms'] / 1000:.1f}s",
+                    str(c["enviados"]), str(c["recibidos"]),
+                    f"{c.get('aplicados_por_seg', 0):.0f}",
+                    str(c["requests"]),
+                    f"{c['bytes_out'] / 1024:.0f}", f"{c['bytes_in'] / 1024:.0f}",
+                    str(c["reintentos"]), espera, str(c["errores"]),
+                )
+                for col, valor in enumerate(valores):
+                    item = QTableWidgetItem(valor)
+                    if col:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    tabla.setItem(fila, col, item)
+                # Detalle por fase en el tooltip de la fila
+                detalle = "\n".join(
+                    f"{k}: {f.get('ms', 0) / 1000:.2f}s, {f.get('requests', 0)} req, "
+                    f"{f.get('bytes_in', 0) / 1024:.0f} KB in"
+                    + (f", {f['aplicados']} aplicados" if "aplicados" in f else "")
+                    for k, f in (c.get("fases") or {}).items())
+                for col in range(len(cols)):
+                    tabla.item(fila, col).setToolTip(detalle)
+            layout.addWidget(tabla)
+
+        btns = QDialogButtonBox(QDialogButtonBox.Close, dlg)
+        btns.rejected.connect(dlg.close)
+        layout.addWidget(btns)
+        dlg.exec_()
+
     def _test_connection(self):
         """Prueba la conexion con Firebase via REST API."""
         db_url = self.ed_db_url.text().strip().rstrip("/")
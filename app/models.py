@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 import datetime
@@ -21,6 +21,9 @@ class Comprador(Base):
     localidad = Column(String, nullable=True)
     codigo_postal = Column(String, nullable=True)
     condicion = Column(String, nullable=True)
+    # v6.8.0: marca del push incremental (los clientes se editan en el lugar)
+    last_modified = Column(DateTime, default=datetime.datetime.now,
+                           onupdate=datetime.datetime.now, nullable=True)
 
 class Producto(Base):
     __tablename__ = 'productos'
@@ -37,6 +40,14 @@ class Producto(Base):
                            onupdate=datetime.datetime.now, nullable=True)
     version       = Column(Integer, default=1, nullable=False)
 
+# v6.8.0: claves naturales unicas por sucursal (la sync inserta con ON CONFLICT DO NOTHING).
+# El ticket sin CAE solo cuenta donde lo reparte la secuencia "ticket" (>0 y sin CAE).
+VENTAS_INDICES_UNICOS = {
+    "ux_ventas_sucursal_ticket": ("numero_ticket", "numero_ticket > 0 AND afip_cae IS NULL"),
+    "ux_ventas_sucursal_ticket_cae": ("numero_ticket_cae", "numero_ticket_cae IS NOT NULL"),
+}
+
+
 class Venta(Base):
     __tablename__ = 'ventas'
     id         = Column(Integer, primary_key=True)
@@ -78,6 +89,12 @@ class Venta(Base):
 
     __table_args__ = (
         Index('ix_ventas_sucursal_fecha', 'sucursal', 'fecha'),
+        Index('ix_ventas_fecha', 'fecha'),   # v6.8.0: listado paginado sin filtro de sucursal
+        *(Index(nombre, 'sucursal', col, unique=True, sqlite_where=text(where))
+          for nombre, (col, where) in VENTAS_INDICES_UNICOS.items()),
+        # Nº AFIP: cada tipo de comprobante tiene su numeracion, no puede ser unico
+        Index('ix_ventas_sucursal_afip', 'sucursal', 'afip_numero_comprobante',
+              sqlite_where=text('afip_numero_comprobante IS NOT NULL')),
     )
     items = relationship("VentaItem", back_populates="venta", cascade="all, delete-orphan")
 
@@ -93,6 +110,30 @@ class VentaItem(Base):
     venta = relationship("Venta", back_populates="items")
     producto = relationship("Producto")
 
+class VentaDiaria(Base):
+    """Resumen diario de ventas (v6.8.0). Lo mantienen triggers SQLite sobre
+    `ventas` (ver database._ensure_ventas_diarias); no escribir desde el ORM."""
+    __tablename__ = "ventas_diarias"
+    sucursal  = Column(String, primary_key=True)
+    fecha     = Column(Date, primary_key=True)
+    modo_pago = Column(String, primary_key=True)
+    con_cae   = Column(Integer, primary_key=True)   # 1 si afip_cae no vacio
+    cantidad  = Column(Integer, nullable=False, default=0)
+    total     = Column(Float, nullable=False, default=0.0)
+    interes   = Column(Float, nullable=False, default=0.0)
+
+class TicketSequence(Base):
+    """Ultimo numero de ticket asignado por (sucursal, kind) (v6.8.0).
+
+    kind: "ticket" (ventas sin CAE + pagos a proveedores, numeracion compartida)
+          "cae"    (ventas con CAE)
+    Se avanza con UPDATE ... RETURNING desde VentaRepo/PagoProveedorRepo.
+    """
+    __tablename__ = "ticket_sequences"
+    sucursal = Column(String, primary_key=True)
+    kind     = Column(String, primary_key=True)
+    ultimo   = Column(Integer, nullable=False, default=0)
+
 class Proveedor(Base):
     __tablename__ = 'proveedores'
     id = Column(Integer, primary_key=True)
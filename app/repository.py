@@ -1,14 +1,21 @@
+import sqlite3
 from datetime import datetime, date, time,timedelta
-from sqlalchemy import func, and_, or_, delete, cast, String
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func, and_, or_, delete, cast, String, Date, select, table, column, text, case, type_coerce, tuple_, not_
+from sqlalchemy.orm import joinedload, selectinload, aliased
 from werkzeug.security import generate_password_hash, check_password_hash
 import pandas as pd
 from app.models import Producto
+from app.catalog_index import ProductCatalogIndex, CatalogEntry
+from app import sales_archive
+from app.database import (
+    PRODUCTOS_FTS_TABLE, VENTAS_DIARIAS_TABLE,
+    TICKET_SEQUENCES_TABLE, TICKET_KIND, TICKET_KIND_CAE, backfill_ticket_sequence,
+)
 #from app.gui.proveedores import ProveedorService
 
 from app.models import (
     Usuario, Producto, Proveedor,
-    Venta, VentaItem, VentaLog, PagoProveedor
+    Venta, VentaItem, VentaLog, PagoProveedor, VentaDiaria
 )
 
 class OptimisticLockError(Exception):
@@ -21,6 +28,64 @@ class OptimisticLockError(Exception):
             f'Recarga los datos e intenta de nuevo.'
         )
 
+_FTS_OK = None
+
+
+def _fts_disponible(session) -> bool:
+    """True si la tabla FTS5 de productos existe (se chequea una vez por proceso)."""
+    global _FTS_OK
+    if _FTS_OK is None:
+        try:
+            _FTS_OK = session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"
+            ), {"n": PRODUCTOS_FTS_TABLE}).first() is not None
+        except Exception:
+            _FTS_OK = False
+    return _FTS_OK
+
+
+_ROLLUP_OK = None
+
+
+def _rollup_disponible(session) -> bool:
+    """True si `ventas_diarias` esta mantenida por triggers (se chequea una vez por proceso)."""
+    global _ROLLUP_OK
+    if _ROLLUP_OK is None:
+        try:
+            _ROLLUP_OK = session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=:n"
+            ), {"n": f"{VENTAS_DIARIAS_TABLE}_ai"}).first() is not None
+        except Exception:
+            _ROLLUP_OK = False
+    return _ROLLUP_OK
+
+
+# UPDATE ... RETURNING requiere SQLite >= 3.35
+_RETURNING_OK = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def _avanzar_secuencia(session, sucursal: str, kind: str) -> int:
+    """Reserva el siguiente numero de `ticket_sequences` dentro de la transaccion
+    de `session` (v6.8.0). Si la sucursal no tiene fila aun, la inicializa
+    desde los datos existentes y reintenta. Un rollback de la venta devuelve
+    el numero."""
+    params = {"s": sucursal, "k": kind}
+    upd = (f"UPDATE {TICKET_SEQUENCES_TABLE} SET ultimo = ultimo + 1 "
+           "WHERE sucursal = :s AND kind = :k")
+    for _ in range(2):
+        if _RETURNING_OK:
+            n = session.execute(text(upd + " RETURNING ultimo"), params).scalar()
+        else:
+            res = session.execute(text(upd), params)
+            n = session.execute(text(
+                f"SELECT ultimo FROM {TICKET_SEQUENCES_TABLE} WHERE sucursal = :s AND kind = :k"
+            ), params).scalar() if res.rowcount else None
+        if n is not None:
+            return int(n)
+        backfill_ticket_sequence(session, sucursal, kind)
+    raise RuntimeError(f"No se pudo avanzar la secuencia {kind!r} de {sucursal!r}")
+
+
 class UsuarioRepo:
     def __init__(self, session):
         self.session = session
@@ -78,6 +143,19 @@ class prod_repo:
         return self.session.query(Producto)\
             .filter_by(codigo_barra=codigo).first()
 
+    def buscar_por_codigo_indexado(self, codigo):
+        """v6.8.0: como buscar_por_codigo pero resuelto contra ProductCatalogIndex.
+        Si el indice esta cargado y el codigo no existe, no toca la BD. Si existe,
+        devuelve el objeto ORM via identity map (session.get).
+        """
+        idx = ProductCatalogIndex.get_instance()
+        if not idx.cargado:
+            return self.buscar_por_codigo(codigo)
+        entry = idx.por_codigo(codigo)
+        if entry is None:
+            return None
+        return self.session.get(Producto, entry.id)
+
     def crear(self, codigo, nombre, precio, categoria=None):
         p = Producto(
             codigo_barra=codigo,
@@ -93,32 +171,76 @@ class prod_repo:
         return self.session.query(Producto).all()
 
     def buscar(self, texto: str, limit: int = 500):
-        """Busca productos por codigo, nombre, categoria o precio usando SQL LIKE.
+        """Busca productos por codigo, nombre, categoria o precio.
         Soporta multiples terminos separados por coma o espacio (AND).
         Ej: "kevin,deo,250" -> productos que contengan kevin Y deo Y 250.
+
+        v6.8.0: si existe la tabla FTS5 `productos_fts` (trigram), los terminos de
+        texto de 3+ caracteres se resuelven con un solo MATCH contra el indice
+        full-text. Terminos cortos (el trigram no los indexa) y numericos (codigo /
+        precio como texto) se aplican como filtro LIKE sobre ese subconjunto.
+        Si el MATCH devuelve hasta `limit` filas se ordenan por relevancia (bm25);
+        en busquedas muy amplias (mientras se tipea) se omite el ranking, que
+        obligaria a puntuar todas las coincidencias. Sin FTS5 cae a `_buscar_like`.
         """
         import re
         terminos = [t.strip() for t in re.split(r'[,\s]+', texto or '') if t.strip()]
         if not terminos:
             return []
-        q = self.session.query(Producto)
-        for t in terminos:
-            patron = f"%{t}%"
-            # Precio: si el termino es numero, permitir match como texto (cast a string)
-            precio_filter = None
+
+        def _es_numero(t):
             try:
                 float(t.replace(',', '.'))
-                precio_filter = cast(Producto.precio, String).ilike(patron)
+                return True
             except ValueError:
-                pass
-            cond = or_(
-                Producto.nombre.ilike(patron),
-                Producto.codigo_barra.ilike(patron),
-                Producto.categoria.ilike(patron),
-            )
-            if precio_filter is not None:
-                cond = or_(cond, precio_filter)
-            q = q.filter(cond)  # AND entre terminos
+                return False
+
+        principales = [t for t in terminos if len(t) >= 3 and not _es_numero(t)]
+        if not principales or not _fts_disponible(self.session):
+            return self._buscar_like(terminos, limit)
+
+        fts = table(PRODUCTOS_FTS_TABLE, column("rowid"), column("rank"))
+        match = text(f"{PRODUCTOS_FTS_TABLE} MATCH :fts_q").bindparams(
+            fts_q=" AND ".join('"' + t.replace('"', '""') + '"' for t in principales))
+        # Sondeo barato (sin ranking) para saber si el set de coincidencias es acotado
+        sondeo = self.session.execute(select(fts.c.rowid).where(match).limit(limit + 1)).all()
+        if not sondeo:
+            return []
+        q = (self.session.query(Producto)
+             .select_from(fts)
+             .join(Producto, Producto.id == fts.c.rowid)
+             .filter(match))
+        if len(sondeo) <= limit:
+            q = q.order_by(fts.c.rank)
+        for t in terminos:
+            if t not in principales:
+                q = q.filter(self._cond_like(t))  # AND entre terminos
+        return q.limit(limit).all()
+
+    @staticmethod
+    def _cond_like(t: str):
+        patron = f"%{t}%"
+        # Precio: si el termino es numero, permitir match como texto (cast a string)
+        precio_filter = None
+        try:
+            float(t.replace(',', '.'))
+            precio_filter = cast(Producto.precio, String).ilike(patron)
+        except ValueError:
+            pass
+        cond = or_(
+            Producto.nombre.ilike(patron),
+            Producto.codigo_barra.ilike(patron),
+            Producto.categoria.ilike(patron),
+        )
+        if precio_filter is not None:
+            cond = or_(cond, precio_filter)
+        return cond
+
+    def _buscar_like(self, terminos, limit: int = 500):
+        """Camino previo a FTS5: un OR de ilike('%t%') por termino (full scan)."""
+        q = self.session.query(Producto)
+        for t in terminos:
+            q = q.filter(self._cond_like(t))  # AND entre terminos
         return q.limit(limit).all()
 
     def actualizar_nombre(self, prod_id, nuevo_nombre, expected_version=None):
@@ -159,60 +281,160 @@ class prod_repo:
         # Borrado por lote sin sincronización de sesión (más rápido)
         self.session.execute(delete(Producto).where(Producto.id.in_(ids)))
         self.session.commit()
+        # El delete masivo no dispara eventos ORM: sacar los ids del indice a mano
+        ProductCatalogIndex.get_instance().descartar_ids(ids)
         
     def listar_codigos_nombres(self):
     # Devuelve lista de tuplas (codigo_barra, nombre) sin cargar columnas que no usamos
         return self.session.query(self.modelo.codigo_barra, self.modelo.nombre).all()
 
+    # ─── Importacion masiva (v6.8.0) ─────────────────────────────────
+    IMPORT_COLS = ['codigo_barra', 'nombre', 'precio', 'categoria']
+
+    @staticmethod
+    def _normalizar_importacion(df: pd.DataFrame):
+        """Limpia un DataFrame leido de Excel (vectorizado).
+
+        Retorna (df_limpio, filas_omitidas). df_limpio tiene una fila por
+        codigo_barra (queda la ultima) y columnas IMPORT_COLS.
+        """
+        def _texto(col):
+            if col not in df.columns:
+                return pd.Series([''] * len(df), index=df.index, dtype=object)
+            serie = df[col]
+            return serie.where(serie.notna(), '').astype(str).str.strip()
+
+        out = pd.DataFrame({
+            'codigo_barra': _texto('codigo_barra'),
+            'nombre': _texto('nombre'),
+            'precio': (pd.to_numeric(df['precio'], errors='coerce').fillna(0.0).astype(float)
+                       if 'precio' in df.columns else 0.0),
+            'categoria': _texto('categoria'),
+        })
+        validas = ~(out['codigo_barra'].isin(['', 'nan']) | out['nombre'].isin(['', 'nan']))
+        omitidas = int((~validas).sum())
+        out = out[validas].drop_duplicates('codigo_barra', keep='last')
+        out['categoria'] = out['categoria'].where(out['categoria'] != '', None)
+        return out.reset_index(drop=True), omitidas
+
+    def _catalogo_df(self) -> pd.DataFrame:
+        return pd.DataFrame(self.listar_para_indice(),
+                            columns=['id', 'codigo_barra', 'nombre', 'precio', 'categoria'])
+
+    def diff_importacion(self, df: pd.DataFrame):
+        """Clasifica las filas de un Excel contra el catalogo en una sola pasada.
+
+        Retorna (nuevos, modificados, sin_cambios, filas_omitidas) con el
+        formato que espera ImportPreviewDialog.
+        """
+        limpio, omitidas = self._normalizar_importacion(df)
+        m = limpio.merge(self._catalogo_df(), on='codigo_barra', how='left',
+                         suffixes=('', '_actual'), indicator=True)
+        # El merge deja NaN en los faltantes (categoria None, producto nuevo): a None
+        texto = ['nombre_actual', 'categoria', 'categoria_actual']
+        m[texto] = m[texto].astype(object).where(m[texto].notna(), None)
+        existe = m['_merge'] == 'both'
+        hay_diff = (
+            (m['nombre'] != m['nombre_actual'])
+            | ((m['precio'] - m['precio_actual'].fillna(0.0)).abs() > 0.001)
+            | (m['categoria'].fillna('') != m['categoria_actual'].fillna(''))
+        )
+        nuevos = m.loc[~existe, self.IMPORT_COLS]
+        mods = m[existe & hay_diff]
+        modificados = [{
+            'codigo_barra': r.codigo_barra,
+            'nombre_actual': r.nombre_actual, 'nombre_nuevo': r.nombre,
+            'precio_actual': r.precio_actual or 0, 'precio_nuevo': r.precio,
+            'categoria_actual': r.categoria_actual, 'categoria_nueva': r.categoria,
+            'producto_id': int(r.id),
+        } for r in mods.itertuples(index=False)]
+        nuevos_list = nuevos.to_dict('records')
+        sin_cambios = int((existe & ~hay_diff).sum())
+        return nuevos_list, modificados, sin_cambios, omitidas
+
+    def bulk_upsert(self, df: pd.DataFrame, chunk_size: int = 500):
+        """Inserta/actualiza productos por codigo_barra en lotes y confirma.
+
+        Usa INSERT ... ON CONFLICT(codigo_barra) DO UPDATE ... RETURNING por
+        chunk (en vez de un SELECT + INSERT/UPDATE por fila). Los existentes
+        suben `version` y `last_modified`.
+
+        Retorna (nuevos, actualizados): filas con id, codigo_barra, nombre,
+        precio, categoria, telefono, numero_cuenta, cbu (sirven para
+        _log_product_change y push_productos_batch).
+        """
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        if df is None or len(df) == 0:
+            return [], []
+        limpio, _ = self._normalizar_importacion(df)
+        existentes = set(self._catalogo_df()['codigo_barra'])
+        registros = limpio[self.IMPORT_COLS].to_dict('records')
+        for r in registros:
+            if not isinstance(r['categoria'], str):
+                r['categoria'] = None
+
+        ahora = datetime.now()
+        stmt = sqlite_insert(Producto)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Producto.codigo_barra],
+            set_={
+                'nombre': stmt.excluded.nombre,
+                'precio': stmt.excluded.precio,
+                'categoria': stmt.excluded.categoria,
+                'last_modified': ahora,
+                'version': Producto.version + 1,
+            },
+        ).returning(
+            Producto.id, Producto.codigo_barra, Producto.nombre, Producto.precio,
+            Producto.categoria, Producto.telefono, Producto.numero_cuenta, Producto.cbu,
+        )
+        filas = []
+        try:
+            for i in range(0, len(registros), chunk_size):
+                chunk = [dict(r, last_modified=ahora, version=1) for r in registros[i:i + chunk_size]]
+                filas.extend(self.session.execute(stmt, chunk).all())
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+        nuevos = [f for f in filas if f.codigo_barra not in existentes]
+        actualizados = [f for f in filas if f.codigo_barra in existentes]
+
+        # El upsert no pasa por el unit-of-work: refrescar objetos cargados e indice
+        ids_act = {f.id for f in actualizados}
+        for obj in list(self.session.identity_map.values()):
+            if isinstance(obj, Producto) and obj.id in ids_act:
+                self.session.expire(obj)
+        ProductCatalogIndex.get_instance().aplicar(
+            upserts=[CatalogEntry(f.id, f.codigo_barra, f.nombre, f.precio, f.categoria) for f in filas])
+        return nuevos, actualizados
+
+    def listar_para_indice(self):
+        """Tuplas (id, codigo_barra, nombre, precio, categoria) para ProductCatalogIndex."""
+        return self.session.query(
+            Producto.id, Producto.codigo_barra, Producto.nombre,
+            Producto.precio, Producto.categoria,
+        ).all()
+
 class VentaRepo:
-    def __init__(self, session):
+    def __init__(self, session, archivo=None):
         self.session = session
+        # v6.8.0: LecturaArchivo que respalda `session` (None = BD principal)
+        self.archivo = archivo
     
     
     def commit(self):
         self.session.commit()
 
-    # Siguiente número de ticket para ventas SIN CAE (secuencia independiente por sucursal)
-    # Solo cuenta ventas que NO tienen afip_cae y cuyo numero_ticket > 0
+    # Siguiente número de ticket para ventas SIN CAE (secuencia independiente por sucursal,
+    # compartida con pagos a proveedores). v6.8.0: contador en ticket_sequences.
     def siguiente_ticket(self, sucursal: str) -> int:
-        max_ticket = 0
-        last_venta = (
-            self.session.query(Venta)
-            .filter(
-                Venta.sucursal == sucursal,
-                Venta.numero_ticket > 0,
-                Venta.afip_cae.is_(None)
-            )
-            .order_by(Venta.numero_ticket.desc())
-            .first()
-        )
-        if last_venta and getattr(last_venta, 'numero_ticket', None):
-            max_ticket = last_venta.numero_ticket
-        try:
-            last_pago = (
-                self.session.query(PagoProveedor)
-                .filter(PagoProveedor.sucursal == sucursal, PagoProveedor.numero_ticket.isnot(None))
-                .order_by(PagoProveedor.numero_ticket.desc())
-                .first()
-            )
-            if last_pago and getattr(last_pago, 'numero_ticket', None):
-                max_ticket = max(max_ticket, last_pago.numero_ticket)
-        except Exception as _err:
-            # Tabla pagos_proveedores puede no existir aun (migracion pendiente) o columna numero_ticket falta.
-            # Degrada bien: usamos max_ticket de ventas. Logueamos para detectar problemas reales.
-            import logging as _logging
-            _logging.getLogger(__name__).debug("[repo] no se pudo leer ultimo numero_ticket de PagoProveedor: %s", _err)
-        return max_ticket + 1
+        return _avanzar_secuencia(self.session, sucursal, TICKET_KIND)
 
     def siguiente_ticket_cae(self, sucursal: str) -> int:
         """Siguiente número de ticket CAE para la sucursal (secuencia independiente)."""
-        last = (
-            self.session.query(Venta)
-            .filter(Venta.sucursal == sucursal, Venta.numero_ticket_cae.isnot(None))
-            .order_by(Venta.numero_ticket_cae.desc())
-            .first()
-        )
-        return (last.numero_ticket_cae + 1) if (last and last.numero_ticket_cae) else 1
+        return _avanzar_secuencia(self.session, sucursal, TICKET_KIND_CAE)
 
     # ====== CREAR VENTA CON total=0.0 ======
     # numero_ticket=0 es placeholder; se asigna el definitivo en finalizar_venta()
@@ -241,11 +463,17 @@ class VentaRepo:
 
     # Ya lo tendrás, lo dejo por si faltaba
     def agregar_item(self, venta_id: int, codigo: str, cantidad: int, precio_unit: float):
-        # asumiendo que puedes resolver Producto por codigo_barra:
-        prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+        # v6.8.0: resolver producto_id desde el indice en memoria (sin query por item)
+        idx = ProductCatalogIndex.get_instance()
+        if idx.cargado:
+            entry = idx.por_codigo(codigo)
+            prod_id = entry.id if entry else None
+        else:
+            prod = self.session.query(Producto).filter_by(codigo_barra=codigo).first()
+            prod_id = prod.id if prod else None
         item = VentaItem(
             venta_id=venta_id,
-            producto_id=prod.id if prod else None,
+            producto_id=prod_id,
             cantidad=cantidad,
             precio_unit=precio_unit
         )
@@ -325,23 +553,49 @@ class VentaRepo:
                 .order_by(VentaLog.fecha.desc())
                 .first())
 
+    def ult_logs(self, venta_ids, chunk_size: int = 900) -> dict:
+        """Comentario del ultimo VentaLog de cada venta: {venta_id: comentario}.
+
+        Equivalente set-based de llamar `ult_log()` por venta: una consulta con
+        ROW_NUMBER() OVER (PARTITION BY venta_id ...) por cada `chunk_size` ids.
+        """
+        ids = [i for i in dict.fromkeys(venta_ids or []) if i is not None]
+        out = {}
+        for k in range(0, len(ids), chunk_size):
+            rn = func.row_number().over(
+                partition_by=VentaLog.venta_id,
+                order_by=(VentaLog.fecha.desc(), VentaLog.id.desc()),
+            ).label('rn')
+            sub = (self.session.query(VentaLog.venta_id, VentaLog.comentario, rn)
+                   .filter(VentaLog.venta_id.in_(ids[k:k + chunk_size]))
+                   .subquery())
+            for vid, comentario in (self.session.query(sub.c.venta_id, sub.c.comentario)
+                                    .filter(sub.c.rn == 1)):
+                out[vid] = comentario
+        return out
+
     def exportar_rango(self, sucursal: str, inicio, fin):
+        lectura = self._abrir_archivo(inicio, fin)
+        if lectura is not None:
+            try:
+                return VentaRepo(lectura.session, lectura).exportar_rango(sucursal, inicio, fin)
+            finally:
+                lectura.cerrar()
         ventas = (self.session.query(Venta)
                     .filter(Venta.sucursal == sucursal,
                             Venta.fecha >= inicio, Venta.fecha <= fin)
                     .order_by(Venta.fecha.asc())
                     .all())
+        logs = self.ult_logs([v.id for v in ventas])
         rows = []
         for v in ventas:
-            # asegurar total
+            # asegurar total (total es NOT NULL; solo BDs muy viejas)
             total = getattr(v, 'total', None)
             if total is None:
-                total = 0.0
-                for it in self.session.query(VentaItem).filter(VentaItem.venta_id == v.id).all():
-                    total += float(getattr(it, 'precio_unit', 0.0)) * int(it.cantidad or 0)
+                total = sum(float(getattr(it, 'precio_unit', 0.0)) * int(it.cantidad or 0)
+                            for it in v.items)
 
-            log = self.ult_log(v.id)
-            comentario = log.comentario if log else ''
+            comentario = logs.get(v.id, '')
 
             rows.append({
                 'ticket': v.numero_ticket,
@@ -391,6 +645,251 @@ class VentaRepo:
             q = q.filter(Venta.sucursal == sucursal)
         return q.order_by(Venta.fecha.desc()).all()
 
+    def resumen_diario(self, desde: date, hasta: date, sucursal: str | None = None):
+        """
+        Totales por (sucursal, fecha, modo_pago, con_cae) entre dos dias (inclusive).
+
+        Lee de `ventas_diarias` (unas pocas filas por dia) en vez de materializar
+        cada Venta. Si el resumen no esta disponible agrega con GROUP BY sobre
+        `ventas`. Cada fila expone: sucursal, fecha (date), modo_pago, con_cae,
+        cantidad, total, interes.
+        """
+        if isinstance(desde, datetime):
+            desde = desde.date()
+        if isinstance(hasta, datetime):
+            hasta = hasta.date()
+        if _rollup_disponible(self.session):
+            q = self.session.query(
+                VentaDiaria.sucursal, VentaDiaria.fecha, VentaDiaria.modo_pago,
+                VentaDiaria.con_cae, VentaDiaria.cantidad, VentaDiaria.total,
+                VentaDiaria.interes,
+            ).filter(VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta)
+            if sucursal:
+                q = q.filter(VentaDiaria.sucursal == sucursal)
+            return q.order_by(VentaDiaria.fecha).all()
+
+        lectura = self._abrir_archivo(desde, hasta)
+        if lectura is not None:
+            try:
+                return VentaRepo(lectura.session, lectura).resumen_diario(desde, hasta, sucursal)
+            finally:
+                lectura.cerrar()
+        dia = type_coerce(func.date(Venta.fecha), Date)
+        con_cae = case((func.coalesce(Venta.afip_cae, '') != '', 1), else_=0)
+        q = self.session.query(
+            Venta.sucursal, dia.label('fecha'), Venta.modo_pago, con_cae.label('con_cae'),
+            func.count(Venta.id).label('cantidad'),
+            func.coalesce(func.sum(Venta.total), 0).label('total'),
+            func.coalesce(func.sum(Venta.interes_monto), 0).label('interes'),
+        ).filter(
+            Venta.fecha >= datetime.combine(desde, time.min),
+            Venta.fecha < datetime.combine(hasta + timedelta(days=1), time.min),
+        )
+        if sucursal:
+            q = q.filter(Venta.sucursal == sucursal)
+        return q.group_by(Venta.sucursal, dia, Venta.modo_pago, con_cae).order_by(dia).all()
+
+    def top_productos_por_rango(self, desde: date, hasta: date, sucursal: str | None = None,
+                                modo_pago: str | None = None, con_cae: bool | None = None,
+                                n: int = 10):
+        """
+        Productos mas vendidos entre dos dias (inclusive), agregados en SQL.
+
+        `modo_pago` filtra por prefijo (case-insensitive). Retorna filas
+        (producto_id, nombre, codigo_barra, cantidad, total); los items sin
+        producto quedan agrupados con producto_id None.
+        """
+        if isinstance(desde, datetime):
+            desde = desde.date()
+        if isinstance(hasta, datetime):
+            hasta = hasta.date()
+        lectura = self._abrir_archivo(desde, hasta)
+        if lectura is not None:
+            try:
+                return VentaRepo(lectura.session, lectura).top_productos_por_rango(
+                    desde, hasta, sucursal, modo_pago, con_cae, n)
+            finally:
+                lectura.cerrar()
+        cantidad = func.sum(VentaItem.cantidad)
+        q = (self.session.query(
+                VentaItem.producto_id, Producto.nombre, Producto.codigo_barra,
+                cantidad.label('cantidad'),
+                func.sum(VentaItem.cantidad * VentaItem.precio_unit).label('total'))
+             .join(Venta, Venta.id == VentaItem.venta_id)
+             .outerjoin(Producto, Producto.id == VentaItem.producto_id)
+             .filter(Venta.fecha >= datetime.combine(desde, time.min),
+                     Venta.fecha < datetime.combine(hasta + timedelta(days=1), time.min)))
+        if sucursal:
+            q = q.filter(Venta.sucursal == sucursal)
+        if modo_pago:
+            q = q.filter(func.lower(Venta.modo_pago).like(f"{modo_pago.lower()}%"))
+        if con_cae is True:
+            q = q.filter(func.coalesce(Venta.afip_cae, '') != '')
+        elif con_cae is False:
+            q = q.filter(func.coalesce(Venta.afip_cae, '') == '')
+        return q.group_by(VentaItem.producto_id).order_by(cantidad.desc()).limit(n).all()
+
+    # ─── Listado paginado por keyset (v6.8.0) ─────────────────────────
+    @staticmethod
+    def _filtros_listado(desde, hasta, sucursal=None, con_cae=None, forma=None, ticket_contiene=None):
+        """Condiciones SQL equivalentes a los filtros del Historial.
+
+        forma: 'tarjeta' (modo_pago empieza con 'tarj') o 'efectivo' (el resto).
+        ticket_contiene: substring del numero mostrado (ticket CAE si tiene CAE).
+        """
+        conds = [Venta.fecha >= desde, Venta.fecha <= hasta]
+        if sucursal:
+            conds.append(Venta.sucursal == sucursal)
+        tiene_cae = func.coalesce(Venta.afip_cae, '') != ''
+        if con_cae is True:
+            conds.append(tiene_cae)
+        elif con_cae is False:
+            conds.append(not_(tiene_cae))
+        if forma:
+            es_tarjeta = func.lower(func.coalesce(Venta.modo_pago, '')).like('tarj%')
+            conds.append(es_tarjeta if forma == 'tarjeta' else not_(es_tarjeta))
+        if ticket_contiene:
+            nro = case(
+                (and_(tiene_cae, func.coalesce(Venta.numero_ticket_cae, 0) != 0),
+                 cast(Venta.numero_ticket_cae, String)),
+                else_=cast(func.coalesce(func.nullif(Venta.numero_ticket, 0), Venta.id), String),
+            )
+            conds.append(nro.like(f"%{ticket_contiene}%"))
+        return conds
+
+    def pagina_por_rango(self, desde: datetime, hasta: datetime, sucursal: str | None = None,
+                         despues_de: tuple | None = None, page_size: int = 500,
+                         con_items: bool = False, **filtros):
+        """Una pagina de ventas ordenadas por (fecha, id) descendente.
+
+        `despues_de` es la clave (fecha, id) de la ultima venta de la pagina
+        anterior: la consulta sigue desde ahi usando el indice
+        ix_ventas_sucursal_fecha (o ix_ventas_fecha sin sucursal), sin OFFSET.
+        Con `con_items=True` precarga items y productos (1 consulta extra por pagina).
+        """
+        q = self.session.query(Venta).filter(
+            *self._filtros_listado(desde, hasta, sucursal, **filtros))
+        if despues_de is not None:
+            # La fecha de la clave se relee de la fila (texto tal cual esta guardado):
+            # filas escritas fuera del ORM pueden no tener microsegundos y la
+            # comparacion contra el datetime re-serializado repetiria la fila borde.
+            fecha_ult, id_ult = despues_de
+            borde = aliased(Venta)
+            fecha_borde = (select(borde.fecha).where(borde.id == id_ult)
+                           .scalar_subquery())
+            q = q.filter(tuple_(Venta.fecha, Venta.id)
+                         < tuple_(func.coalesce(fecha_borde, fecha_ult), id_ult))
+        if con_items:
+            q = q.options(selectinload(Venta.items).joinedload(VentaItem.producto))
+        return q.order_by(Venta.fecha.desc(), Venta.id.desc()).limit(page_size).all()
+
+    def iter_paginas_por_rango(self, desde: datetime, hasta: datetime, sucursal: str | None = None,
+                               page_size: int = 500, con_items: bool = False, **filtros):
+        """Generador de paginas (listas) de ventas del rango, keyset sobre (fecha, id)."""
+        clave = None
+        while True:
+            pagina = self.pagina_por_rango(desde, hasta, sucursal, clave, page_size,
+                                           con_items=con_items, **filtros)
+            if pagina:
+                yield pagina
+            if len(pagina) < page_size:
+                return
+            clave = (pagina[-1].fecha, pagina[-1].id)
+
+    def iter_por_rango(self, desde: datetime, hasta: datetime, sucursal: str | None = None,
+                       page_size: int = 500, **filtros):
+        """Generador de ventas del rango (fecha desc) en memoria acotada.
+
+        Trae `page_size` filas por consulta (keyset sobre (fecha, id)).
+        Acepta los mismos filtros que `_filtros_listado`.
+        """
+        for pagina in self.iter_paginas_por_rango(desde, hasta, sucursal, page_size, **filtros):
+            yield from pagina
+
+    def dataframe_items_por_rango(self, desde: datetime, hasta: datetime, sucursal: str | None = None,
+                                  page_size: int = 500, **filtros) -> pd.DataFrame:
+        """Detalle de items (una fila por VentaItem) de las ventas del rango.
+
+        Columnas: venta_id, ticket, codigo, nombre, categoria, cantidad,
+        precio_unitario, total_linea. Items y productos se precargan por pagina
+        (selectinload + joinedload) en vez de consultar por venta/item.
+        """
+        rows = []
+        for pagina in self.iter_paginas_por_rango(desde, hasta, sucursal, page_size,
+                                                  con_items=True, **filtros):
+            for v in pagina:
+                for it in v.items:
+                    prod = it.producto
+                    cant = float(it.cantidad or 1)
+                    pu = float(it.precio_unit or 0.0)
+                    rows.append({
+                        "venta_id": v.id,
+                        "ticket": v.numero_ticket or v.id,
+                        "codigo": (prod.codigo_barra if prod else "") or "",
+                        "nombre": (prod.nombre if prod else "") or "",
+                        "categoria": (prod.categoria if prod else "") or "",
+                        "cantidad": cant,
+                        "precio_unitario": pu,
+                        "total_linea": cant * pu,
+                    })
+        return pd.DataFrame(rows, columns=[
+            "venta_id", "ticket", "codigo", "nombre", "categoria",
+            "cantidad", "precio_unitario", "total_linea"])
+
+    def cursor_por_rango(self, desde: datetime, hasta: datetime, sucursal: str | None = None,
+                         page_size: int = 500, **filtros) -> "VentaCursor":
+        """Cursor paginable para la UI (ver VentaCursor).
+
+        Si el rango llega a años archivados el cursor lee de una LecturaArchivo
+        propia (BD principal + ventas_YYYY.db); cerrarlo con cursor.cerrar().
+        """
+        lectura = self._abrir_archivo(desde, hasta)
+        repo = VentaRepo(lectura.session, lectura) if lectura is not None else self
+        return VentaCursor(repo, desde, hasta, sucursal, page_size, **filtros)
+
+    def totales_por_rango(self, desde: datetime, hasta: datetime, sucursal: str | None = None, **filtros):
+        """Totales del rango con los mismos filtros del listado, en una sola consulta.
+
+        Las ventas anuladas por nota de credito cuentan en `cantidad` pero no en
+        los montos (igual que el resumen del Historial).
+        """
+        vigente = func.coalesce(Venta.nota_credito_cae, '') == ''
+        es_tarjeta = func.lower(func.coalesce(Venta.modo_pago, '')).like('tarj%')
+        tiene_cae = func.coalesce(Venta.afip_cae, '') != ''
+
+        def _suma(cond):
+            return func.coalesce(func.sum(case((cond, Venta.total), else_=0.0)), 0.0)
+
+        r = self.session.query(
+            func.count(Venta.id).label('cantidad'),
+            _suma(vigente).label('total'),
+            _suma(and_(vigente, not_(es_tarjeta))).label('efectivo'),
+            _suma(and_(vigente, es_tarjeta)).label('tarjeta'),
+            _suma(and_(vigente, tiene_cae)).label('total_cae'),
+        ).filter(*self._filtros_listado(desde, hasta, sucursal, **filtros)).one()
+        return {
+            'cantidad': int(r.cantidad or 0), 'total': float(r.total),
+            'efectivo': float(r.efectivo), 'tarjeta': float(r.tarjeta),
+            'total_cae': float(r.total_cae),
+        }
+
+    # ─── Archivo historico por año (v6.8.0) ──────────────────────────
+    def _abrir_archivo(self, desde, hasta):
+        """LecturaArchivo si el rango llega a años archivados; None si alcanza
+        con la BD principal o si este repo ya lee del archivo."""
+        if self.archivo is not None:
+            return None
+        return sales_archive.abrir_lectura(desde, hasta)
+
+    def archivar_anteriores_a(self, meses: int = 12) -> dict:
+        """Mueve las ventas anteriores a `meses` meses a ventas_YYYY.db (ver
+        app.sales_archive). Retorna {anio: ventas_movidas}."""
+        self.session.commit()
+        movidas = sales_archive.archivar_anteriores_a(meses)
+        if movidas:
+            self.session.expire_all()
+        return movidas
+
     def eliminar_anteriores_a(self, dias: int = 31):
         limite = datetime.now() - timedelta(days=dias)
         self.session.query(Venta).filter(Venta.fecha < limite).delete(synchronize_session=False)
@@ -422,6 +921,67 @@ class VentaRepo:
         )
 
 
+class VentaCursor:
+    """Cursor sobre un rango de ventas, paginado por keyset (v6.8.0).
+
+    Uso tipico en la UI:
+        cur = venta_repo.cursor_por_rango(desde, hasta, suc, page_size=500)
+        filas = cur.siguiente()        # primera pagina
+        if cur.hay_mas:
+            filas += cur.siguiente()   # "Cargar mas"
+        for v in cur.iterar():         # recorrido completo (exportar), no mueve el cursor
+            ...
+    """
+
+    def __init__(self, repo: VentaRepo, desde, hasta, sucursal=None, page_size: int = 500, **filtros):
+        self.repo = repo
+        self.desde = desde
+        self.hasta = hasta
+        self.sucursal = sucursal
+        self.page_size = page_size
+        self.filtros = filtros
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._clave = None
+        self.hay_mas = True
+        self.cargadas = 0
+
+    def siguiente(self) -> list:
+        """Proxima pagina (lista vacia si no hay mas)."""
+        if not self.hay_mas:
+            return []
+        pagina = self.repo.pagina_por_rango(
+            self.desde, self.hasta, self.sucursal, self._clave, self.page_size, **self.filtros)
+        self.cargadas += len(pagina)
+        self.hay_mas = len(pagina) == self.page_size
+        if pagina:
+            self._clave = (pagina[-1].fecha, pagina[-1].id)
+        return pagina
+
+    def iterar(self):
+        """Recorre el rango completo desde el principio, pagina a pagina."""
+        return self.repo.iter_por_rango(
+            self.desde, self.hasta, self.sucursal, self.page_size, **self.filtros)
+
+    def iterar_paginas(self, con_items: bool = False):
+        """Como iterar() pero entrega listas (una por pagina)."""
+        return self.repo.iter_paginas_por_rango(
+            self.desde, self.hasta, self.sucursal, self.page_size, con_items=con_items, **self.filtros)
+
+    def dataframe_items(self) -> pd.DataFrame:
+        return self.repo.dataframe_items_por_rango(
+            self.desde, self.hasta, self.sucursal, self.page_size, **self.filtros)
+
+    def totales(self) -> dict:
+        return self.repo.totales_por_rango(self.desde, self.hasta, self.sucursal, **self.filtros)
+
+    def cerrar(self):
+        """Libera la conexion al archivo historico, si el cursor la usa."""
+        if self.repo.archivo is not None:
+            self.repo.archivo.cerrar()
+
+
 class PagoProveedorRepo:
     """Repositorio para pagos a proveedores."""
 
@@ -430,28 +990,7 @@ class PagoProveedorRepo:
 
     def siguiente_ticket(self, sucursal: str) -> int:
         """Siguiente ticket compartiendo numeración con ventas SIN CAE (secuencia independiente por sucursal)."""
-        max_ticket = 0
-        last_venta = (
-            self.session.query(Venta)
-            .filter(
-                Venta.sucursal == sucursal,
-                Venta.numero_ticket > 0,
-                Venta.afip_cae.is_(None)
-            )
-            .order_by(Venta.numero_ticket.desc())
-            .first()
-        )
-        if last_venta and getattr(last_venta, 'numero_ticket', None):
-            max_ticket = last_venta.numero_ticket
-        last_pago = (
-            self.session.query(PagoProveedor)
-            .filter(PagoProveedor.sucursal == sucursal, PagoProveedor.numero_ticket.isnot(None))
-            .order_by(PagoProveedor.numero_ticket.desc())
-            .first()
-        )
-        if last_pago and getattr(last_pago, 'numero_ticket', None):
-            max_ticket = max(max_ticket, last_pago.numero_ticket)
-        return max_ticket + 1
+        return _avanzar_secuencia(self.session, sucursal, TICKET_KIND)
 
     def crear_pago(self, sucursal, proveedor_id, proveedor_nombre, monto,
                    metodo_pago='Efectivo', pago_de_caja=False, nota=None,
@@ -0,0 +1,312 @@
+# app/sales_archive.py
+"""
+Archivo historico de ventas por año (v6.8.0).
+
+Las ventas anteriores a N meses, con sus items y logs, se mueven de la BD
+principal a `ventas_YYYY.db` en la misma carpeta. La BD principal queda chica
+para la caja, los backups y las busquedas del sync.
+
+Para leer un rango que llega a años archivados, `LecturaArchivo` abre una
+conexion aparte (sin pool), hace ATTACH de esos archivos y crea vistas TEMP
+`ventas`, `venta_items` y `venta_logs` (UNION ALL de main + archivos). En esa
+conexion las vistas TEMP tapan a las tablas de main, asi que las consultas
+ORM de VentaRepo funcionan sin cambios. Es de solo lectura: las ventas
+archivadas no se editan.
+
+`ventas_diarias` conserva los totales de lo archivado, por lo que las
+estadisticas por dia no necesitan abrir los archivos.
+
+Los backups ZIP llevan los archivos en `archivo/` (ARCHIVO_ZIP_DIR). Al
+restaurar una BD principal anterior al archivado, quitar_superpuestas()
+borra de los archivos lo que la principal ya tiene, para que las vistas
+no muestren ventas repetidas.
+"""
+import logging
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app import database
+from app.models import Base, Venta, VentaItem, VentaLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVO_PATRON = "ventas_{anio}.db"
+_ARCHIVO_RE = re.compile(r"^ventas_(\d{4})\.db$")
+ARCHIVO_ZIP_DIR = "archivo"   # carpeta de los archivos dentro del ZIP de backup
+
+# Orden de borrado: hijos antes que ventas
+TABLAS_ARCHIVO = (VentaLog.__table__, VentaItem.__table__, Venta.__table__)
+
+_engine = None
+_anios_cache = None
+
+
+def _engine_archivo():
+    """Engine sin pool sobre la BD principal: cerrar la conexion descarta ATTACH y vistas TEMP."""
+    global _engine
+    if _engine is None or _engine.url != database.engine.url:
+        _engine = create_engine(database.engine.url, poolclass=NullPool,
+                                connect_args={'check_same_thread': False})
+        event.listen(_engine, 'connect', database._set_pragmas)
+    return _engine
+
+
+def carpeta() -> Path:
+    return Path(database.engine.url.database).parent
+
+
+def ruta(anio: int) -> Path:
+    return carpeta() / ARCHIVO_PATRON.format(anio=int(anio))
+
+
+def _esquema(anio: int) -> str:
+    return f"arch_{int(anio)}"
+
+
+def anios_archivados() -> list:
+    """Años con archivo `ventas_YYYY.db` en la carpeta de la BD (cacheado por proceso)."""
+    global _anios_cache
+    if _anios_cache is None:
+        try:
+            _anios_cache = sorted(int(m.group(1)) for p in carpeta().iterdir()
+                                  if (m := _ARCHIVO_RE.match(p.name)))
+        except OSError:
+            _anios_cache = []
+    return list(_anios_cache)
+
+
+def archivos_en(carpeta_bd) -> list:
+    """Rutas de los `ventas_YYYY.db` de una carpeta, por año (para los backups)."""
+    try:
+        return sorted(p for p in Path(carpeta_bd).iterdir() if _ARCHIVO_RE.match(p.name))
+    except OSError:
+        return []
+
+
+def es_archivo(nombre: str) -> bool:
+    return _ARCHIVO_RE.match(Path(nombre).name) is not None
+
+
+def anios_en_rango(desde, hasta) -> list:
+    """Años archivados que se superponen con [desde, hasta] (date o datetime)."""
+    anios = anios_archivados()
+    if not anios:
+        return []
+    d = desde.year if desde is not None else anios[0]
+    h = hasta.year if hasta is not None else anios[-1]
+    return [a for a in anios if d <= a <= h]
+
+
+def _columnas(tabla) -> str:
+    return ", ".join(c.name for c in tabla.columns)
+
+
+def _adjuntar(conn, anio: int) -> str:
+    esq = _esquema(anio)
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {esq}", (str(ruta(anio)),))
+    return esq
+
+
+# ─── Lectura transparente ────────────────────────────────────────────
+
+class LecturaArchivo:
+    """Sesion de solo lectura que ve la BD principal + los archivos de `anios`.
+
+    Llamar a cerrar() al terminar (cierra la conexion dedicada).
+    """
+
+    def __init__(self, anios):
+        self.anios = sorted(anios)
+        self.conn = _engine_archivo().connect()
+        try:
+            esquemas = [_adjuntar(self.conn, a) for a in self.anios]
+            for tabla in TABLAS_ARCHIVO:
+                cols = _columnas(tabla)
+                partes = [f"SELECT {cols} FROM main.{tabla.name}"]
+                partes += [f"SELECT {cols} FROM {esq}.{tabla.name}" for esq in esquemas]
+                self.conn.exec_driver_sql(
+                    f"CREATE TEMP VIEW {tabla.name} AS " + " UNION ALL ".join(partes))
+        except Exception:
+            self.conn.close()
+            raise
+        self.session = Session(bind=self.conn)
+
+    def cerrar(self):
+        try:
+            self.session.close()
+        finally:
+            self.conn.close()
+
+
+def abrir_lectura(desde, hasta):
+    """LecturaArchivo si el rango llega a años archivados; None si alcanza con la BD principal."""
+    anios = anios_en_rango(desde, hasta)
+    if not anios:
+        return None
+    try:
+        return LecturaArchivo(anios)
+    except Exception as e:
+        logger.warning("[ARCHIVO] No se pudieron adjuntar %s, se lee solo la BD principal: %s", anios, e)
+        return None
+
+
+# ─── Archivado ───────────────────────────────────────────────────────
+
+def _corte(meses: int) -> datetime:
+    """Primer dia del mes, `meses` meses antes del mes actual."""
+    hoy = datetime.now()
+    total = hoy.year * 12 + (hoy.month - 1) - int(meses)
+    return datetime(total // 12, total % 12 + 1, 1)
+
+
+# La venta con el mayor id (y las duenas del mayor item/log) quedan siempre en
+# main: SQLite asigna max(rowid)+1, asi un id archivado nunca se reutiliza y
+# las vistas UNION ALL no repiten claves.
+_SELECCION = """CREATE TEMP TABLE _archivar AS
+    SELECT id FROM main.ventas
+    WHERE fecha < :corte AND strftime('%Y', fecha) = :anio
+      AND id NOT IN (
+        COALESCE((SELECT MAX(id) FROM main.ventas), -1),
+        COALESCE((SELECT venta_id FROM main.venta_items
+                  WHERE id = (SELECT MAX(id) FROM main.venta_items)), -1),
+        COALESCE((SELECT venta_id FROM main.venta_logs
+                  WHERE id = (SELECT MAX(id) FROM main.venta_logs)), -1))"""
+
+
+def _archivar_anio(conn, anio: int, corte: str) -> int:
+    """Copia y luego borra de main las ventas de `anio` anteriores a `corte`.
+
+    Son dos transacciones: en WAL un commit sobre varias BDs adjuntas no es
+    atomico entre archivos. Si se corta entre ambas quedan filas duplicadas
+    (nunca perdidas) y la proxima corrida las limpia (INSERT OR REPLACE).
+    """
+    esq = _adjuntar(conn, anio)
+    try:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        Base.metadata.create_all(conn.execution_options(schema_translate_map={None: esq}),
+                                 tables=list(TABLAS_ARCHIVO))
+        conn.execution_options(schema_translate_map=None)
+        conn.execute(text("DROP TABLE IF EXISTS temp._archivar"))
+        conn.execute(text(_SELECCION), {"corte": corte, "anio": f"{int(anio):04d}"})
+        n = conn.execute(text("SELECT COUNT(*) FROM temp._archivar")).scalar() or 0
+        if not n:
+            conn.rollback()
+            return 0
+        for tabla in reversed(TABLAS_ARCHIVO):
+            col = "id" if tabla.name == "ventas" else "venta_id"
+            cols = _columnas(tabla)
+            conn.execute(text(
+                f"INSERT OR REPLACE INTO {esq}.{tabla.name} ({cols}) "
+                f"SELECT {cols} FROM main.{tabla.name} WHERE {col} IN (SELECT id FROM temp._archivar)"))
+        conn.commit()
+
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        con_resumen = conn.execute(text(
+            "SELECT 1 FROM main.sqlite_master WHERE type='trigger' AND name=:n"
+        ), {"n": f"{database.VENTAS_DIARIAS_TABLE}_ad"}).first() is not None
+        if con_resumen:
+            # Los triggers descuentan lo borrado de ventas_diarias; se guarda el
+            # aporte antes de borrar y se vuelve a sumar (los totales historicos
+            # siguen en el resumen).
+            conn.execute(text("DROP TABLE IF EXISTS temp._archivar_vd"))
+            conn.execute(text(
+                "CREATE TEMP TABLE _archivar_vd AS "
+                "SELECT sucursal, date(fecha) AS fecha, modo_pago, "
+                f"{database._VD_CAE.format(r='ventas')} AS con_cae, COUNT(*) AS cantidad, "
+                "COALESCE(SUM(total), 0) AS total, COALESCE(SUM(interes_monto), 0) AS interes "
+                "FROM main.ventas WHERE id IN (SELECT id FROM temp._archivar) GROUP BY 1, 2, 3, 4"))
+        for tabla in TABLAS_ARCHIVO:
+            conn.execute(text(
+                f"DELETE FROM main.{tabla.name} WHERE id IN (SELECT id FROM {esq}.{tabla.name}) "
+                + ("AND id IN (SELECT id FROM temp._archivar)" if tabla.name == "ventas"
+                   else "AND venta_id IN (SELECT id FROM temp._archivar)")))
+        if con_resumen:
+            conn.execute(text(
+                f"INSERT INTO main.{database.VENTAS_DIARIAS_TABLE} "
+                "(sucursal, fecha, modo_pago, con_cae, cantidad, total, interes) "
+                "SELECT sucursal, fecha, modo_pago, con_cae, cantidad, total, interes "
+                "FROM temp._archivar_vd WHERE true "
+                "ON CONFLICT (sucursal, fecha, modo_pago, con_cae) DO UPDATE SET "
+                "cantidad = cantidad + excluded.cantidad, total = total + excluded.total, "
+                "interes = interes + excluded.interes"))
+            conn.execute(text("DROP TABLE temp._archivar_vd"))
+        conn.execute(text("DROP TABLE temp._archivar"))
+        conn.commit()
+        return int(n)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.exec_driver_sql(f"DETACH DATABASE {esq}")
+
+
+def archivar_anteriores_a(meses: int = 12) -> dict:
+    """Mueve a `ventas_YYYY.db` las ventas (con items y logs) anteriores a `meses`
+    meses (cortando a principio de mes). Retorna {anio: ventas_movidas}."""
+    global _anios_cache
+    import time
+    t0 = time.perf_counter()
+    corte = _corte(meses).strftime("%Y-%m-%d %H:%M:%S")
+    movidas = {}
+    with _engine_archivo().connect() as conn:
+        anios = [int(r[0]) for r in conn.execute(text(
+            "SELECT DISTINCT strftime('%Y', fecha) FROM main.ventas WHERE fecha < :c"
+        ), {"c": corte}).fetchall() if r[0]]
+        conn.rollback()
+        for anio in anios:
+            n = _archivar_anio(conn, anio, corte)
+            if n:
+                movidas[anio] = n
+    _anios_cache = None
+    if movidas:
+        logger.info("[ARCHIVO] Ventas anteriores a %s archivadas: %s (%.1f ms)",
+                    corte[:10], movidas, (time.perf_counter() - t0) * 1000.0)
+    return movidas
+
+
+def quitar_superpuestas(db_path) -> dict:
+    """Borra de los archivos las ventas (con items y logs) que tambien estan en la
+    BD principal `db_path`. Pasa al restaurar una BD de antes de un archivado: la
+    principal manda y el proximo archivado las vuelve a mover. Retorna {anio: ventas}.
+    """
+    global _anios_cache
+    quitadas = {}
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        for archivo in archivos_en(Path(db_path).parent):
+            anio = int(_ARCHIVO_RE.match(archivo.name).group(1))
+            esq = _esquema(anio)
+            conn.execute(f"ATTACH DATABASE ? AS {esq}", (str(archivo),))
+            try:
+                if conn.execute(f"SELECT 1 FROM {esq}.sqlite_master WHERE type='table' AND name='ventas'"
+                                ).fetchone() is None:
+                    continue
+                repetidas = f"SELECT id FROM {esq}.ventas WHERE id IN (SELECT id FROM main.ventas)"
+                n = conn.execute(f"SELECT COUNT(*) FROM ({repetidas})").fetchone()[0]
+                if not n:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                for tabla in TABLAS_ARCHIVO:
+                    col = "id" if tabla.name == "ventas" else "venta_id"
+                    conn.execute(f"DELETE FROM {esq}.{tabla.name} WHERE {col} IN ({repetidas})")
+                conn.execute("COMMIT")
+                quitadas[anio] = n
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.execute(f"DETACH DATABASE {esq}")
+    finally:
+        conn.close()
+    _anios_cache = None
+    if quitadas:
+        logger.warning("[ARCHIVO] Ventas que estaban en la BD principal y en el archivo "
+                       "(se dejan en la principal): %s", quitadas)
+    return quitadas
@@ -0,0 +1,167 @@
+# app/session_manager.py
+"""
+Sesiones para hilos de fondo (v6.8.0).
+
+La sesion de la GUI (`self.session`, SessionLocal) es solo del hilo de Qt.
+Los hilos de fondo (sync, push a Firebase, force pull) usan este modulo:
+
+  - lectura():      sesion de un pool chico de conexiones de solo lectura
+                    (PRAGMA query_only). En WAL leen sin bloquear a nadie.
+  - escribir(fn):   trabajo de escritura serializado por una cola y ejecutado
+                    por un unico hilo escritor con su propia conexion.
+                    fn(session) corre en ese hilo; al terminar se hace commit
+                    (rollback si lanza) y se devuelve el resultado.
+  - enviar(fn):     igual que escribir() pero devuelve un Future sin esperar.
+
+Asi dos escritores de fondo nunca compiten por el lock de SQLite; la unica
+contencion que queda es contra la sesion de la GUI.
+
+Uso:
+    from app.session_manager import SessionManager
+    with SessionManager.get_instance().lectura() as s:
+        venta = s.get(Venta, venta_id)
+    r = SessionManager.get_instance().escribir(
+        lambda s: FirebaseSyncManager(s, suc).ejecutar_sincronizacion_completa())
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import database
+
+logger = logging.getLogger(__name__)
+
+# Singleton
+_instance = None
+_instance_lock = threading.Lock()
+
+READ_POOL_SIZE = 4
+WRITER_BUSY_TIMEOUT_MS = 30000
+
+
+class SessionManager:
+    """Pool de lectores + un escritor serializado sobre la BD de la app."""
+
+    def __init__(self, url=None, lectores: int = READ_POOL_SIZE):
+        url = url or database.engine.url
+        self._read_engine = create_engine(
+            url, pool_size=lectores, max_overflow=0, pool_timeout=30,
+            connect_args={'check_same_thread': False})
+        event.listen(self._read_engine, 'connect', self._pragmas_lectura)
+        self._write_engine = create_engine(
+            url, pool_size=1, max_overflow=0,
+            connect_args={'check_same_thread': False})
+        event.listen(self._write_engine, 'connect', self._pragmas_escritor)
+
+        self._read_session = sessionmaker(bind=self._read_engine, expire_on_commit=False)
+        self._write_session = sessionmaker(bind=self._write_engine, expire_on_commit=False)
+
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._sesion_escritor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "SessionManager":
+        """Retorna la instancia singleton (sobre la BD de app.database)."""
+        global _instance
+        with _instance_lock:
+            if _instance is None:
+                _instance = cls()
+            return _instance
+
+    @staticmethod
+    def _pragmas_lectura(dbapi_connection, connection_record):
+        database._set_pragmas(dbapi_connection, connection_record)
+        cur = dbapi_connection.cursor()
+        try:
+            cur.execute('PRAGMA query_only=1;')
+        finally:
+            cur.close()
+
+    @staticmethod
+    def _pragmas_escritor(dbapi_connection, connection_record):
+        database._set_pragmas(dbapi_connection, connection_record)
+        cur = dbapi_connection.cursor()
+        try:
+            cur.execute(f'PRAGMA busy_timeout={WRITER_BUSY_TIMEOUT_MS};')
+        finally:
+            cur.close()
+
+    # ─── Lectores ────────────────────────────────────────────────────
+
+    @contextmanager
+    def lectura(self):
+        """Sesion de solo lectura del pool (se cierra al salir del with)."""
+        session = self._read_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    # ─── Escritor ────────────────────────────────────────────────────
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._loop, name="DBWriter", daemon=True)
+                self._hilo.start()
+
+    def _loop(self):
+        while True:
+            trabajo = self._cola.get()
+            if trabajo is None:
+                return
+            fn, fut = trabajo
+            if not fut.set_running_or_notify_cancel():
+                continue
+            session = self._write_session()
+            self._sesion_escritor = session
+            try:
+                resultado = fn(session)
+                session.commit()
+                fut.set_result(resultado)
+            except BaseException as e:
+                try:
+                    session.rollback()
+                except Exception:
+                    pass
+                logger.warning("[DB WRITER] Trabajo fallo: %s", e)
+                fut.set_exception(e)
+            finally:
+                self._sesion_escritor = None
+                session.close()
+
+    def enviar(self, fn) -> Future:
+        """Encola fn(session) para el hilo escritor y devuelve un Future."""
+        fut = Future()
+        if threading.current_thread() is self._hilo:
+            # Llamada anidada desde un trabajo: correr con la misma sesion
+            # (encolarla esperaria a que termine el trabajo actual)
+            try:
+                fut.set_result(fn(self._sesion_escritor))
+            except BaseException as e:
+                fut.set_exception(e)
+            return fut
+        self._asegurar_hilo()
+        self._cola.put((fn, fut))
+        return fut
+
+    def escribir(self, fn, timeout=None):
+        """Ejecuta fn(session) en el hilo escritor y espera el resultado (re-lanza errores)."""
+        return self.enviar(fn).result(timeout)
+
+    def cerrar(self, timeout: float = 5.0):
+        """Termina el hilo escritor (despues de los trabajos encolados) y cierra los pools."""
+        hilo = self._hilo
+        if hilo is not None and hilo.is_alive():
+            self._cola.put(None)
+            hilo.join(timeout)
+        self._read_engine.dispose()
+        self._write_engine.dispose()
+
@@ -0,0 +1,544 @@
+# app/sync_state.py
+"""
+Estado local de la sincronizacion en un SQLite aparte (v6.8.0).
+
+`sync_state.db` vive en la carpeta de datos de la app, separado de la BD
+principal: no viaja en los backups ZIP ni se archiva, y se puede borrar sin
+tocar ventas ni productos.
+
+Cola offline (tabla `offline_queue`):
+  - encolar():    un INSERT (O(1)), en vez de leer y reescribir todo
+                  sync_queue.json por cada venta hecha sin internet;
+  - pendientes(): cambios en orden de llegada, con su id;
+  - confirmar():  borra por id solo lo que Firebase acepto (ack). Lo que se
+                  encola mientras se envia no se pierde;
+  - compactar():  recorta al maximo MAX_QUEUE_SIZE y devuelve el espacio
+                  libre al disco (checkpoint + VACUUM) cuando la cola queda vacia.
+
+Durabilidad: WAL con synchronous=NORMAL. Cada encolar() queda en el WAL (no
+se pierde si la app se cierra de golpe); los fsync se agrupan en los
+checkpoints en lugar de hacerse por cambio.
+
+Marcas de push (tabla `push_marcas`): hasta donde llego el ultimo
+push_all_existing exitoso de cada tipo ("last_modified|id", con el texto
+guardado, o id), para que un
+resync suba solo lo nuevo o modificado desde entonces.
+
+Contabilidad del pull (antes en app_config.json y en tres archivos sueltos):
+  - `pull_cursores`:       ultimo push key procesado por tipo;
+  - `pull_fallos`:         cuantas veces fallo cada (tipo, push key). El pull
+                           los junta en memoria y los escribe una vez por pagina
+                           (guardar_fallos_pull), no en cada cambio aplicado;
+  - `pull_saltados`:       cambios salteados tras MAX_RETRIES fallos;
+  - `borrados_pendientes`: bajas de productos esperando confirmacion en la UI.
+
+Resumenes del dashboard (tabla `resumenes_publicados`): firma de cada dia
+publicado en resumenes/ por sucursal, para reenviar solo los que cambian
+aunque cada sync use un FirebaseSyncManager nuevo.
+
+Telemetria (tabla `sync_runs`): una fila por ejecutar_sincronizacion_completa
+con duracion, requests, bytes, reintentos y esperas por BD bloqueada, mas el
+detalle por fase en JSON. Se guardan las ultimas MAX_CORRIDAS.
+
+La primera vez que se abre importa los archivos heredados (sync_queue.json,
+sync_fail_counter.json, sync_pending_deletes.json y logs/sync_skipped.log)
+y los borra.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.config import _get_app_data_dir
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = "sync_state.db"
+LEGACY_QUEUE_FILENAME = "sync_queue.json"
+LEGACY_FAIL_COUNTER_FILENAME = "sync_fail_counter.json"
+LEGACY_PENDING_DELETES_FILENAME = "sync_pending_deletes.json"
+LEGACY_SKIPPED_LOG = os.path.join("logs", "sync_skipped.log")
+MAX_QUEUE_SIZE = 10000
+COMPACTAR_CADA = 500   # confirmaciones entre compactaciones automaticas
+MAX_CORRIDAS = 500     # filas de telemetria que se conservan
+MAX_SALTADOS = 5000    # filas de pull_saltados que se conservan
+MAX_BORRADOS_PENDIENTES = 500
+TIPOS_PULL = ("ventas", "productos", "proveedores", "pagos_proveedores", "compradores")
+
+# Singleton
+_instance = None
+_instance_lock = threading.Lock()
+
+_ESQUEMA = (
+    """CREATE TABLE IF NOT EXISTS offline_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        timestamp INTEGER NOT NULL,
+        payload TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_offline_queue_tipo ON offline_queue (tipo)",
+    """CREATE TABLE IF NOT EXISTS push_marcas (
+        tipo TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS pull_cursores (
+        tipo TEXT PRIMARY KEY,
+        push_key TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS pull_fallos (
+        tipo TEXT NOT NULL,
+        push_key TEXT NOT NULL,
+        fallos INTEGER NOT NULL,
+        PRIMARY KEY (tipo, push_key)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS pull_saltados (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        push_key TEXT NOT NULL,
+        fallos INTEGER NOT NULL DEFAULT 0,
+        linea TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_pull_saltados_tipo_key ON pull_saltados (tipo, push_key)",
+    """CREATE TABLE IF NOT EXISTS borrados_pendientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tipo TEXT NOT NULL,
+        clave TEXT NOT NULL,
+        origen TEXT,
+        timestamp INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        UNIQUE (tipo, clave)
+    )""",
+    """CREATE TABLE IF NOT EXISTS resumenes_publicados (
+        sucursal TEXT NOT NULL,
+        dia TEXT NOT NULL,
+        firma TEXT NOT NULL,
+        PRIMARY KEY (sucursal, dia)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS sync_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        inicio INTEGER NOT NULL,
+        sucursal TEXT,
+        duracion_ms REAL NOT NULL,
+        enviados INTEGER NOT NULL DEFAULT 0,
+        recibidos INTEGER NOT NULL DEFAULT 0,
+        errores INTEGER NOT NULL DEFAULT 0,
+        requests INTEGER NOT NULL DEFAULT 0,
+        bytes_out INTEGER NOT NULL DEFAULT 0,
+        bytes_in INTEGER NOT NULL DEFAULT 0,
+        reintentos INTEGER NOT NULL DEFAULT 0,
+        bloqueos_bd INTEGER NOT NULL DEFAULT 0,
+        espera_bd_ms REAL NOT NULL DEFAULT 0,
+        detalle TEXT NOT NULL
+    )""",
+)
+
+_COLUMNAS_CORRIDA = ("inicio", "sucursal", "duracion_ms", "enviados", "recibidos", "errores",
+                     "requests", "bytes_out", "bytes_in", "reintentos", "bloqueos_bd", "espera_bd_ms")
+
+
+def ruta() -> str:
+    return os.path.join(_get_app_data_dir(), STATE_FILENAME)
+
+
+def archivos() -> List[str]:
+    """Archivos en disco del estado de sync (para los resets de fabrica)."""
+    base = ruta()
+    carpeta = _get_app_data_dir()
+    return [base, base + "-wal", base + "-shm",
+            os.path.join(carpeta, LEGACY_QUEUE_FILENAME),
+            os.path.join(carpeta, LEGACY_FAIL_COUNTER_FILENAME),
+            os.path.join(carpeta, LEGACY_PENDING_DELETES_FILENAME),
+            os.path.join(carpeta, LEGACY_SKIPPED_LOG)]
+
+
+class SyncState:
+    """Conexion unica (protegida por lock) a sync_state.db."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or ruta()
+        self._lock = threading.Lock()
+        self._confirmados = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        for sql in _ESQUEMA:
+            self._conn.execute(sql)
+        carpeta = os.path.dirname(self.path)
+        self._importar_cola_json(os.path.join(carpeta, LEGACY_QUEUE_FILENAME))
+        self._importar_fallos_json(os.path.join(carpeta, LEGACY_FAIL_COUNTER_FILENAME))
+        self._importar_borrados_json(os.path.join(carpeta, LEGACY_PENDING_DELETES_FILENAME))
+        self._importar_saltados_log(os.path.join(carpeta, LEGACY_SKIPPED_LOG))
+
+    @classmethod
+    def get_instance(cls) -> "SyncState":
+        """Retorna la instancia singleton (sobre la carpeta de datos de la app)."""
+        global _instance
+        with _instance_lock:
+            if _instance is None:
+                _instance = cls()
+            return _instance
+
+    def cerrar(self):
+        global _instance
+        with self._lock:
+            self._conn.close()
+        with _instance_lock:
+            if _instance is self:
+                _instance = None
+
+    def _importar_cola_json(self, path: str):
+        """Pasa a la tabla los cambios de un sync_queue.json heredado (<= v6.7)."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            cambios = [c for c in (data if isinstance(data, list) else []) if isinstance(c, dict)]
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT INTO offline_queue (tipo, timestamp, payload) VALUES (?, ?, ?)",
+                    [(c.get("tipo") or "?", int(c.get("timestamp") or 0),
+                      json.dumps(c, ensure_ascii=False)) for c in cambios])
+                self._conn.execute("COMMIT")
+            os.remove(path)
+            logger.info("[SYNC STATE] %d cambios importados de %s", len(cambios), path)
+        except Exception as e:
+            logger.warning("[SYNC STATE] No se pudo importar %s: %s", path, e)
+
+    def _importar_fallos_json(self, path: str):
+        """sync_fail_counter.json ({tipo: {push_key: n}}) -> pull_fallos."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f) or {}
+            filas = [(tipo, key, int(n)) for tipo, bucket in data.items() if isinstance(bucket, dict)
+                     for key, n in bucket.items()]
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO pull_fallos (tipo, push_key, fallos) VALUES (?, ?, ?)", filas)
+                self._conn.execute("COMMIT")
+            os.remove(path)
+            logger.info("[SYNC STATE] %d contadores de fallos importados de %s", len(filas), path)
+        except Exception as e:
+            logger.warning("[SYNC STATE] No se pudo importar %s: %s", path, e)
+
+    def _importar_borrados_json(self, path: str):
+        """sync_pending_deletes.json (lista de {tipo, origen, timestamp, data}) -> borrados_pendientes."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            items = [it for it in (data if isinstance(data, list) else []) if isinstance(it, dict)]
+            for it in items:
+                self.agregar_borrado_pendiente(it.get("tipo") or "?", it.get("data") or {},
+                                               it.get("origen") or "", it.get("timestamp"))
+            os.remove(path)
+            logger.info("[SYNC STATE] %d borrados pendientes importados de %s", len(items), path)
+        except Exception as e:
+            logger.warning("[SYNC STATE] No se pudo importar %s: %s", path, e)
+
+    def _importar_saltados_log(self, path: str):
+        """logs/sync_skipped.log (una linea por cambio salteado) -> pull_saltados."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lineas = [ln.rstrip() for ln in f if ln.strip()]
+            filas = []
+            for ln in lineas[-MAX_SALTADOS:]:
+                m = re.search(r"SKIP (\w+)/(\S+) .*fallos=(\d+)", ln)
+                tipo, key, fallos = m.groups() if m else ("?", "?", 0)
+                filas.append((0, tipo, key, int(fallos), ln))
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "INSERT INTO pull_saltados (ts, tipo, push_key, fallos, linea) VALUES (?, ?, ?, ?, ?)",
+                    filas)
+                self._conn.execute("COMMIT")
+            os.remove(path)
+            logger.info("[SYNC STATE] %d items salteados importados de %s", len(filas), path)
+        except Exception as e:
+            logger.warning("[SYNC STATE] No se pudo importar %s: %s", path, e)
+
+    # ─── Cola offline ────────────────────────────────────────────────
+
+    def encolar(self, cambio: dict) -> int:
+        """Agrega un cambio al final de la cola. Retorna su id."""
+        payload = json.dumps(cambio, ensure_ascii=False)
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO offline_queue (tipo, timestamp, payload) VALUES (?, ?, ?)",
+                (cambio.get("tipo") or "?", int(cambio.get("timestamp") or 0), payload))
+            return cur.lastrowid
+
+    def pendientes(self, limite: Optional[int] = None) -> List[Tuple[int, dict]]:
+        """[(id, cambio)] en orden de llegada."""
+        sql = "SELECT id, payload FROM offline_queue ORDER BY id"
+        args = ()
+        if limite:
+            sql += " LIMIT ?"
+            args = (int(limite),)
+        with self._lock:
+            filas = self._conn.execute(sql, args).fetchall()
+        out = []
+        for id_, payload in filas:
+            try:
+                out.append((id_, json.loads(payload)))
+            except ValueError:
+                logger.warning("[SYNC STATE] Cambio %s ilegible en la cola, se descarta", id_)
+                self.confirmar([id_])
+        return out
+
+    def confirmar(self, ids) -> int:
+        """Borra de la cola los cambios ya aceptados por Firebase (ack)."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for i in range(0, len(ids), 900):
+                lote = ids[i:i + 900]
+                self._conn.execute(
+                    f"DELETE FROM offline_queue WHERE id IN ({','.join('?' * len(lote))})", lote)
+            self._conn.execute("COMMIT")
+            self._confirmados += len(ids)
+            compactar = self._confirmados >= COMPACTAR_CADA
+        if compactar:
+            self.compactar()
+        return len(ids)
+
+    def contar(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM offline_queue").fetchone()[0]
+
+    def contar_por_tipo(self) -> Dict[str, int]:
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT tipo, COUNT(*) FROM offline_queue GROUP BY tipo").fetchall()
+        return {t: n for t, n in filas}
+
+    def vaciar(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM offline_queue")
+
+    def compactar(self):
+        """Recorta la cola a MAX_QUEUE_SIZE (descarta lo mas viejo, como la cola JSON)
+        y, si quedo vacia, devuelve el espacio al disco."""
+        with self._lock:
+            self._confirmados = 0
+            cur = self._conn.execute(
+                "DELETE FROM offline_queue WHERE id <= ("
+                "  SELECT id FROM offline_queue ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (MAX_QUEUE_SIZE,))
+            if cur.rowcount:
+                logger.warning("[SYNC STATE] Cola offline llena: %d cambios viejos descartados", cur.rowcount)
+            vacia = self._conn.execute("SELECT 1 FROM offline_queue LIMIT 1").fetchone() is None
+            libres = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if vacia and libres:
+                self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # ─── Marcas de push ──────────────────────────────────────────────
+
+    def marca_push(self, tipo: str) -> Optional[str]:
+        """Ultimo valor (last_modified ISO o id) subido con exito para `tipo`."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT valor FROM push_marcas WHERE tipo = ?", (tipo,)).fetchone()
+        return fila[0] if fila else None
+
+    def guardar_marca_push(self, tipo: str, valor: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO push_marcas (tipo, valor) VALUES (?, ?) "
+                "ON CONFLICT(tipo) DO UPDATE SET valor = excluded.valor", (tipo, str(valor)))
+
+    def borrar_marcas_push(self, tipos=None):
+        """Olvida las marcas (todas o las de `tipos`): el proximo push sube todo."""
+        with self._lock:
+            if tipos is None:
+                self._conn.execute("DELETE FROM push_marcas")
+            else:
+                self._conn.executemany(
+                    "DELETE FROM push_marcas WHERE tipo = ?", [(t,) for t in tipos])
+
+    # ─── Cursores y fallos del pull ──────────────────────────────────
+
+    def cursores_pull(self) -> Optional[Dict[str, Optional[str]]]:
+        """{tipo: ultimo push key} o None si nunca se guardaron (hay que migrar
+        los de app_config.json, ver FirebaseSyncManager._get_last_processed_keys)."""
+        with self._lock:
+            filas = self._conn.execute("SELECT tipo, push_key FROM pull_cursores").fetchall()
+        if not filas:
+            return None
+        cursores = {t: None for t in TIPOS_PULL}
+        cursores.update(dict(filas))
+        return cursores
+
+    def guardar_cursores_pull(self, cursores: Dict[str, Optional[str]]):
+        """Guarda los cursores dados (None = desde el principio)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO pull_cursores (tipo, push_key) VALUES (?, ?) "
+                "ON CONFLICT(tipo) DO UPDATE SET push_key = excluded.push_key",
+                list(cursores.items()))
+            self._conn.execute("COMMIT")
+
+    def reiniciar_pull(self, fallos: bool = True):
+        """Todos los cursores a None (el proximo pull baja todo) y, si `fallos`,
+        olvida los contadores de fallos."""
+        self.guardar_cursores_pull({t: None for t in TIPOS_PULL})
+        if fallos:
+            with self._lock:
+                self._conn.execute("DELETE FROM pull_fallos")
+
+    def fallos_pull(self, tipo: str) -> Dict[str, int]:
+        """{push_key: fallos} de un tipo (el pull los carga una vez al empezar)."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT push_key, fallos FROM pull_fallos WHERE tipo = ?", (tipo,)).fetchall()
+        return dict(filas)
+
+    def guardar_fallos_pull(self, tipo: str, fallos: Dict[str, int], borrar=(),
+                            saltados: List[Tuple[str, int, str]] = ()):
+        """Escribe en una transaccion lo que junto una pagina del pull: contadores
+        nuevos o incrementados, contadores a borrar y salteados [(push_key, fallos, linea)]."""
+        if not (fallos or borrar or saltados):
+            return
+        ahora = int(time.time() * 1000)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO pull_fallos (tipo, push_key, fallos) VALUES (?, ?, ?) "
+                "ON CONFLICT(tipo, push_key) DO UPDATE SET fallos = excluded.fallos",
+                [(tipo, k, n) for k, n in fallos.items()])
+            self._conn.executemany(
+                "DELETE FROM pull_fallos WHERE tipo = ? AND push_key = ?", [(tipo, k) for k in borrar])
+            if saltados:
+                self._conn.executemany(
+                    "INSERT INTO pull_saltados (ts, tipo, push_key, fallos, linea) VALUES (?, ?, ?, ?, ?)",
+                    [(ahora, tipo, k, n, linea) for k, n, linea in saltados])
+                self._conn.execute(
+                    "DELETE FROM pull_saltados WHERE id <= ("
+                    "  SELECT id FROM pull_saltados ORDER BY id DESC LIMIT 1 OFFSET ?)", (MAX_SALTADOS,))
+            self._conn.execute("COMMIT")
+
+    def saltados(self, limite: int = 200) -> List[str]:
+        """Ultimas `limite` lineas de cambios salteados, de la mas vieja a la mas nueva."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT linea FROM pull_saltados ORDER BY id DESC LIMIT ?", (int(limite),)).fetchall()
+        return [f[0] for f in reversed(filas)]
+
+    # ─── Borrados pendientes de confirmacion ─────────────────────────
+
+    def agregar_borrado_pendiente(self, tipo: str, data: dict, origen: str = "",
+                                  timestamp: Optional[int] = None) -> bool:
+        """Encola una baja recibida por sync. False si ya habia una para la misma entidad."""
+        clave = str(data.get("codigo_barra") or data.get("nombre") or data.get("cuit") or "")
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO borrados_pendientes (tipo, clave, origen, timestamp, data) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (tipo, clave, origen, int(timestamp or time.time() * 1000),
+                 json.dumps(data, ensure_ascii=False)))
+            self._conn.execute(
+                "DELETE FROM borrados_pendientes WHERE id <= ("
+                "  SELECT id FROM borrados_pendientes ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (MAX_BORRADOS_PENDIENTES,))
+            return cur.rowcount > 0
+
+    def borrados_pendientes(self) -> List[dict]:
+        """[{id, tipo, origen, timestamp, data}] en orden de llegada."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, tipo, origen, timestamp, data FROM borrados_pendientes ORDER BY id").fetchall()
+        out = []
+        for id_, tipo, origen, ts, data in filas:
+            try:
+                data = json.loads(data)
+            except ValueError:
+                data = {}
+            out.append({"id": id_, "tipo": tipo, "origen": origen, "timestamp": ts, "data": data})
+        return out
+
+    def quitar_borrado_pendiente(self, id_: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM borrados_pendientes WHERE id = ?", (int(id_),))
+
+    # ─── Resumenes publicados ────────────────────────────────────────
+
+    def firmas_resumen(self, sucursal: str) -> Dict[str, str]:
+        """{dia: firma} de los resumenes publicados de `sucursal`."""
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT dia, firma FROM resumenes_publicados WHERE sucursal = ?", (sucursal,)).fetchall()
+        return dict(filas)
+
+    def guardar_firmas_resumen(self, sucursal: str, firmas: Dict[str, Optional[str]],
+                               antes_de: Optional[str] = None):
+        """Guarda las firmas dadas (None = el dia se borro de Firebase) y olvida
+        las de dias anteriores a `antes_de` (fuera de la ventana publicada)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO resumenes_publicados (sucursal, dia, firma) VALUES (?, ?, ?) "
+                "ON CONFLICT(sucursal, dia) DO UPDATE SET firma = excluded.firma",
+                [(sucursal, d, f) for d, f in firmas.items() if f is not None])
+            self._conn.executemany(
+                "DELETE FROM resumenes_publicados WHERE sucursal = ? AND dia = ?",
+                [(sucursal, d) for d, f in firmas.items() if f is None])
+            if antes_de:
+                self._conn.execute(
+                    "DELETE FROM resumenes_publicados WHERE sucursal = ? AND dia < ?", (sucursal, antes_de))
+            self._conn.execute("COMMIT")
+
+    def borrar_firmas_resumen(self):
+        """Olvida lo publicado: la proxima sync reenvia todos los dias."""
+        with self._lock:
+            self._conn.execute("DELETE FROM resumenes_publicados")
+
+    # ─── Telemetria ──────────────────────────────────────────────────
+
+    def registrar_corrida(self, corrida: dict) -> int:
+        """Guarda las metricas de una sync (columnas de _COLUMNAS_CORRIDA; el
+        resto va a `detalle`) y recorta a MAX_CORRIDAS. Retorna el id."""
+        valores = [corrida.get(c) or 0 for c in _COLUMNAS_CORRIDA]
+        valores[1] = corrida.get("sucursal")
+        detalle = {k: v for k, v in corrida.items() if k not in _COLUMNAS_CORRIDA}
+        with self._lock:
+            cur = self._conn.execute(
+                f"INSERT INTO sync_runs ({', '.join(_COLUMNAS_CORRIDA)}, detalle) "
+                f"VALUES ({', '.join('?' * len(_COLUMNAS_CORRIDA))}, ?)",
+                (*valores, json.dumps(detalle, ensure_ascii=False)))
+            self._conn.execute(
+                "DELETE FROM sync_runs WHERE id <= ("
+                "  SELECT id FROM sync_runs ORDER BY id DESC LIMIT 1 OFFSET ?)", (MAX_CORRIDAS,))
+            return cur.lastrowid
+
+    def corridas(self, limite: int = 50) -> List[dict]:
+        """Ultimas `limite` corridas, de la mas nueva a la mas vieja."""
+        with self._lock:
+            filas = self._conn.execute(
+                f"SELECT id, {', '.join(_COLUMNAS_CORRIDA)}, detalle FROM sync_runs "
+                "ORDER BY id DESC LIMIT ?", (int(limite),)).fetchall()
+        out = []
+        for fila in filas:
+            corrida = dict(zip(("id",) + _COLUMNAS_CORRIDA, fila[:-1]))
+            try:
+                corrida.update(json.loads(fila[-1]))
+            except ValueError:
+                pass
+            out.append(corrida)
+        return out
@@ -0,0 +1,98 @@
+# benchmarks/bench_buscar_productos.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark de prod_repo.buscar: camino FTS5 (trigram) vs. camino LIKE previo,
+y de ProductCatalogIndex.buscar (indice en memoria, prefijos por lista invertida).
+
+Crea una BD SQLite temporal con N productos sinteticos, aplica la migracion FTS5
+(database._ensure_productos_fts) y mide el tiempo medio por busqueda para un set
+de consultas tipicas del buscador de Productos.
+
+Uso:
+    python benchmarks/bench_buscar_productos.py            # 10k y 100k filas
+    python benchmarks/bench_buscar_productos.py 50000      # tamaño custom
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import Base  # noqa: E402
+from app.database import _ensure_productos_fts  # noqa: E402
+import app.repository as repo_mod  # noqa: E402
+from app.catalog_index import ProductCatalogIndex  # noqa: E402
+
+MARCAS = ["kevin", "dove", "rexona", "axe", "nivea", "colgate", "sedal", "pantene",
+          "lux", "palmolive", "coca", "pepsi", "fanta", "sprite", "quilmes", "arcor"]
+TIPOS = ["desodorante", "shampoo", "jabon", "crema", "gaseosa", "cerveza", "galletitas",
+         "alfajor", "pasta dental", "acondicionador", "caramelos", "chocolate"]
+CATEGORIAS = ["perfumeria", "bebidas", "almacen", "golosinas", "limpieza", "higiene"]
+CONSULTAS = ["kevin", "kevin deo", "shampoo 400", "choco", "colg,dental", "7790", "250", "gaseosa coca"]
+REPETICIONES = 20
+
+
+def _poblar(engine, n: int) -> None:
+    rnd = random.Random(42)
+    rows = []
+    for i in range(n):
+        rows.append({
+            "codigo_barra": f"779{i:010d}",
+            "nombre": f"{rnd.choice(MARCAS)} {rnd.choice(TIPOS)} {rnd.choice([90, 150, 250, 400, 1000])}",
+            "precio": round(rnd.uniform(100, 9000), 2),
+            "categoria": rnd.choice(CATEGORIAS),
+            "version": 1,
+        })
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO productos (codigo_barra, nombre, precio, categoria, version) "
+            "VALUES (:codigo_barra, :nombre, :precio, :categoria, :version)"), rows)
+        _ensure_productos_fts(conn)
+
+
+def _medir(fn, consulta: str) -> float:
+    t0 = time.perf_counter()
+    for _ in range(REPETICIONES):
+        fn(consulta)
+    return (time.perf_counter() - t0) * 1000.0 / REPETICIONES
+
+
+def correr(n: int) -> None:
+    tmpdir = tempfile.mkdtemp(prefix="bench_fts_")
+    engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    _poblar(engine, n)
+    session = sessionmaker(bind=engine)()
+    repo_mod._FTS_OK = None
+    repo = repo_mod.prod_repo(session)
+    idx = ProductCatalogIndex()
+    idx.cargar(repo)
+
+    def like(q):
+        import re
+        terminos = [t.strip() for t in re.split(r'[,\s]+', q) if t.strip()]
+        return repo._buscar_like(terminos)
+
+    print(f"\n=== {n:,} productos ===")
+    print(f"{'consulta':<18}{'LIKE ms':>10}{'FTS5 ms':>10}{'x':>8}{'filas':>8}{'indice ms':>11}{'filas':>8}")
+    for c in CONSULTAS:
+        ms_like = _medir(like, c)
+        ms_fts = _medir(repo.buscar, c)
+        filas = len(repo.buscar(c))
+        ms_idx = _medir(idx.buscar, c)
+        filas_idx = len(idx.buscar(c))
+        print(f"{c:<18}{ms_like:>10.2f}{ms_fts:>10.2f}{ms_like / max(ms_fts, 1e-6):>8.1f}{filas:>8}"
+              f"{ms_idx:>11.2f}{filas_idx:>8}")
+    session.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    tamanos = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    for n in tamanos:
+        correr(n)
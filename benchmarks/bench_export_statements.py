@@ -0,0 +1,179 @@
+# benchmarks/bench_export_statements.py
+# -*- coding: utf-8 -*-
+"""
+Regresion de N+1 en exportaciones de ventas: cuenta sentencias SQL emitidas.
+
+Compara el camino previo (ult_log() por venta, listar_items() por venta y
+acceso lazy a item.producto) contra los caminos set-based de VentaRepo:
+  - exportar_rango()            -> ult_logs() con ROW_NUMBER() OVER (...)
+  - dataframe_items_por_rango() -> selectinload(items).joinedload(producto) por pagina
+Verifica ademas que los DataFrames resultantes sean iguales.
+
+Uso:
+    python benchmarks/bench_export_statements.py            # 2000 ventas
+    python benchmarks/bench_export_statements.py 20000      # tamaño custom
+
+Sale con codigo 1 si el camino nuevo emite mas sentencias que MAX_SENTENCIAS(n).
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import Base  # noqa: E402
+import app.repository as repo_mod  # noqa: E402
+
+SUCURSAL = "Centro"
+PAGE_SIZE = 500
+
+
+def MAX_SENTENCIAS(n: int) -> int:
+    # exportar_rango: 1 (ventas) + ceil(n/900) (logs)
+    # items: por pagina 1 (ventas) + 1 (selectin items+productos), +1 pagina vacia final
+    paginas = n // PAGE_SIZE + 1
+    return 1 + (n // 900 + 1) + 2 * paginas + 5
+
+
+def _poblar(engine, n: int) -> None:
+    rnd = random.Random(7)
+    base = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO productos (id, codigo_barra, nombre, precio, categoria, version) "
+            "VALUES (:id, :c, :n, :p, :cat, 1)"),
+            [{"id": i, "c": f"779{i:08d}", "n": f"Prod {i}", "p": 100.0 + i,
+              "cat": rnd.choice(["bebidas", "almacen", None])} for i in range(1, 501)])
+        ventas, items, logs = [], [], []
+        for vid in range(1, n + 1):
+            ventas.append({"id": vid, "s": SUCURSAL, "f": base + timedelta(minutes=vid * 7),
+                           "m": rnd.choice(["Efectivo", "Tarjeta"]), "c": rnd.choice([None, 3]),
+                           "t": round(rnd.uniform(100, 9000), 2), "nt": vid})
+            for _ in range(rnd.randint(1, 5)):
+                items.append({"v": vid, "p": rnd.choice([None] + list(range(1, 501))),
+                              "q": rnd.randint(1, 4), "pu": round(rnd.uniform(50, 900), 2)})
+            for k in range(rnd.choice([0, 0, 1, 2])):
+                logs.append({"v": vid, "f": base + timedelta(minutes=vid * 7 + k), "c": f"log {vid}.{k}"})
+        conn.execute(text(
+            "INSERT INTO ventas (id, sucursal, fecha, modo_pago, cuotas, total, numero_ticket, "
+            "subtotal_base, interes_pct, interes_monto, descuento_pct, descuento_monto) "
+            "VALUES (:id, :s, :f, :m, :c, :t, :nt, 0, 0, 0, 0, 0)"), ventas)
+        conn.execute(text(
+            "INSERT INTO venta_items (venta_id, producto_id, cantidad, precio_unit) "
+            "VALUES (:v, :p, :q, :pu)"), items)
+        if logs:
+            conn.execute(text(
+                "INSERT INTO venta_logs (venta_id, fecha, comentario) VALUES (:v, :f, :c)"), logs)
+
+
+class _Contador:
+    def __init__(self, engine):
+        self.n = 0
+        event.listen(engine, "before_cursor_execute", self._on_exec)
+
+    def _on_exec(self, *args, **kwargs):
+        self.n += 1
+
+
+# ─── Caminos previos (referencia) ─────────────────────────────────────
+
+def _exportar_rango_previo(repo, sucursal, inicio, fin):
+    from app.models import Venta
+    ventas = (repo.session.query(Venta)
+              .filter(Venta.sucursal == sucursal, Venta.fecha >= inicio, Venta.fecha <= fin)
+              .order_by(Venta.fecha.asc()).all())
+    rows = []
+    for v in ventas:
+        log = repo.ult_log(v.id)
+        rows.append({
+            'ticket': v.numero_ticket,
+            'fecha': v.fecha.strftime('%Y-%m-%d %H:%M:%S'),
+            'modo_pago': v.modo_pago,
+            'cuotas': v.cuotas or '',
+            'total': round(v.total, 2),
+            'comentario': log.comentario if log else '',
+        })
+    return pd.DataFrame(rows)
+
+
+def _items_previo(repo, desde, hasta, sucursal):
+    rows = []
+    for v in repo.listar_por_rango(desde, hasta, sucursal):
+        for it in repo.listar_items(v.id):
+            prod = it.producto
+            cant = float(it.cantidad or 1)
+            pu = float(it.precio_unit or 0.0)
+            rows.append({
+                "venta_id": v.id, "ticket": v.numero_ticket or v.id,
+                "codigo": (prod.codigo_barra if prod else "") or "",
+                "nombre": (prod.nombre if prod else "") or "",
+                "categoria": (prod.categoria if prod else "") or "",
+                "cantidad": cant, "precio_unitario": pu, "total_linea": cant * pu,
+            })
+    return pd.DataFrame(rows)
+
+
+def _medir(engine, fn):
+    session = sessionmaker(bind=engine)()
+    repo = repo_mod.VentaRepo(session)
+    cont = _Contador(engine)
+    t0 = time.perf_counter()
+    df = fn(repo)
+    ms = (time.perf_counter() - t0) * 1000.0
+    event.remove(engine, "before_cursor_execute", cont._on_exec)
+    session.close()
+    return df, cont.n, ms
+
+
+def correr(n: int) -> bool:
+    tmpdir = tempfile.mkdtemp(prefix="bench_export_")
+    engine = create_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    _poblar(engine, n)
+    desde, hasta = datetime(2025, 12, 31), datetime(2027, 1, 1)
+
+    casos = [
+        ("exportar_rango",
+         lambda r: _exportar_rango_previo(r, SUCURSAL, desde, hasta),
+         lambda r: r.exportar_rango(SUCURSAL, desde, hasta)),
+        ("dataframe_items",
+         lambda r: _items_previo(r, desde, hasta, SUCURSAL),
+         lambda r: r.dataframe_items_por_rango(desde, hasta, SUCURSAL, page_size=PAGE_SIZE)),
+    ]
+    ok = True
+    total_nuevo = 0
+    print(f"\n=== {n:,} ventas ===")
+    print(f"{'caso':<18}{'SQL previo':>12}{'SQL nuevo':>12}{'ms previo':>12}{'ms nuevo':>12}{'igual':>8}")
+    for nombre, previo, nuevo in casos:
+        df_a, n_a, ms_a = _medir(engine, previo)
+        df_b, n_b, ms_b = _medir(engine, nuevo)
+        claves = list(df_a.columns)
+        a = df_a.sort_values(claves).reset_index(drop=True)
+        b = df_b[claves].sort_values(claves).reset_index(drop=True)
+        try:
+            pd.testing.assert_frame_equal(a, b, check_dtype=False, check_column_type=False,
+                                          check_index_type=False)
+            igual = True
+        except AssertionError:
+            igual = False
+        ok = ok and igual
+        total_nuevo += n_b
+        print(f"{nombre:<18}{n_a:>12,}{n_b:>12,}{ms_a:>12.1f}{ms_b:>12.1f}{'si' if igual else 'NO':>8}")
+    limite = 2 * MAX_SENTENCIAS(n)
+    if total_nuevo > limite:
+        print(f"REGRESION: {total_nuevo} sentencias (limite {limite})")
+        ok = False
+    return ok
+
+
+if __name__ == "__main__":
+    tam = [int(a) for a in sys.argv[1:]] or [2000]
+    resultados = [correr(n) for n in tam]
+    sys.exit(0 if all(resultados) else 1)
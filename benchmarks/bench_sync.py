@@ -0,0 +1,263 @@
+# benchmarks/bench_sync.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark de sync de punta a punta contra FirebaseLocal (sin Firebase real).
+
+Siembra la sucursal "Origen" con M cambios (productos, clientes y ventas con
+items) y la cola offline de N-1 sucursales con M cambios mas, y mide por fase:
+  push     Origen: push_all_existing(completo=True)
+  flush    cola offline -> cambios/ (_flush_offline_queue)
+  pull     sucursal nueva (BD vacia, sin cursores): pull_changes()
+  cleanup  limpiar_pendientes() de lo que junto ese pull (safe_window = 0)
+Para cada fase reporta cambios/s, requests por metodo y latencia HTTP del
+cliente (promedio / maximo). Verifica que la sucursal nueva termine con los
+datos del origen y que cambios/ quede vacio, que una pagina cuyo commit
+falla no deje sus productos en el indice del catalogo y que la marca del push
+incremental no pierda filas empatadas en last_modified.
+
+Uso:
+    python benchmarks/bench_sync.py                                   # 3 sucursales, 2000 cambios, 20 ms
+    python benchmarks/bench_sync.py --sucursales 5 --cambios 10000 --latencia 50
+
+Sale con codigo 1 si la verificacion falla.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# sync_state.db, logs y BDs van a una carpeta temporal, no a la de la app
+TMP = tempfile.mkdtemp(prefix="bench_sync_")
+os.environ["APPDATA"] = TMP
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import app.config as config  # noqa: E402
+from app import database  # noqa: E402
+from app.catalog_index import ProductCatalogIndex  # noqa: E402
+from app.firebase_sync import FirebaseSyncManager  # noqa: E402
+from app.firebase_transport import FirebaseTransport  # noqa: E402
+from app.models import Base, Comprador, Producto, Venta, VentaItem  # noqa: E402
+from app.repository import prod_repo  # noqa: E402
+from app.sync_state import SyncState  # noqa: E402
+from benchmarks.firebase_local import FirebaseLocal  # noqa: E402
+
+config.CONFIG_PATH = os.path.join(TMP, "app_config.json")
+
+
+class _SyncBench(FirebaseSyncManager):
+    """El cleanup diferido se mide como fase aparte (sin hilo en segundo plano)."""
+
+    def _lanzar_limpieza(self) -> None:
+        pass
+
+
+def _sesion(nombre: str):
+    engine = create_engine(f"sqlite:///{os.path.join(TMP, nombre + '.db')}")
+    event.listen(engine, "connect", database._set_pragmas)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+def _sembrar_origen(session, m: int) -> dict:
+    """~40% productos, 10% clientes, 50% ventas (1-4 items). Retorna los conteos."""
+    rnd = random.Random(20)
+    n_prod, n_comp = max(1, m * 2 // 5), m // 10
+    n_ventas = m - n_prod - n_comp
+    base = datetime(2026, 1, 1)
+    conn = session.connection()
+    conn.execute(text(
+        "INSERT INTO productos (id, codigo_barra, nombre, precio, categoria, version) "
+        "VALUES (:id, :c, :n, :p, 'almacen', 1)"),
+        [{"id": i, "c": f"779{i:08d}", "n": f"Prod {i}", "p": 100.0 + i} for i in range(1, n_prod + 1)])
+    session.add_all(Comprador(cuit=f"20{i:08d}9", nombre=f"Cliente {i}", condicion="CF")
+                    for i in range(n_comp))
+    session.flush()
+    ventas, items = [], []
+    for vid in range(1, n_ventas + 1):
+        ventas.append({"id": vid, "s": "Origen", "f": base + timedelta(minutes=vid),
+                       "m": rnd.choice(["Efectivo", "Tarjeta"]), "t": round(rnd.uniform(100, 9000), 2),
+                       "nt": vid})
+        for _ in range(rnd.randint(1, 4)):
+            items.append({"v": vid, "p": rnd.randint(1, n_prod), "c": rnd.randint(1, 5),
+                          "pu": round(rnd.uniform(50, 900), 2)})
+    conn.execute(text(
+        "INSERT INTO ventas (id, sucursal, fecha, modo_pago, total, numero_ticket, "
+        "subtotal_base, interes_pct, interes_monto, descuento_pct, descuento_monto) "
+        "VALUES (:id, :s, :f, :m, :t, :nt, 0, 0, 0, 0, 0)"), ventas)
+    conn.execute(text(
+        "INSERT INTO venta_items (venta_id, producto_id, cantidad, precio_unit) "
+        "VALUES (:v, :p, :c, :pu)"), items)
+    session.commit()
+    return {"productos": n_prod, "compradores": n_comp, "ventas": n_ventas}
+
+
+def _encolar_offline(sucursales: list, m: int) -> int:
+    """M upserts de productos nuevos repartidos entre las sucursales (cola offline)."""
+    cola = SyncState.get_instance()
+    ts = int(time.time() * 1000)
+    for i in range(m):
+        suc = sucursales[i % len(sucursales)]
+        cola.encolar({
+            "tipo": "productos", "accion": "upsert", "sucursal_origen": suc, "timestamp": ts + i,
+            "data": {"codigo_barra": f"OFF{i:07d}", "nombre": f"Offline {i} ({suc})",
+                     "precio": 10.0 + i, "categoria": "almacen"},
+        })
+    return m
+
+
+def _verificar_pagina_fallida(sync: FirebaseSyncManager) -> str:
+    """Una pagina con sus savepoints ya liberados y el commit fallido (rollback,
+    como en _cerrar_pagina) no debe publicar nada en el indice del catalogo."""
+    idx = ProductCatalogIndex.get_instance()
+    idx.cargar(prod_repo(sync.session))
+    antes = len(idx)
+    cambio = {"tipo": "productos", "accion": "upsert", "sucursal_origen": "Otra",
+              "timestamp": int(time.time() * 1000),
+              "data": {"codigo_barra": "PAGINA-FALLIDA", "nombre": "No confirmado",
+                       "precio": 1.0, "categoria": "almacen"}}
+    sync._abrir_pagina("productos", [cambio])
+    sync._apply_en_savepoint("productos", cambio)
+    sync.session.rollback()
+    en_bd = sync.session.query(Producto).filter_by(codigo_barra="PAGINA-FALLIDA").count()
+    if idx.por_codigo("PAGINA-FALLIDA") is not None or len(idx) != antes or en_bd:
+        return f"indice del catalogo tras una pagina deshecha: {len(idx)} (antes {antes}, en BD {en_bd})"
+    return ""
+
+
+def _verificar_marca_empate(session) -> str:
+    """Filas con el mismo last_modified, guardado sin microsegundos como lo deja un
+    backfill por SQL (y una con el formato del ORM): con la marca en la primera,
+    el push incremental tiene que traer las demas."""
+    conn = session.connection()
+    conn.execute(text("DELETE FROM compradores"))
+    conn.execute(text(
+        "INSERT INTO compradores (id, cuit, nombre, last_modified) VALUES "
+        "(1, '201', 'A', '2026-01-01 10:00:00'), (2, '202', 'B', '2026-01-01 10:00:00'), "
+        "(3, '203', 'C', '2026-01-01 10:00:00'), (4, '204', 'D', '2026-01-01 10:00:00.500000')"))
+    session.commit()
+    sync = _SyncBench(session, "Marcas")
+    estado = SyncState.get_instance()
+    previa = estado.marca_push("compradores")
+    try:
+        sync._guardar_marca_push("compradores", ("2026-01-01 10:00:00", 1))
+        ids = [c.id for c, _ in sync._query_push("compradores").all()]
+    finally:
+        if previa is None:
+            estado.borrar_marcas_push(["compradores"])
+        else:
+            estado.guardar_marca_push("compradores", previa)
+    if ids != [2, 3, 4]:
+        return f"push incremental tras la marca (empate en last_modified): {ids}, se esperaba [2, 3, 4]"
+    return ""
+
+
+def _fase(nombre: str, fn, cambios_fn, fb: FirebaseLocal, filas: list):
+    http = FirebaseTransport.get_instance()
+    http.reset_metricas()
+    fb.requests.clear()
+    t0 = time.perf_counter()
+    resultado = fn()
+    seg = time.perf_counter() - t0
+    cambios = cambios_fn(resultado)
+    m = http.metricas()
+    n = sum(v["n"] for v in m.values())
+    prom = sum(v["total_ms"] for v in m.values()) / n if n else 0.0
+    maximo = max((v["max_ms"] for v in m.values()), default=0.0)
+    reqs = " ".join(f"{k}={v}" for k, v in sorted(fb.requests.items()))
+    filas.append((nombre, cambios, seg, cambios / seg if seg else 0.0, reqs, prom, maximo))
+    return resultado
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sucursales", type=int, default=3, help="sucursales (Origen + N-1 con cola offline)")
+    ap.add_argument("--cambios", type=int, default=2000, help="cambios sembrados en Origen y en la cola")
+    ap.add_argument("--latencia", type=float, default=20.0, help="ms agregados por request en el servidor")
+    args = ap.parse_args()
+
+    with FirebaseLocal(latencia_ms=args.latencia) as fb:
+        cfg = config.load()
+        cfg["sync"] = {
+            "enabled": True, "mode": "interval", "interval_minutes": 5,
+            "firebase": {"database_url": fb.url, "auth_token": ""},
+            "sync_productos": True, "sync_proveedores": True,
+            "cleanup": {"enabled": True, "safe_window_days": 0, "diferido": True},
+            "snapshots": {"enabled": False},
+        }
+        config.save(cfg)
+
+        s_origen = _sesion("origen")
+        sembrados = _sembrar_origen(s_origen, args.cambios)
+        otras = [f"Suc{i}" for i in range(2, max(args.sucursales, 2) + 1)]
+        offline = _encolar_offline(otras, args.cambios)
+        print(f"Sembrado: Origen {sembrados}, cola offline {offline} cambios de {otras}, "
+              f"latencia {args.latencia:.0f} ms")
+
+        filas = []
+        origen = _SyncBench(s_origen, "Origen")
+        r_push = _fase("push", lambda: origen.push_all_existing(
+            tipos=["productos", "compradores", "ventas"], completo=True),
+            lambda r: r["productos"] + r["compradores"] + r["ventas"], fb, filas)
+        s_flush = _sesion("flush")
+        r_flush = _fase("flush", lambda: _SyncBench(s_flush, otras[0])._flush_offline_queue(by_type=True),
+                        lambda r: sum(r.values()), fb, filas)
+        s_nueva = _sesion("nueva")
+        nueva = _SyncBench(s_nueva, "Nueva")
+        r_pull = _fase("pull", nueva.pull_changes,
+                       lambda r: sum(v for k, v in r.items() if k != "errores"), fb, filas)
+        r_cleanup = _fase("cleanup", nueva.limpiar_pendientes, lambda r: sum(r.values()), fb, filas)
+
+        print(f"\n{'fase':8} {'cambios':>8} {'seg':>7} {'cambios/s':>10}  {'prom ms':>8} {'max ms':>8}  requests")
+        for nombre, cambios, seg, tput, reqs, prom, maximo in filas:
+            print(f"{nombre:8} {cambios:8d} {seg:7.2f} {tput:10.0f}  {prom:8.1f} {maximo:8.1f}  {reqs}")
+
+        # Verificacion
+        errores = []
+        if r_push.get("errores"):
+            errores.append(f"push con errores: {r_push}")
+        if sum(r_flush.values()) != offline:
+            errores.append(f"flush envio {sum(r_flush.values())} de {offline}")
+        if r_pull.get("errores"):
+            errores.append(f"pull con errores: {r_pull}")
+        esperado = {
+            "productos": sembrados["productos"] + offline,
+            "compradores": sembrados["compradores"],
+            "ventas": sembrados["ventas"],
+        }
+        obtenido = {
+            "productos": s_nueva.query(Producto).count(),
+            "compradores": s_nueva.query(Comprador).count(),
+            "ventas": s_nueva.query(Venta).count(),
+        }
+        if obtenido != esperado:
+            errores.append(f"sucursal nueva tiene {obtenido}, se esperaba {esperado}")
+        items_origen = s_origen.query(VentaItem).count()
+        items_nueva = s_nueva.query(VentaItem).count()
+        if items_nueva != items_origen:
+            errores.append(f"items de venta: {items_nueva} en la nueva, {items_origen} en Origen")
+        quedan = {t: len(v or {}) for t, v in (fb.leer("cambios") or {}).items()}
+        if any(quedan.values()):
+            errores.append(f"cambios/ no quedo vacio tras el cleanup: {quedan} (borrados {r_cleanup})")
+        error_indice = _verificar_pagina_fallida(nueva)
+        if error_indice:
+            errores.append(error_indice)
+        error_marca = _verificar_marca_empate(_sesion("marcas"))
+        if error_marca:
+            errores.append(error_marca)
+
+    if errores:
+        print("\nFALLO:\n  " + "\n  ".join(errores))
+        return 1
+    print(f"\nOK: sucursal nueva = {obtenido}, {items_nueva} items; cambios/ vacio")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
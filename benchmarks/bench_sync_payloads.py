@@ -0,0 +1,101 @@
+# benchmarks/bench_sync_payloads.py
+# -*- coding: utf-8 -*-
+"""
+Payloads de sync: cuerpo de un batch PATCH.
+
+Un batch de BATCH_SIZE ventas con items como en _push_all_ventas_batch. Compara
+  - previo: dict de entradas + cuerpo armado por requests (json=)
+  - nuevo:  LoteJSON (cada entrada se serializa al agregarla)
+
+Mide tiempo (mediana) y pico de memoria (tracemalloc) y verifica que ambos
+caminos den el mismo cuerpo.
+
+Uso:
+    python benchmarks/bench_sync_payloads.py          # 500 ventas por batch
+    python benchmarks/bench_sync_payloads.py 2000     # tamaño custom
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+from app.firebase_sync import FirebaseSyncManager  # noqa: E402
+from app.firebase_transport import LoteJSON  # noqa: E402
+
+REPETICIONES = 15
+
+
+def _venta(rnd: random.Random, i: int) -> dict:
+    items = [{"codigo_barra": f"779{rnd.randint(0, 99999999):08d}",
+              "nombre": f"Producto de almacén {rnd.randint(1, 5000)}",
+              "cantidad": rnd.randint(1, 6),
+              "precio_unit": round(rnd.uniform(50, 9000), 2)}
+             for _ in range(rnd.randint(1, 8))]
+    return {
+        "sucursal_origen": "Centro",
+        "timestamp": 1760000000000 + i,
+        "accion": "create",
+        "data": {
+            "numero_ticket": i + 1, "numero_ticket_cae": None, "sucursal": "Centro",
+            "fecha": "2026-10-17T10:%02d:00" % (i % 60), "modo_pago": rnd.choice(["Efectivo", "Tarjeta"]),
+            "cuotas": rnd.choice([None, 3, 6]), "total": round(rnd.uniform(100, 90000), 2),
+            "subtotal_base": 0.0, "interes_pct": 0.0, "interes_monto": 0.0,
+            "descuento_pct": 0.0, "descuento_monto": 0.0, "pagado": 0.0, "vuelto": 0.0,
+            "afip_cae": None, "afip_cae_vencimiento": None, "afip_numero_comprobante": None,
+            "tipo_comprobante": None, "punto_venta": 1, "items": items,
+        },
+    }
+
+
+def _medir(fn):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico
+
+
+def main(n: int) -> int:
+    rnd = random.Random(19)
+    entradas = [(FirebaseSyncManager._generate_push_key(1760000000000 + i, seq=i), _venta(rnd, i))
+                for i in range(n)]
+
+    def push_previo():
+        batch = {}
+        for k, v in entradas:
+            batch[k] = json.loads(json.dumps(v))  # cada entrada es un dict nuevo, como en el loop real
+        req = requests.models.PreparedRequest()
+        req.prepare_headers({})
+        req.prepare_body(data=None, files=None, json=batch)
+        return req.body
+
+    def push_nuevo():
+        batch = LoteJSON()
+        for k, v in entradas:
+            batch[k] = json.loads(json.dumps(v))
+        return batch.cuerpo()
+
+    assert json.loads(push_previo()) == json.loads(push_nuevo())
+    previo_p = _medir(push_previo)
+    nuevo_p = _medir(push_nuevo)
+    print(f"Batch PATCH de {n} ventas: cuerpo previo {len(push_previo()) / 1024:.0f} KB, "
+          f"nuevo {len(push_nuevo()) / 1024:.0f} KB (separadores compactos)")
+    print(f"  push  previo dict + json=:  {previo_p[0] * 1000:7.1f} ms  pico {previo_p[1] / 1024:7.0f} KB")
+    print(f"  push  nuevo  LoteJSON:      {nuevo_p[0] * 1000:7.1f} ms  pico {nuevo_p[1] / 1024:7.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 500))
@@ -0,0 +1,126 @@
+# benchmarks/bench_sync_stream.py
+# -*- coding: utf-8 -*-
+"""
+Modo stream de la sync contra FirebaseLocal: latencia de un cambio remoto.
+
+La sucursal "Origen" sube R rafagas de cambios de productos (cola offline +
+_flush_offline_queue), separadas por --pausa segundos. La sucursal "Destino"
+escucha con CambiosListener y, por cada aviso, hace
+ejecutar_sincronizacion_completa(tipos=...) como la ventana principal. Mide:
+  - latencia desde el flush del origen hasta que el producto esta en la BD
+    del destino (promedio / maximo);
+  - requests del destino (streams + GETs de pull) contra lo que costaria el
+    polling: una sync completa (5 GETs de pull como minimo) por tick.
+A mitad de la corrida corta los streams del servidor para medir la reconexion.
+
+Uso:
+    python benchmarks/bench_sync_stream.py                  # 10 rafagas, pausa 1 s
+    python benchmarks/bench_sync_stream.py --rafagas 30 --latencia 50
+
+Sale con codigo 1 si algun cambio no llega al destino.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp(prefix="bench_stream_")
+os.environ["APPDATA"] = TMP
+
+import app.config as config  # noqa: E402
+from app.firebase_stream import CambiosListener  # noqa: E402
+from app.models import Producto  # noqa: E402
+from app.sync_state import SyncState  # noqa: E402
+from benchmarks.bench_sync import _SyncBench, _sesion  # noqa: E402
+from benchmarks.firebase_local import FirebaseLocal  # noqa: E402
+
+config.CONFIG_PATH = os.path.join(TMP, "app_config.json")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rafagas", type=int, default=10, help="rafagas de cambios subidas por el origen")
+    ap.add_argument("--cambios", type=int, default=5, help="productos por rafaga")
+    ap.add_argument("--pausa", type=float, default=1.0, help="segundos entre rafagas")
+    ap.add_argument("--latencia", type=float, default=20.0, help="ms agregados por request en el servidor")
+    args = ap.parse_args()
+
+    with FirebaseLocal(latencia_ms=args.latencia, keepalive_s=5) as fb:
+        cfg = config.load()
+        cfg["sync"] = {
+            "enabled": True, "mode": "stream", "interval_minutes": 5,
+            "firebase": {"database_url": fb.url, "auth_token": ""},
+            "sync_productos": True, "sync_proveedores": True,
+            "cleanup": {"enabled": False},
+            "snapshots": {"enabled": False},
+        }
+        config.save(cfg)
+
+        origen = _SyncBench(_sesion("origen"), "Origen")
+        s_destino = _sesion("destino")
+        destino = _SyncBench(s_destino, "Destino")
+        destino.ejecutar_sincronizacion_completa()   # arranque: deja los cursores al dia
+
+        subidos = {}        # codigo -> time.perf_counter() del flush
+        llegados = {}       # codigo -> time.perf_counter() en que se vio en el destino
+        syncs = []
+        lock = threading.Lock()
+
+        def _on_cambios(tipos):
+            # Como la ventana principal: una sync a la vez, solo de los tipos avisados
+            with lock:
+                r = destino.ejecutar_sincronizacion_completa(tipos=tipos)
+                ahora = time.perf_counter()
+                syncs.append(sorted(tipos))
+                s_destino.expire_all()
+                for (codigo,) in s_destino.query(Producto.codigo_barra).filter(
+                        Producto.codigo_barra.in_(list(subidos))):
+                    llegados.setdefault(codigo, ahora)
+                return r
+
+        listener = CambiosListener("Destino", on_cambios=_on_cambios, debounce=0.2).iniciar()
+        time.sleep(1.0)
+        fb.requests.clear()
+        cola = SyncState.get_instance()
+        for r in range(args.rafagas):
+            if r == args.rafagas // 2:
+                fb.cortar_streams()
+            ts = int(time.time() * 1000)
+            codigos = [f"ST{r:03d}{i:03d}" for i in range(args.cambios)]
+            for i, codigo in enumerate(codigos):
+                cola.encolar({"tipo": "productos", "accion": "upsert", "sucursal_origen": "Origen",
+                              "timestamp": ts + i,
+                              "data": {"codigo_barra": codigo, "nombre": f"Stream {codigo}",
+                                       "precio": 10.0 + i, "categoria": "almacen"}})
+            origen._flush_offline_queue()
+            t_flush = time.perf_counter()
+            for codigo in codigos:
+                subidos[codigo] = t_flush
+            time.sleep(args.pausa)
+        time.sleep(3.0)
+        listener.detener(esperar=2)
+        requests_destino = dict(fb.requests)
+
+    faltan = sorted(set(subidos) - set(llegados))
+    lat = [(llegados[c] - subidos[c]) * 1000 for c in llegados]
+    duracion = args.rafagas * args.pausa
+    print(f"{len(subidos)} cambios en {args.rafagas} rafagas, latencia servidor {args.latencia:.0f} ms")
+    if lat:
+        print(f"  latencia origen->destino: prom {sum(lat) / len(lat):.0f} ms, max {max(lat):.0f} ms")
+    print(f"  syncs parciales del destino: {len(syncs)}")
+    print(f"  requests (origen + destino): {requests_destino}")
+    print(f"  polling cada 2 min en {duracion:.0f} s: latencia promedio ~60000 ms, "
+          f"{5 * max(1, int(duracion // 120))}+ GETs de pull por sucursal")
+    if faltan:
+        print(f"\nFALLO: {len(faltan)} cambios no llegaron: {faltan[:5]}")
+        return 1
+    print("\nOK: todos los cambios llegaron por el stream")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
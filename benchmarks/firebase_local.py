@@ -0,0 +1,357 @@
+# benchmarks/firebase_local.py
+# -*- coding: utf-8 -*-
+"""
+Firebase Realtime Database "de mentira": servidor HTTP local, en el mismo proceso,
+con el subconjunto de la REST API que usa FirebaseSyncManager.
+
+  GET    /{path}.json   orderBy="$key" + startAt / endAt / limitToFirst / limitToLast,
+                        shallow=true
+  POST   /{path}.json   push: genera un push key ordenado y responde {"name": key}
+  PATCH  /{path}.json   multi-path update ({"a/b": valor, "c": null} borra "c")
+  PUT    /{path}.json   reemplaza el nodo (null lo borra)
+  DELETE /{path}.json
+  GET con Accept: text/event-stream
+                        stream de eventos como la RTDB: `put` inicial con el
+                        resultado de la query, despues `put` / `patch` por cada
+                        escritura bajo el path y `keep-alive` cada keepalive_s
+
+Como la RTDB: los parametros de query van en JSON (orderBy="$key", startAt="-Nx"),
+los nodos que quedan vacios desaparecen, un path inexistente devuelve null, las
+respuestas se comprimen con gzip si el cliente lo pide y `auth` se ignora.
+`latencia_ms` agrega una demora fija por request para simular la red.
+En los streams la query solo filtra el `put` inicial: los eventos siguientes
+traen toda escritura bajo el path. `cortar_streams()` cierra los streams
+abiertos y `streams_habilitados = False` los rechaza con 503 (para probar la
+reconexion y el paso a polling).
+
+Uso:
+    from benchmarks.firebase_local import FirebaseLocal
+    with FirebaseLocal(latencia_ms=20) as fb:
+        cfg["sync"]["firebase"]["database_url"] = fb.url
+        ...
+        fb.leer("cambios/ventas")      # estado actual del arbol
+        fb.requests                    # Counter {"GET": n, "PATCH": n, "STREAM": n, ...}
+"""
+import copy
+import gzip
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.firebase_sync import FirebaseSyncManager  # noqa: E402
+
+GZIP_MIN = 1024   # bytes: respuestas mas chicas van sin comprimir
+
+
+class ErrorConsulta(ValueError):
+    """Query invalida (la RTDB responde 400)."""
+
+
+def _partes(path: str) -> list:
+    return [p for p in path.strip("/").split("/") if p]
+
+
+class FirebaseLocal:
+    """Arbol JSON en memoria servido por un ThreadingHTTPServer en 127.0.0.1."""
+
+    def __init__(self, latencia_ms: float = 0.0, puerto: int = 0, keepalive_s: float = 30.0):
+        self.latencia_ms = latencia_ms
+        self.keepalive_s = keepalive_s
+        self.streams_habilitados = True
+        self.requests = Counter()
+        self._datos = None
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._suscriptores = []   # [(partes del path, queue.Queue de eventos)]
+        self._server = ThreadingHTTPServer(("127.0.0.1", puerto), _Handler)
+        self._server.daemon_threads = True
+        self._server.firebase = self
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def iniciar(self) -> "FirebaseLocal":
+        self._hilo = threading.Thread(target=self._server.serve_forever, name="FirebaseLocal", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.cortar_streams()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    # ─── Arbol ───────────────────────────────────────────────────────
+
+    def _nodo(self, path: str):
+        nodo = self._datos
+        for p in _partes(path):
+            if not isinstance(nodo, dict) or p not in nodo:
+                return None
+            nodo = nodo[p]
+        return nodo
+
+    def leer(self, path: str = ""):
+        with self._lock:
+            return copy.deepcopy(self._nodo(path))
+
+    def escribir(self, path: str, valor) -> None:
+        """PUT: reemplaza el nodo; None (o {} / []) lo borra."""
+        with self._lock:
+            self._set(_partes(path), copy.deepcopy(valor))
+            self._notificar(_partes(path), "put", valor)
+
+    def actualizar(self, path: str, cambios: dict) -> None:
+        """PATCH multi-path: cada clave es un path relativo a `path`."""
+        if not isinstance(cambios, dict):
+            raise ErrorConsulta("PATCH requiere un objeto")
+        base = _partes(path)
+        with self._lock:
+            for sub, valor in cambios.items():
+                self._set(base + _partes(sub), copy.deepcopy(valor))
+            self._notificar(base, "patch", cambios)
+
+    def push(self, path: str, valor) -> str:
+        """POST: agrega un hijo con un push key (ordenado por tiempo de llegada)."""
+        with self._lock:
+            self._seq += 1
+            key = FirebaseSyncManager._generate_push_key(int(time.time() * 1000), seq=self._seq)
+            self._set(_partes(path) + [key], copy.deepcopy(valor))
+            self._notificar(_partes(path) + [key], "put", valor)
+            return key
+
+    def borrar(self, path: str) -> None:
+        self.escribir(path, None)
+
+    def _set(self, partes: list, valor) -> None:
+        if valor in (None, {}, []):
+            valor = None
+        if not partes:
+            self._datos = valor
+            return
+        if not isinstance(self._datos, dict):
+            if valor is None:
+                return
+            self._datos = {}
+        camino = [self._datos]
+        nodo = self._datos
+        for p in partes[:-1]:
+            hijo = nodo.get(p)
+            if not isinstance(hijo, dict):
+                if valor is None:
+                    return
+                hijo = nodo[p] = {}
+            nodo = hijo
+            camino.append(nodo)
+        if valor is None:
+            nodo.pop(partes[-1], None)
+            # Podar los nodos que quedaron vacios (la RTDB no guarda objetos vacios)
+            for i in range(len(camino) - 1, 0, -1):
+                if camino[i]:
+                    break
+                camino[i - 1].pop(partes[i - 1], None)
+            if not self._datos:
+                self._datos = None
+        else:
+            nodo[partes[-1]] = valor
+
+    # ─── Streams ─────────────────────────────────────────────────────
+
+    def suscribir(self, path: str, params: dict):
+        """(resultado de la query, cola de eventos) tomados juntos bajo el lock."""
+        with self._lock:
+            inicial = copy.deepcopy(self._consultar(self._nodo(path), params))
+            cola = queue.Queue()
+            self._suscriptores.append((_partes(path), cola))
+            return inicial, cola
+
+    def desuscribir(self, cola) -> None:
+        with self._lock:
+            self._suscriptores = [(p, c) for p, c in self._suscriptores if c is not cola]
+
+    def cortar_streams(self) -> None:
+        """Cierra del lado del servidor todos los streams abiertos."""
+        with self._lock:
+            for _, cola in self._suscriptores:
+                cola.put(None)
+
+    def _notificar(self, partes: list, evento: str, data) -> None:
+        """Encola el evento (ya serializado) para los streams afectados. Se llama con el lock tomado."""
+        for sub, cola in self._suscriptores:
+            if partes[:len(sub)] == sub:
+                rel = "/" + "/".join(partes[len(sub):])
+                cola.put((evento, json.dumps({"path": rel, "data": data}, separators=(",", ":"))))
+            elif sub[:len(partes)] == partes:
+                # Se escribio un ancestro: la RTDB manda el nodo escuchado completo
+                cola.put(("put", json.dumps({"path": "/", "data": self._nodo("/".join(sub))},
+                                            separators=(",", ":"))))
+
+    # ─── Consultas ───────────────────────────────────────────────────
+
+    def consultar(self, path: str, params: dict):
+        """GET con los parametros de la REST API (ya decodificados de JSON)."""
+        with self._lock:
+            return copy.deepcopy(self._consultar(self._nodo(path), params))
+
+    @staticmethod
+    def _consultar(nodo, params: dict):
+        if params.get("shallow"):
+            if len(params) > 1:
+                raise ErrorConsulta("shallow no se puede combinar con otros parametros")
+            return {k: True for k in nodo} if isinstance(nodo, dict) else nodo
+        filtros = {"startAt", "endAt", "limitToFirst", "limitToLast", "equalTo"}
+        if "orderBy" not in params:
+            if filtros & set(params):
+                raise ErrorConsulta("orderBy must be defined when other query parameters are defined")
+            return nodo
+        if params["orderBy"] != "$key":
+            raise ErrorConsulta(f"orderBy {params['orderBy']!r} no soportado (solo \"$key\")")
+        if not isinstance(nodo, dict):
+            return {}
+        keys = sorted(nodo)
+        if "equalTo" in params:
+            keys = [k for k in keys if k == str(params["equalTo"])]
+        if "startAt" in params:
+            keys = [k for k in keys if k >= str(params["startAt"])]
+        if "endAt" in params:
+            keys = [k for k in keys if k <= str(params["endAt"])]
+        if "limitToFirst" in params:
+            keys = keys[:int(params["limitToFirst"])]
+        if "limitToLast" in params:
+            keys = keys[-int(params["limitToLast"]):] if int(params["limitToLast"]) else []
+        return {k: nodo[k] for k in keys}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, como la RTDB
+
+    def log_message(self, *args):
+        pass
+
+    def _firebase(self) -> FirebaseLocal:
+        return self.server.firebase
+
+    def _path_y_params(self):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if not path.endswith(".json"):
+            raise ErrorConsulta("la REST API requiere el sufijo .json")
+        params = {}
+        for k, v in parse_qs(url.query, keep_blank_values=True).items():
+            if k == "auth":
+                continue
+            valor = v[-1]
+            try:
+                params[k] = json.loads(valor)
+            except ValueError:
+                params[k] = valor
+        return path[:-len(".json")], params
+
+    def _cuerpo(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        crudo = self.rfile.read(largo) if largo else b""
+        return json.loads(crudo) if crudo else None
+
+    def _responder(self, estado: int, valor):
+        cuerpo = json.dumps(valor, separators=(",", ":")).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if len(cuerpo) >= GZIP_MIN and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            cuerpo = gzip.compress(cuerpo, 6)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _evento(self, nombre: str, data: str):
+        """Un evento SSE como un chunk HTTP (la RTDB usa Transfer-Encoding: chunked)."""
+        cuerpo = f"event: {nombre}\ndata: {data}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(cuerpo):x}\r\n".encode("ascii") + cuerpo + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, fb: FirebaseLocal, path: str, params: dict):
+        self.close_connection = True
+        if not fb.streams_habilitados:
+            self._responder(503, {"error": "streams deshabilitados"})
+            return
+        inicial, cola = fb.suscribir(path, params)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self._evento("put", json.dumps({"path": "/", "data": inicial}, separators=(",", ":")))
+            while True:
+                try:
+                    evento = cola.get(timeout=fb.keepalive_s)
+                except queue.Empty:
+                    evento = ("keep-alive", "null")
+                if evento is None:
+                    break
+                self._evento(*evento)
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass   # el cliente cerro la conexion
+        finally:
+            fb.desuscribir(cola)
+
+    def _atender(self, metodo: str):
+        fb = self._firebase()
+        stream = metodo == "GET" and "text/event-stream" in (self.headers.get("Accept") or "")
+        fb.requests["STREAM" if stream else metodo] += 1
+        if fb.latencia_ms:
+            time.sleep(fb.latencia_ms / 1000.0)
+        try:
+            path, params = self._path_y_params()
+            if stream:
+                self._stream(fb, path, params)
+            elif metodo == "GET":
+                self._responder(200, fb.consultar(path, params))
+            elif metodo == "POST":
+                self._responder(200, {"name": fb.push(path, self._cuerpo())})
+            elif metodo == "PATCH":
+                cambios = self._cuerpo()
+                fb.actualizar(path, cambios)
+                self._responder(200, cambios)
+            elif metodo == "PUT":
+                valor = self._cuerpo()
+                fb.escribir(path, valor)
+                self._responder(200, valor)
+            elif metodo == "DELETE":
+                self._cuerpo()
+                fb.borrar(path)
+                self._responder(200, None)
+        except (ErrorConsulta, ValueError) as e:
+            self._responder(400, {"error": str(e)})
+
+    def do_GET(self):
+        self._atender("GET")
+
+    def do_POST(self):
+        self._atender("POST")
+
+    def do_PATCH(self):
+        self._atender("PATCH")
+
+    def do_PUT(self):
+        self._atender("PUT")
+
+    def do_DELETE(self):
+        self._atender("DELETE")
@@ -62,6 +62,16 @@ if __name__ == "__main__":
     # 2) Inicializar BD
     init_db()
 
+    # 2.1) v6.8.0: mover ventas viejas al archivo historico por año
+    try:
+        from app.config import load as _load_cfg_arch
+        _arch_cfg = (_load_cfg_arch().get("archivo_ventas") or {})
+        if _arch_cfg.get("enabled"):
+            from app.sales_archive import archivar_anteriores_a
+            archivar_anteriores_a(int(_arch_cfg.get("meses", 12)))
+    except Exception as _arch_err:
+        logger.warning("[main] archivado de ventas fallo: %s", _arch_err)
+
     # 3) Crear app Qt
     app = QApplication(sys.argv)
     app.setApplicationName(__app_name__)
@@ -316,6 +326,9 @@ if __name__ == "__main__":
                             _db_path_str + "-wal",
                             _cfg_path,
                             _os.path.join(_app_data, "sync_queue.json"),
+                            _os.path.join(_app_data, "sync_state.db"),
+                            _os.path.join(_app_data, "sync_state.db-wal"),
+                            _os.path.join(_app_data, "sync_state.db-shm"),
                             _os.path.join(_app_data, "config_restore.marker"),
                         ]
                         _logs_dir = _os.path.join(_app_data, "logs")